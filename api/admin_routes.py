@@ -207,4 +207,164 @@ async def toggle_xueqiu_cube(cube_symbol: str, data: ToggleEnabled):
     return {
         'status': 'success' if success else 'error',
         'message': '操作成功' if success else '操作失败'
-    }
\ No newline at end of file
+    }
+
+# ========== 运行状态 ==========
+
+@admin_router.get('/executors')
+async def list_executors():
+    """获取阻塞调用线程池状态（队列深度、等待时间）"""
+    from utils.executors import get_executor_stats
+    return {'status': 'success', 'data': get_executor_stats()}
+
+
+@admin_router.get('/http-client')
+async def get_http_client():
+    """获取上游 HTTP 客户端连接池状态（连接复用、排队等待、DNS 缓存命中）"""
+    from utils.http_client import get_http_client_stats
+    return {'status': 'success', 'data': get_http_client_stats()}
+
+
+@admin_router.get('/kline-limiter')
+async def get_kline_limiter():
+    """获取K线采集自适应并发限制器状态（当前上限、延迟直方图）"""
+    from services.kline_service import KlineService
+    limiter = KlineService.get_concurrency_limiter()
+    if limiter is None:
+        return {'status': 'success', 'data': None, 'message': '未启用自适应并发'}
+    return {'status': 'success', 'data': limiter.stats()}
+
+
+@admin_router.get('/rate-limits')
+async def get_rate_limits():
+    """获取上游数据源限流状态（令牌、各优先级排队与等待时间）"""
+    from utils.rate_limiter import get_rate_limiter_stats
+    return {'status': 'success', 'data': get_rate_limiter_stats()}
+
+
+@admin_router.get('/kline-store')
+async def get_kline_store(top: int = 50):
+    """获取进程内K线缓存占用（总量及占用最多的 top 只股票）"""
+    from services.kline_store import KlineStore
+    return {'status': 'success', 'data': KlineStore.stats(top)}
+
+
+@admin_router.get('/kline-dead-letters')
+async def list_kline_dead_letters():
+    """获取K线抓取死信表（重试后仍失败的股票）"""
+    from repositories.dead_letter_repository import KlineDeadLetterRepository
+    return {'status': 'success', 'data': await KlineDeadLetterRepository.get_all()}
+
+
+@admin_router.post('/kline-dead-letters/drain')
+async def drain_kline_dead_letters():
+    """立即重试死信表中已到期的股票"""
+    from services.kline_service import KlineService
+    try:
+        recovered, failed = await KlineService.drain_dead_letters_async()
+        return {'status': 'success', 'data': {'recovered': recovered, 'failed': failed}}
+    except Exception as e:
+        logger.error(f"死信重试失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ========== K线历史回补 ==========
+
+class BackfillCreate(BaseModel):
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    codes: Optional[list[str]] = None
+
+
+@admin_router.post('/backfill')
+async def create_backfill(data: BackfillCreate):
+    """创建并启动K线历史回补任务（同一时间只允许一个未完成的任务）"""
+    from services.backfill_service import BackfillService
+    active = await BackfillService.get_active_job()
+    if active:
+        return {'status': 'error', 'message': f"已有未完成的回补任务 {active['id']}（{active['status']}）"}
+    try:
+        job_id = await BackfillService.create_job(data.start_date, data.end_date, data.codes)
+    except ValueError as e:
+        return {'status': 'error', 'message': str(e)}
+    BackfillService.start_job(job_id)
+    return {'status': 'success', 'data': {'job_id': job_id}, 'message': '回补任务已启动'}
+
+
+@admin_router.get('/backfill')
+async def list_backfill_jobs():
+    """获取最近的回补任务及进度"""
+    from services.backfill_service import BackfillService
+    return {'status': 'success', 'data': await BackfillService.get_status()}
+
+
+@admin_router.get('/backfill/{job_id}')
+async def get_backfill_job(job_id: int):
+    """获取回补任务进度（完成比例、吞吐量、预计剩余时间）"""
+    from services.backfill_service import BackfillService
+    job = await BackfillService.get_status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='任务不存在')
+    return {'status': 'success', 'data': job}
+
+
+@admin_router.post('/backfill/{job_id}/pause')
+async def pause_backfill_job(job_id: int):
+    """暂停回补任务"""
+    from services.backfill_service import BackfillService
+    success, msg = await BackfillService.pause_job(job_id)
+    return {'status': 'success' if success else 'error', 'message': msg}
+
+
+@admin_router.post('/backfill/{job_id}/resume')
+async def resume_backfill_job(job_id: int):
+    """继续已暂停、中断或失败的回补任务（失败的股票重新排队，已完成的股票不重复处理）"""
+    from services.backfill_service import BackfillService
+    success, msg = await BackfillService.resume_job(job_id)
+    return {'status': 'success' if success else 'error', 'message': msg}
+
+
+@admin_router.post('/ema-state/repair')
+async def repair_ema_state(codes: Optional[str] = None, all_stocks: bool = False):
+    """从全部历史日线重算EMA状态
+
+    codes 为逗号分隔的股票代码；all_stocks=true 时重算 stock_list 中全部股票（全市场选股初始化）；
+    默认为全部启用的监控股票
+    """
+    from services.ema_state_service import EmaStateService
+    if codes:
+        code_list = [code.strip() for code in codes.split(',') if code.strip()]
+    elif all_stocks:
+        from repositories.stock_list_repository import StockListRepository
+        code_list = [stock.code for stock in await StockListRepository.get_all()]
+    else:
+        code_list = [stock.code for stock in await MonitorStockRepository.get_enabled()]
+    try:
+        repaired = await EmaStateService.repair(code_list)
+        return {'status': 'success', 'data': {'repaired': repaired}}
+    except Exception as e:
+        logger.error(f"EMA状态重算失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@admin_router.post('/stock-indicators/rebuild')
+async def rebuild_stock_indicators(codes: Optional[str] = None, all_stocks: bool = False):
+    """从全部历史日线重算指标物化表
+
+    codes 为逗号分隔的股票代码；all_stocks=true 时重算 stock_list 中全部股票（全市场选股初始化）；
+    默认为全部启用的监控股票
+    """
+    from services.stock_indicator_service import StockIndicatorService
+    if codes:
+        code_list = [code.strip() for code in codes.split(',') if code.strip()]
+    elif all_stocks:
+        from repositories.stock_list_repository import StockListRepository
+        code_list = [stock.code for stock in await StockListRepository.get_all()]
+    else:
+        code_list = [stock.code for stock in await MonitorStockRepository.get_enabled()]
+    try:
+        rebuilt = await StockIndicatorService.rebuild(code_list)
+        return {'status': 'success', 'data': {'rebuilt': rebuilt}}
+    except Exception as e:
+        logger.error(f"指标物化表重算失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -20,6 +20,14 @@ _monitor_cache = {
 }
 _CACHE_TTL = 60  # 缓存有效期60秒
 
+# 盘中临时数据缓存，多个页面同时轮询时合并实时价格请求
+_live_cache = {
+    'data': None,
+    'timestamp': None,
+    'lock': threading.Lock()
+}
+_LIVE_CACHE_TTL = 3  # 缓存有效期3秒
+
 
 def _clean_nan_values(obj):
     """递归清理 NaN 值，将其转换为 None"""
@@ -53,46 +61,13 @@ async def get_monitor():
         logger.info("GET /api/monitor - 缓存过期，重新获取数据")
         stocks = await MonitorService.get_monitor_data()
 
-        # 丰富数据
-        for stock in stocks:
-            min_price, max_price = MonitorService.calculate_reasonable_price(
-                stock.get('eps_forecast'),
-                stock.get('reasonable_pe_min'),
-                stock.get('reasonable_pe_max')
-            )
-            stock['reasonable_price_min'] = min_price
-            stock['reasonable_price_max'] = max_price
-            stock['valuation_status'] = MonitorService.check_valuation_status(
-                stock.get('current_price'),
-                stock.get('eps_forecast'),
-                stock.get('reasonable_pe_min'),
-                stock.get('reasonable_pe_max')
-            )
-            stock['technical_status'] = MonitorService.check_technical_status(
-                stock.get('current_price'),
-                stock.get('ema144'),
-                stock.get('ema188')
-            )
-            stock['trend'] = MonitorService.check_trend({
-                'ema5': stock.get('ema5'),
-                'ema10':  stock.get('ema10'),
-                'ema20': stock.get('ema20'),
-                'ema30': stock.get('ema30'),
-                'ema60': stock.get('ema60'),
-                'ema7': stock.get('ema7'),
-                'ema21': stock.get('ema21'),
-                'ema42':  stock.get('ema42'),
-            }, stock.get('timeframe'))
-
+        # 流水线分类阶段已把 NaN 换成 None，结果可直接序列化
         result = {
             'status': 'success',
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'stocks': stocks
         }
 
-        # 清理 NaN 值
-        result = _clean_nan_values(result)
-
         # 更新缓存
         with _monitor_cache['lock']:
             _monitor_cache['data'] = result
@@ -105,6 +80,37 @@ async def get_monitor():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@monitor_router.get('/live')
+async def get_monitor_live():
+    """获取盘中临时监控数据（实时价格 + EMA状态递推的临时EMA、技术面状态、趋势）"""
+    try:
+        current_time = time.time()
+        with _live_cache['lock']:
+            if (_live_cache['data'] is not None and
+                current_time - _live_cache['timestamp'] < _LIVE_CACHE_TTL):
+                return _live_cache['data']
+
+        start = time.perf_counter()
+        stocks = await MonitorService.get_live_data()
+        result = _clean_nan_values({
+            'status': 'success',
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'provisional': True,
+            'stocks': stocks
+        })
+
+        with _live_cache['lock']:
+            _live_cache['data'] = result
+            _live_cache['timestamp'] = current_time
+
+        logger.info(f"GET /api/monitor/live - 返回成功，股票数量: {len(stocks)}，"
+                    f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return result
+    except Exception as e:
+        logger.error(f"GET /api/monitor/live - 请求失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @monitor_router.get('/stocks')
 async def list_monitor_stocks():
     """列表监控股票配置"""
@@ -177,9 +183,12 @@ async def update_kline(data: UpdateKline):
     """手动更新K线数据"""
     try:
         from services.kline_service import KlineService
+        from utils import rate_limiter
 
         def task():
-            KlineService.batch_update_kline(force_update=data.force_update, max_workers=3)
+            # 手动触发的批量更新按定时任务优先级限流，不挤占页面请求
+            with rate_limiter.priority_scope(rate_limiter.SCHEDULED):
+                KlineService.batch_update_kline(force_update=data.force_update, max_workers=3)
 
         threading.Thread(target=task, daemon=True).start()
         return {'status': 'success', 'message': 'K线更新任务已启动'}
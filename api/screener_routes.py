@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+from services.screener_service import ScreenerService
+from datetime import datetime
+from utils.logger import get_logger
+
+logger = get_logger('screener_routes')
+
+screener_router = APIRouter()
+
+
+def _split(value):
+    """逗号分隔的查询参数 -> 列表"""
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+
+@screener_router.get('')
+async def screen(timeframe: str = '1d', technical: Optional[str] = None, trend: Optional[str] = None,
+                 valuation: Optional[str] = None, pe_min: float = 15, pe_max: float = 20,
+                 limit: int = 200, offset: int = 0):
+    """全市场 EMA144/188 通道选股
+
+    technical / trend / valuation 为逗号分隔的状态，如 technical=加仓,破位
+    估值仅覆盖监控列表中的股票（EPS 只为监控股票缓存），其余股票的估值状态为「未知」
+    """
+    logger.info(f"GET /api/screener - timeframe={timeframe} technical={technical} trend={trend} valuation={valuation}")
+    try:
+        data = await ScreenerService.screen(
+            timeframe, _split(technical), _split(trend), _split(valuation),
+            pe_min, pe_max, limit, offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"GET /api/screener - 请求失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        'status': 'success',
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        **data
+    }
@@ -115,6 +115,8 @@ class ExportKlineRequest(BaseModel):
     format: str = 'csv'
     start_date: str = None
     end_date: str = None
+    # 附加指标物化表中的日线指标列（EMA、MACD、RSI、布林带、ATR）
+    include_indicators: bool = False
 
 
 @tools_router.post('/export-kline')
@@ -145,6 +147,12 @@ async def export_kline(data: ExportKlineRequest):
         if df is None or df.empty:
             raise HTTPException(status_code=400, detail='没有可导出的数据')
 
+        if data.include_indicators:
+            from services.stock_indicator_service import StockIndicatorService
+            indicators = await StockIndicatorService.get_frame(code, '1d', start_date, end_date)
+            if indicators is not None:
+                df = df.merge(indicators, on='日期', how='left')
+
         # 生成文件名
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         if format_type == 'csv':
@@ -179,4 +187,48 @@ async def export_kline(data: ExportKlineRequest):
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+class BacktestParams(BaseModel):
+    band: list[int] = [144, 188]
+    timeframe: str = '1d'
+    entry_trends: list[str] = None
+    break_buffer: float = 0.0
+    exit_on_bear: bool = False
+
+
+class BacktestRequest(BaseModel):
+    codes: list[str] = None
+    start_date: str = None
+    end_date: str = None
+    params: BacktestParams = BacktestParams()
+    # 不为空时按多组参数扫描，只返回每组参数的汇总统计
+    sweep: list[BacktestParams] = None
+
+
+@tools_router.post('/backtest')
+async def run_backtest(data: BacktestRequest):
+    """回测 EMA144/188 通道信号（加仓入场、破位离场），codes 为空时回测全市场"""
+    logger.info(f"POST /api/tools/backtest - 请求开始，股票数: {len(data.codes) if data.codes else '全市场'}")
+    try:
+        from services.backtest_service import BacktestService
+
+        for params in [data.params, *(data.sweep or [])]:
+            if len(params.band) != 2 or min(params.band) <= 0:
+                raise HTTPException(status_code=400, detail='通道需要两个正整数 EMA 周期')
+
+        if data.sweep:
+            result = await BacktestService.sweep([params.model_dump() for params in data.sweep],
+                                                 data.codes, data.start_date, data.end_date)
+        else:
+            result = await BacktestService.run(data.codes, data.start_date, data.end_date,
+                                               data.params.model_dump())
+        return _clean_nan_values({'status': 'success', 'data': result})
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"POST /api/tools/backtest - 请求失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
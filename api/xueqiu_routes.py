@@ -52,9 +52,8 @@ async def get_cube_data(cube_symbol: str):
     """获取指定雪球组合的调仓数据"""
     logger.info(f"GET /api/xueqiu/{cube_symbol} - 请求开始")
     try:
-        headers = XueqiuService._get_headers()
-        import aiohttp
-        async with aiohttp.ClientSession(headers=headers, trust_env=False) as session:
+        from utils import http_client
+        async with http_client.session() as session:
             history = await XueqiuService._fetch_cube_data(session, cube_symbol)
 
         if history is None:
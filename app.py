@@ -9,6 +9,7 @@ from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from utils.logger import get_logger
 from utils.db import init_db_pool, close_db_pool
+from utils.http_client import init_http_client, close_http_client
 
 load_dotenv()
 
@@ -22,9 +23,19 @@ async def lifespan(app: FastAPI):
     # 初始化数据库连接池
     await init_db_pool()
     logger.info("数据库连接池已初始化")
+
+    # 创建共享的上游 HTTP 客户端（后台预热到雪球的连接）
+    await init_http_client()
     
     # 启动后台任务
     start_background_tasks()
+
+    # 继续上次进程退出时未完成的历史回补任务（回补表未迁移等错误不影响启动）
+    try:
+        from services.backfill_service import BackfillService
+        await BackfillService.resume_interrupted_jobs()
+    except Exception as e:
+        logger.error(f"继续中断的回补任务失败: {e}")
     
     # 启动定时任务调度器
     from services.scheduler_service import SchedulerService
@@ -40,6 +51,13 @@ async def lifespan(app: FastAPI):
             job_id='daily_kline_update'
         )
 
+        # 定时重试死信表中抓取失败的股票
+        SchedulerService.add_interval_job(
+            KlineService.auto_drain_dead_letters_async,
+            minutes=int(os.getenv('KLINE_DEAD_LETTER_DRAIN_MINUTES', '30')),
+            job_id='kline_dead_letter_drain'
+        )
+
     # 添加定时任务：每天12:00更新股票列表
     if os.getenv('AUTO_UPDATE_STOCK_LIST', 'true').lower() == 'true':
         from services.stock_list_service import StockListService
@@ -55,6 +73,13 @@ async def lifespan(app: FastAPI):
     from services.scheduler_service import SchedulerService
     SchedulerService.shutdown()
     
+    # 关闭阻塞调用线程池
+    from utils.executors import shutdown_executors
+    shutdown_executors()
+
+    # 关闭上游 HTTP 客户端
+    await close_http_client()
+
     # 关闭数据库连接池
     await close_db_pool()
     logger.info("数据库连接池已关闭")
@@ -95,6 +120,7 @@ from api.admin_routes import admin_router
 from api.tools_routes import tools_router
 from api.xueqiu_routes import xueqiu_router
 from api.stock_list_routes import stock_list_router
+from api.screener_routes import screener_router
 
 app.include_router(portfolio_router, prefix='/api/portfolio', tags=['portfolio'])
 app.include_router(monitor_router, prefix='/api/monitor', tags=['monitor'])
@@ -102,6 +128,7 @@ app.include_router(admin_router, prefix='/api/admin', tags=['admin'])
 app.include_router(tools_router, prefix='/api/tools', tags=['tools'])
 app.include_router(xueqiu_router, prefix='/api/xueqiu', tags=['xueqiu'])
 app.include_router(stock_list_router, prefix='/api/stock-list', tags=['stock-list'])
+app.include_router(screener_router, prefix='/api/screener', tags=['screener'])
 app.include_router(xueqiu_router, prefix='/api/xueqiu', tags=['xueqiu'])
 
 # 页面路由
@@ -143,10 +170,12 @@ def start_background_tasks():
         return
     
     from services.kline_service import KlineService
+    from utils import rate_limiter
     
     async def auto_update():
         try:
-            await KlineService.batch_update_kline_async(force_update=False)
+            with rate_limiter.priority_scope(rate_limiter.SCHEDULED):
+                await KlineService.batch_update_kline_async(force_update=False)
         except Exception as e:
             logger.error(f"启动时自动更新K线失败: {e}")
     
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回测引擎基准：全市场规模的合成收盘价矩阵上计时 BacktestService.evaluate（单组参数 / 参数扫描），
+并与逐只股票逐日循环的参考实现核对交易。不需要数据库和网络。
+
+用法：
+    python benchmarks/bench_backtest.py --stocks 5000 --bars 2500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.backtest_service import BacktestService
+from utils.indicators import build_price_matrix
+
+
+def make_data(stocks, min_bars, bars, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(min_bars, bars + 1, stocks)
+    series = [10 * np.exp(np.cumsum(rng.normal(0, 0.02, n))) for n in lengths]
+    close, lengths = build_price_matrix(series, bars)
+    data_mask = np.arange(bars)[None, :] >= (bars - lengths)[:, None]
+    return {'codes': [f'sh{600000 + i}' for i in range(stocks)], 'close': close, 'data_mask': data_mask,
+            'in_range': data_mask, 'dates': np.where(data_mask, np.arange(bars)[None, :], np.nan).astype(np.float64)}
+
+
+def loop_trades(data, result, ema_cache, check):
+    """逐只股票逐日回放默认参数（前 check 只股票），返回与引擎交易不一致的股票数"""
+    close, trades = data['close'], result['trades']
+    low, high = np.fmin(ema_cache[144], ema_cache[188]), np.fmax(ema_cache[144], ema_cache[188])
+    mismatched = 0
+    for i in range(check):
+        ready = data['data_mask'][i] & (np.cumsum(data['data_mask'][i]) - 1 >= 187)
+        expected, position, was_in_band = [], None, None
+        for t in np.flatnonzero(ready):
+            in_band = bool(low[i, t] <= close[i, t] <= high[i, t])
+            if position is None and in_band and was_in_band is False:
+                position = t
+            elif position is not None and close[i, t] < low[i, t]:
+                expected.append((int(position), int(t)))
+                position = None
+            was_in_band = in_band
+        if position is not None:
+            expected.append((int(position), close.shape[1] - 1))
+        selected = trades['row'] == i
+        mismatched += list(zip(trades['entry'][selected].tolist(), trades['exit'][selected].tolist())) != expected
+    return mismatched
+
+
+def main(args):
+    data = make_data(args.stocks, args.min_bars, args.bars)
+
+    ema_cache = {}
+    start = time.perf_counter()
+    result = BacktestService.evaluate(data, ema_cache=ema_cache)
+    single_ms = (time.perf_counter() - start) * 1000
+    assert loop_trades(data, result, ema_cache, args.check) == 0, "引擎与逐日循环的交易不一致"
+
+    grid = [{'band': band, 'timeframe': tf, 'entry_trends': trends}
+            for band in ((144, 188), (120, 169), (60, 120))
+            for tf in ('1d', '2d', '3d')
+            for trends in (None, ['多头'], ['多头', '震荡'])]
+    start = time.perf_counter()
+    cache = {}
+    for params in grid:
+        BacktestService.evaluate(data, params, ema_cache=cache)
+    sweep_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{args.stocks} 只股票 x {args.bars} 根K线，交易 {result['aggregate']['trades']} 笔")
+    print(f"单组参数: {single_ms:.0f}ms")
+    print(f"参数扫描 {len(grid)} 组: {sweep_ms:.0f}ms（平均每组 {sweep_ms / len(grid):.0f}ms）")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stocks', type=int, default=5000)
+    parser.add_argument('--bars', type=int, default=2500)
+    parser.add_argument('--min-bars', type=int, default=100)
+    parser.add_argument('--check', type=int, default=50, help='用逐日循环核对的股票数')
+    main(parser.parse_args())
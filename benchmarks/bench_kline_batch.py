@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量取最近 N 条K线基准：全量历史查询后在 Python 中截断（旧）vs LATERAL 按股票取前 N 条（新）
+
+在临时 schema 中建与线上相同的按年分区表（(code, date DESC) 覆盖索引），用 generate_series
+填充 codes x days 的合成数据，对不同批量大小分别计时两种实现（查询 + 构造 DataFrame），
+并输出传输行数。运行结束后删除临时 schema（--keep 保留，--reuse 复用已填充的数据）。
+
+用法：
+    python benchmarks/bench_kline_batch.py --codes 5000 --days 1500 --batches 50,200,1000 --limit 1000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+from utils.db import init_db_pool, close_db_pool, get_db_conn
+from repositories.kline_repository import KlineRepository
+
+SCHEMA = 'kline_bench_batch'
+
+_DDL = f'''
+CREATE TABLE {SCHEMA}.stock_kline_data (
+    id BIGSERIAL,
+    code TEXT NOT NULL,
+    date DATE NOT NULL,
+    open DOUBLE PRECISION NOT NULL, close DOUBLE PRECISION NOT NULL,
+    high DOUBLE PRECISION NOT NULL, low DOUBLE PRECISION NOT NULL,
+    volume BIGINT NOT NULL, amount DOUBLE PRECISION NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (code, date)
+) PARTITION BY RANGE (date);
+DO $$
+BEGIN
+    FOR y IN 2010..2035 LOOP
+        EXECUTE format(
+            'CREATE TABLE {SCHEMA}.stock_kline_data_y%s PARTITION OF {SCHEMA}.stock_kline_data
+             FOR VALUES FROM (%L) TO (%L)', y, make_date(y, 1, 1), make_date(y + 1, 1, 1));
+    END LOOP;
+END $$;
+CREATE TABLE {SCHEMA}.stock_kline_data_ydefault PARTITION OF {SCHEMA}.stock_kline_data DEFAULT;
+CREATE INDEX ON {SCHEMA}.stock_kline_data (code, date DESC) INCLUDE (open, close, high, low, volume, amount);
+CREATE INDEX ON {SCHEMA}.stock_kline_data (date);
+'''
+
+_FILL_SQL = f'''
+INSERT INTO {SCHEMA}.stock_kline_data (code, date, open, close, high, low, volume, amount)
+SELECT 'sh' || (600000 + c)::text, d.day::date,
+       10 + (c % 50) + sin(d.n / 20.0), 10 + (c % 50) + sin(d.n / 20.0 + 0.1),
+       12 + (c % 50), 8 + (c % 50), 0, 1e6
+FROM generate_series($1, $2 - 1) AS c,
+     (SELECT day, row_number() OVER (ORDER BY day) AS n
+      FROM generate_series(date '2020-01-01', date '2020-01-01' + $3 * 2, interval '1 day') AS day
+      WHERE extract(isodow FROM day) < 6
+      LIMIT $3) AS d
+'''
+
+_OLD_SQL = f'''SELECT code, date, open, close, high, low, volume, amount
+               FROM {SCHEMA}.stock_kline_data
+               WHERE code = ANY($1)
+               ORDER BY code, date DESC'''
+
+_NEW_SQL = f'''SELECT c.code, k.date, k.open, k.close, k.high, k.low, k.volume, k.amount
+               FROM unnest($1::text[]) AS c(code)
+               CROSS JOIN LATERAL (
+                   SELECT date, open, close, high, low, volume, amount
+                   FROM {SCHEMA}.stock_kline_data
+                   WHERE code = c.code
+                   ORDER BY date DESC
+                   LIMIT $2
+               ) AS k'''
+
+
+async def old_impl(conn, codes, limit):
+    """改造前的 get_batch_by_codes：取全部历史，逐行建字典后截断"""
+    rows = await conn.fetch(_OLD_SQL, codes)
+    code_data = {}
+    for row in rows:
+        code_data.setdefault(row['code'], []).append({
+            'date': row['date'], 'open': row['open'], 'close': row['close'], 'high': row['high'],
+            'low': row['low'], 'volume': row['volume'], 'amount': row['amount']
+        })
+    result = {}
+    for code in codes:
+        if code_data.get(code):
+            df = pd.DataFrame(code_data[code][:limit])
+            df.columns = ['日期', '开盘', '收盘', '最高', '最低', 'volume', 'amount']
+            result[code] = df.iloc[::-1]
+        else:
+            result[code] = None
+    return result, len(rows)
+
+
+async def new_impl(conn, codes, limit):
+    """改造后的 get_batch_by_codes"""
+    rows = await conn.fetch(_NEW_SQL, codes, limit)
+    return KlineRepository._frames_by_code(codes, rows), len(rows)
+
+
+async def _time(impl, conn, codes, limit, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result, transferred = await impl(conn, codes, limit)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), transferred, result
+
+
+async def main(args):
+    await init_db_pool()
+    try:
+        async with get_db_conn() as conn:
+            exists = await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", f'{SCHEMA}.stock_kline_data')
+            if not (args.reuse and exists):
+                await conn.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}')
+                await conn.execute(_DDL)
+                start = time.perf_counter()
+                # 分块插入，避免单条语句超过连接池的命令超时
+                for first in range(0, args.codes, 500):
+                    await conn.execute(_FILL_SQL, first, min(first + 500, args.codes), args.days)
+                await conn.execute(f'VACUUM ANALYZE {SCHEMA}.stock_kline_data')
+                print(f"填充 {args.codes} x {args.days} 行，耗时 {time.perf_counter() - start:.1f}秒")
+
+            all_codes = [f'sh{600000 + c}' for c in range(args.codes)]
+            print(f"\n每只最多 {args.limit} 条，重复 {args.repeat} 次取中位数")
+            print(f"{'股票数':>8}{'旧ms':>12}{'旧传输行':>12}{'新ms':>12}{'新传输行':>12}{'加速':>8}")
+            for batch in (int(b) for b in args.batches.split(',')):
+                # 均匀抽样，避免只命中相邻代码
+                codes = all_codes[::max(1, len(all_codes) // batch)][:batch]
+                old_ms, old_rows, old_result = await _time(old_impl, conn, codes, args.limit, args.repeat)
+                new_ms, new_rows, new_result = await _time(new_impl, conn, codes, args.limit, args.repeat)
+                for code in codes:
+                    assert old_result[code]['收盘'].tolist() == new_result[code]['收盘'].tolist(), code
+                del old_result, new_result
+                print(f"{batch:>8}{old_ms:>12.1f}{old_rows:>12}{new_ms:>12.1f}{new_rows:>12}{old_ms / new_ms:>7.1f}x")
+
+            if not args.keep:
+                await conn.execute(f'DROP SCHEMA {SCHEMA} CASCADE')
+    finally:
+        await close_db_pool()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='批量取最近 N 条K线基准')
+    parser.add_argument('--codes', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=1500)
+    parser.add_argument('--batches', default='50,200,1000', help='逗号分隔的批量大小')
+    parser.add_argument('--limit', type=int, default=1000, help='每只股票返回的条数')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--keep', action='store_true', help='保留临时 schema')
+    parser.add_argument('--reuse', action='store_true', help='复用已填充的临时 schema')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线规整基准：事件循环内规整 vs 进程池规整
+
+构造与 akshare stock_zh_a_hist_tx 返回格式相同的合成数据（date 列为 datetime.date），
+模拟流水线中的规整阶段，统计总耗时、吞吐量，以及同一事件循环中心跳协程观测到的
+最大 / 平均调度延迟（即规整对页面请求的阻塞程度）。不需要数据库和网络。
+
+用法：
+    python benchmarks/bench_kline_normalize.py --stocks 500 --rows 1500 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.executors import get_process_pool, run_in_process, shutdown_executors
+from utils.kline_normalizer import normalize_kline_frame, build_records
+
+
+def make_frame(rows, seed):
+    """生成一只股票的合成K线（akshare 英文列名）"""
+    rng = np.random.default_rng(seed)
+    close = 10 + np.cumsum(rng.normal(0, 0.1, rows)).clip(-9)
+    start = date(2020, 1, 1)
+    return pd.DataFrame({
+        'date': [start + timedelta(days=i) for i in range(rows)],
+        'open': close * (1 + rng.normal(0, 0.005, rows)),
+        'close': close,
+        'high': close * 1.01,
+        'low': close * 0.99,
+        'amount': rng.uniform(1e6, 1e8, rows),
+    })
+
+
+async def heartbeat(stop, lags, interval=0.01):
+    """心跳协程：记录每次唤醒相对预期时间的延迟"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - expected)
+
+
+async def run_mode(mode, frames, concurrency):
+    """按流水线方式并发规整全部 DataFrame"""
+    stop = asyncio.Event()
+    lags = []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    frame_iter = iter(enumerate(frames))
+    results = [None] * len(frames)
+
+    async def worker():
+        for i, df in frame_iter:
+            if mode == 'process':
+                results[i] = await run_in_process(normalize_kline_frame, df)
+            else:
+                results[i] = normalize_kline_frame(df)
+            # 模拟流水线中入队的让出点
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+
+    # 写入端由列数组拼装记录的耗时（两种模式相同，单独统计）
+    build_start = time.perf_counter()
+    total = sum(len(build_records(f'sh{600000 + i}', cols)) for i, cols in enumerate(results))
+    build_elapsed = time.perf_counter() - build_start
+
+    lags_ms = np.array(lags or [0]) * 1000
+    return {
+        'mode': mode,
+        'elapsed': elapsed,
+        'rows': total,
+        'rows_per_sec': total / elapsed,
+        'max_lag_ms': lags_ms.max(),
+        'p99_lag_ms': np.percentile(lags_ms, 99),
+        'avg_lag_ms': lags_ms.mean(),
+        'build_records_sec': build_elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='K线规整基准')
+    parser.add_argument('--stocks', type=int, default=500)
+    parser.add_argument('--rows', type=int, default=1500)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"生成 {args.stocks} 只股票 x {args.rows} 行合成数据...")
+    frames = [make_frame(args.rows, i) for i in range(args.stocks)]
+
+    async def bench():
+        # 预热进程池（spawn 子进程需要导入 pandas），不计入测量
+        await asyncio.gather(*[
+            run_in_process(normalize_kline_frame, frames[0]) for _ in range(get_process_pool()._max_workers)
+        ])
+        return [await run_mode(mode, frames, args.concurrency) for mode in ('inline', 'process')]
+
+    try:
+        results = asyncio.run(bench())
+    finally:
+        shutdown_executors(wait=True)
+
+    print(f"{'模式':<8}{'耗时(秒)':>10}{'行/秒':>12}{'最大延迟ms':>12}{'P99延迟ms':>12}{'平均延迟ms':>12}{'拼装记录秒':>12}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['elapsed']:>10.2f}{r['rows_per_sec']:>12.0f}{r['max_lag_ms']:>12.1f}"
+              f"{r['p99_lag_ms']:>12.1f}{r['avg_lag_ms']:>12.2f}{r['build_records_sec']:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
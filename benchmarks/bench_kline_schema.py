@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线表结构基准：TEXT 日期单表（迁移前）vs DATE 类型按年分区 + 覆盖索引（迁移后）
+
+在两个临时 schema 中分别建表并用 generate_series 填充相同的合成数据，
+对仓储层各读取方法对应的查询（含客户端日期处理）计时，输出中位数。
+运行结束后删除临时 schema（--keep 保留）。需要可连接的 PostgreSQL（读取 PG_* 环境变量）。
+
+用法：
+    python benchmarks/bench_kline_schema.py --codes 500 --days 1500 --repeat 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime
+
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+from utils.db import init_db_pool, close_db_pool, get_db_conn
+
+BEFORE = 'kline_bench_before'
+AFTER = 'kline_bench_after'
+
+_BEFORE_DDL = f'''
+CREATE TABLE {BEFORE}.stock_kline_data (
+    id SERIAL PRIMARY KEY,
+    code TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL NOT NULL, close REAL NOT NULL, high REAL NOT NULL, low REAL NOT NULL,
+    volume INTEGER NOT NULL, amount REAL NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE(code, date)
+);
+CREATE INDEX ON {BEFORE}.stock_kline_data(code);
+CREATE INDEX ON {BEFORE}.stock_kline_data(code, date);
+CREATE INDEX ON {BEFORE}.stock_kline_data(date);
+'''
+
+_AFTER_DDL = f'''
+CREATE TABLE {AFTER}.stock_kline_data (
+    id BIGSERIAL,
+    code TEXT NOT NULL,
+    date DATE NOT NULL,
+    open DOUBLE PRECISION NOT NULL, close DOUBLE PRECISION NOT NULL,
+    high DOUBLE PRECISION NOT NULL, low DOUBLE PRECISION NOT NULL,
+    volume BIGINT NOT NULL, amount DOUBLE PRECISION NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (code, date)
+) PARTITION BY RANGE (date);
+DO $$
+BEGIN
+    FOR y IN 2010..2035 LOOP
+        EXECUTE format(
+            'CREATE TABLE {AFTER}.stock_kline_data_y%s PARTITION OF {AFTER}.stock_kline_data
+             FOR VALUES FROM (%L) TO (%L)', y, make_date(y, 1, 1), make_date(y + 1, 1, 1));
+    END LOOP;
+END $$;
+CREATE TABLE {AFTER}.stock_kline_data_ydefault PARTITION OF {AFTER}.stock_kline_data DEFAULT;
+CREATE INDEX ON {AFTER}.stock_kline_data (code, date DESC) INCLUDE (open, close, high, low, volume, amount);
+CREATE INDEX ON {AFTER}.stock_kline_data (date);
+'''
+
+# 合成数据：codes 只股票 x days 个工作日
+_FILL_SQL = '''
+INSERT INTO {schema}.stock_kline_data (code, date, open, close, high, low, volume, amount)
+SELECT 'sh' || (600000 + c)::text, {date_expr},
+       10 + (c % 50) + sin(d.n / 20.0), 10 + (c % 50) + sin(d.n / 20.0 + 0.1),
+       12 + (c % 50), 8 + (c % 50), 0, 1e6
+FROM generate_series(0, $1 - 1) AS c,
+     (SELECT day, row_number() OVER (ORDER BY day) AS n
+      FROM generate_series(date '2020-01-01', date '2020-01-01' + $2 * 2, interval '1 day') AS day
+      WHERE extract(isodow FROM day) < 6
+      LIMIT $2) AS d
+'''
+
+
+def _fetch_last_bars(rows):
+    """get_by_code 的客户端处理：转 DataFrame 并解析日期"""
+    df = pd.DataFrame([dict(r) for r in rows])
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def _queries(codes):
+    """(名称, 迁移前 SQL, 迁移前参数, 迁移后 SQL, 迁移后参数, 客户端处理)"""
+    code = codes[len(codes) // 2]
+    sample = codes[:20]
+    need_update_codes = codes[:500]
+
+    def parse_latest_text(rows):
+        today = datetime.now()
+        return [(today - datetime.strptime(r['max_date'], '%Y-%m-%d')).days for r in rows if r['max_date']]
+
+    def parse_latest_date(rows):
+        today = date.today()
+        return [(today - r['max_date']).days for r in rows if r['max_date']]
+
+    return [
+        ('get_by_code(limit=1000)',
+         'SELECT date, open, close, high, low, volume, amount FROM {t} '
+         'WHERE code = $1 ORDER BY date DESC LIMIT $2', (code, 1000),
+         'SELECT date, open, close, high, low, volume, amount FROM {t} '
+         'WHERE code = $1 ORDER BY date DESC LIMIT $2', (code, 1000),
+         (_fetch_last_bars, _fetch_last_bars)),
+        ('get_latest_date',
+         'SELECT MAX(date) AS max_date FROM {t} WHERE code = $1', (code,),
+         'SELECT MAX(date) AS max_date FROM {t} WHERE code = $1', (code,),
+         (parse_latest_text, parse_latest_date)),
+        (f'get_latest_dates_batch({len(need_update_codes)})',
+         'SELECT code, MAX(date) AS max_date FROM {t} WHERE code = ANY($1) GROUP BY code',
+         (need_update_codes,),
+         'SELECT c.code, (SELECT k.date FROM {t} k WHERE k.code = c.code '
+         'ORDER BY k.date DESC LIMIT 1) AS max_date FROM unnest($1::text[]) AS c(code)',
+         (need_update_codes,),
+         (parse_latest_text, parse_latest_date)),
+        (f'get_batch_by_codes({len(sample)})',
+         'SELECT code, date, open, close, high, low, volume, amount FROM {t} '
+         'WHERE code = ANY($1) ORDER BY code, date DESC', (sample,),
+         'SELECT code, date, open, close, high, low, volume, amount FROM {t} '
+         'WHERE code = ANY($1) ORDER BY code, date DESC', (sample,),
+         (None, None)),
+        ('export_kline_data(1年)',
+         'SELECT date, open, close, high, low, volume, amount FROM {t} '
+         'WHERE code = $1 AND date >= $2 AND date <= $3 ORDER BY date ASC', (code, '2021-01-01', '2021-12-31'),
+         'SELECT date, open, close, high, low, volume, amount FROM {t} '
+         'WHERE code = $1 AND date >= $2 AND date <= $3 ORDER BY date ASC',
+         (code, date(2021, 1, 1), date(2021, 12, 31)),
+         (None, None)),
+    ]
+
+
+async def _time_query(conn, schema, sql, params, post, repeat):
+    """执行 repeat 次，返回耗时中位数（毫秒）
+
+    表名带 schema 前缀：asyncpg 按 SQL 文本缓存预备语句，不能靠 search_path 切换。
+    """
+    sql = sql.replace('{t}', f'{schema}.stock_kline_data')
+    await conn.fetch(sql, *params)  # 预热
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = await conn.fetch(sql, *params)
+        if post:
+            post(rows)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main(args):
+    await init_db_pool()
+    try:
+        async with get_db_conn() as conn:
+            for schema, ddl, date_expr in ((BEFORE, _BEFORE_DDL, "to_char(d.day, 'YYYY-MM-DD')"),
+                                           (AFTER, _AFTER_DDL, 'd.day::date')):
+                await conn.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema}')
+                await conn.execute(ddl)
+                start = time.perf_counter()
+                await conn.execute(_FILL_SQL.format(schema=schema, date_expr=date_expr), args.codes, args.days)
+                await conn.execute(f'VACUUM ANALYZE {schema}.stock_kline_data')
+                size = await conn.fetchval(
+                    '''SELECT pg_size_pretty(sum(pg_total_relation_size(c.oid)))
+                       FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+                       WHERE n.nspname = $1 AND c.relkind IN ('r', 'p')''', schema)
+                print(f"{schema}: 填充 {args.codes} x {args.days} 行，耗时 {time.perf_counter() - start:.1f}秒，"
+                      f"表+索引 {size}")
+
+            codes = [f'sh{600000 + c}' for c in range(args.codes)]
+            print(f"\n{'查询':<32}{'迁移前ms':>10}{'迁移后ms':>10}{'加速':>8}")
+            for name, before_sql, before_params, after_sql, after_params, (before_post, after_post) in _queries(codes):
+                before = await _time_query(conn, BEFORE, before_sql, before_params, before_post, args.repeat)
+                after = await _time_query(conn, AFTER, after_sql, after_params, after_post, args.repeat)
+                print(f"{name:<32}{before:>10.2f}{after:>10.2f}{before / after if after else 0:>7.1f}x")
+
+            if not args.keep:
+                await conn.execute(f'DROP SCHEMA {BEFORE} CASCADE; DROP SCHEMA {AFTER} CASCADE')
+    finally:
+        await close_db_pool()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='K线表结构迁移前后查询基准')
+    parser.add_argument('--codes', type=int, default=500)
+    parser.add_argument('--days', type=int, default=1500)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--keep', action='store_true', help='保留临时 schema')
+    asyncio.run(main(parser.parse_args()))
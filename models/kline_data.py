@@ -1,6 +1,6 @@
 # models/kline_data.py
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime
 
 
 @dataclass
@@ -8,7 +8,7 @@ class KlineData:
     """K线数据实体"""
     id: int
     code: str
-    date: str
+    date: date
     open: float
     close: float
     high: float
@@ -23,7 +23,7 @@ class KlineData:
         return {
             'id': self.id,
             'code': self.code,
-            'date': self.date,
+            'date': self.date.isoformat() if self.date else None,
             'open': self.open,
             'close': self.close,
             'high': self.high,
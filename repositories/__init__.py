@@ -5,6 +5,10 @@ from .cache_repository import MonitorDataCacheRepository
 from .kline_repository import KlineRepository
 from .xueqiu_repository import XueqiuCubeRepository
 from .stock_list_repository import StockListRepository
+from .dead_letter_repository import KlineDeadLetterRepository
+from .kline_bars_repository import KlineBarsRepository
+from .ema_state_repository import EmaStateRepository
+from .stock_indicator_repository import StockIndicatorRepository
 
 __all__ = [
     'StockRepository',
@@ -13,4 +17,8 @@ __all__ = [
     'KlineRepository',
     'XueqiuCubeRepository',
     'StockListRepository',
+    'KlineDeadLetterRepository',
+    'KlineBarsRepository',
+    'EmaStateRepository',
+    'StockIndicatorRepository',
 ]
\ No newline at end of file
@@ -0,0 +1,226 @@
+# repositories/backfill_repository.py
+from utils.db import get_db_conn
+from utils.logger import get_logger
+
+logger = get_logger('backfill_repository')
+
+_JOB_COLUMNS = '''id, status, start_date, end_date, cursor, total_count, done_count, failed_count,
+                  elapsed_seconds, error, lease_owner, lease_expires_at, created_at, updated_at, finished_at'''
+
+
+def _job_to_dict(row):
+    """任务记录转字典"""
+    if row is None:
+        return None
+    job = dict(row)
+    for key in ('lease_expires_at', 'created_at', 'updated_at', 'finished_at'):
+        if job[key] is not None:
+            job[key] = job[key].strftime('%Y-%m-%d %H:%M:%S')
+    return job
+
+
+class BackfillRepository:
+    """K线历史回补任务仓储层（异步版本）"""
+
+    @staticmethod
+    async def create_job(start_date, end_date, codes):
+        """创建回补任务并登记待处理股票
+
+        Args:
+            start_date: 开始日期 YYYYMMDD
+            end_date: 结束日期 YYYYMMDD
+            codes: 股票代码列表（带交易所前缀）
+
+        Returns:
+            int: 任务ID
+        """
+        codes = sorted(set(codes))
+        logger.info(f"SQL: 创建回补任务 {start_date}-{end_date}，股票数量: {len(codes)}")
+        async with get_db_conn() as conn:
+            async with conn.transaction():
+                job_id = await conn.fetchval(
+                    '''INSERT INTO kline_backfill_jobs (start_date, end_date, total_count)
+                       VALUES ($1, $2, $3)
+                       RETURNING id''',
+                    start_date, end_date, len(codes)
+                )
+                await conn.copy_records_to_table(
+                    'kline_backfill_items',
+                    records=[(job_id, code) for code in codes],
+                    columns=['job_id', 'code']
+                )
+            return job_id
+
+    @staticmethod
+    async def get_job(job_id):
+        """获取任务"""
+        async with get_db_conn() as conn:
+            row = await conn.fetchrow(f'SELECT {_JOB_COLUMNS} FROM kline_backfill_jobs WHERE id = $1', job_id)
+            return _job_to_dict(row)
+
+    @staticmethod
+    async def get_jobs(limit=20):
+        """获取最近的任务"""
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                f'SELECT {_JOB_COLUMNS} FROM kline_backfill_jobs ORDER BY id DESC LIMIT $1', limit
+            )
+            return [_job_to_dict(row) for row in rows]
+
+    @staticmethod
+    async def get_jobs_by_status(statuses):
+        """按状态获取任务"""
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                f'SELECT {_JOB_COLUMNS} FROM kline_backfill_jobs WHERE status = ANY($1) ORDER BY id',
+                list(statuses)
+            )
+            return [_job_to_dict(row) for row in rows]
+
+    @staticmethod
+    async def set_status(job_id, status, error=None):
+        """更新任务状态"""
+        async with get_db_conn() as conn:
+            await conn.execute(
+                '''UPDATE kline_backfill_jobs
+                   SET status = $2, error = $3, updated_at = CURRENT_TIMESTAMP,
+                       finished_at = CASE WHEN $2 IN ('completed', 'failed') THEN CURRENT_TIMESTAMP END
+                   WHERE id = $1''',
+                job_id, status, error
+            )
+
+    @staticmethod
+    async def claim_job(job_id, owner, lease_seconds=900, reopen_failed=False):
+        """领取任务租约（多进程安全）：任务未完成且没有其他进程持有未过期的租约时写入租约
+
+        Args:
+            reopen_failed: 是否允许领取已失败的任务（显式继续），领取时任务状态恢复为 pending
+
+        Returns:
+            bool: 是否领取成功
+        """
+        async with get_db_conn() as conn:
+            row = await conn.fetchrow(
+                '''UPDATE kline_backfill_jobs
+                   SET lease_owner = $2,
+                       lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $3),
+                       status = CASE WHEN status = 'failed' THEN 'pending' ELSE status END,
+                       error = CASE WHEN status = 'failed' THEN NULL ELSE error END,
+                       finished_at = CASE WHEN status = 'failed' THEN NULL ELSE finished_at END
+                   WHERE id = $1
+                     AND status <> 'completed'
+                     AND ($4 OR status <> 'failed')
+                     AND (lease_owner IS NULL OR lease_owner = $2 OR lease_expires_at < CURRENT_TIMESTAMP)
+                   RETURNING id''',
+                job_id, owner, float(lease_seconds), reopen_failed
+            )
+            logger.info(f"SQL: {owner} 领取回补任务 {job_id}: {'成功' if row else '已被其他进程持有或已结束'}")
+            return row is not None
+
+    @staticmethod
+    async def requeue_failed_items(job_id):
+        """把失败的股票重新置为待处理，并重置游标（已完成的股票不会重复处理）
+
+        调用方需持有任务租约。
+
+        Returns:
+            int: 重新排队的股票数
+        """
+        async with get_db_conn() as conn:
+            async with conn.transaction():
+                result = await conn.execute(
+                    '''UPDATE kline_backfill_items
+                       SET status = 'pending', error = NULL, updated_at = CURRENT_TIMESTAMP
+                       WHERE job_id = $1 AND status = 'failed'
+                    ''',
+                    job_id
+                )
+                requeued = int(result.split()[-1])
+                if requeued:
+                    await conn.execute(
+                        '''UPDATE kline_backfill_jobs
+                           SET cursor = NULL, failed_count = failed_count - $2, updated_at = CURRENT_TIMESTAMP
+                           WHERE id = $1''',
+                        job_id, requeued
+                    )
+            logger.info(f"SQL: 回补任务 {job_id} 重新排队 {requeued} 只失败的股票")
+            return requeued
+
+    @staticmethod
+    async def renew_job_lease(job_id, owner, lease_seconds=900):
+        """续租（由心跳调用）
+
+        Returns:
+            bool: 租约是否仍由 owner 持有
+        """
+        async with get_db_conn() as conn:
+            result = await conn.execute(
+                '''UPDATE kline_backfill_jobs
+                   SET lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $3)
+                   WHERE id = $1 AND lease_owner = $2''',
+                job_id, owner, float(lease_seconds)
+            )
+            return int(result.split()[-1]) > 0
+
+    @staticmethod
+    async def release_job(job_id, owner):
+        """释放任务租约"""
+        async with get_db_conn() as conn:
+            await conn.execute(
+                '''UPDATE kline_backfill_jobs
+                   SET lease_owner = NULL, lease_expires_at = NULL
+                   WHERE id = $1 AND lease_owner = $2''',
+                job_id, owner
+            )
+
+    @staticmethod
+    async def get_pending_codes(job_id, cursor, limit):
+        """按代码顺序获取游标之后的待处理股票"""
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                '''SELECT code FROM kline_backfill_items
+                   WHERE job_id = $1 AND status = 'pending' AND code > $2
+                   ORDER BY code
+                   LIMIT $3''',
+                job_id, cursor or '', limit
+            )
+            return [row['code'] for row in rows]
+
+    @staticmethod
+    async def complete_chunk(job_id, codes, failures, elapsed):
+        """在同一事务中记录一块股票的结果并推进游标
+
+        Args:
+            job_id: 任务ID
+            codes: 本块股票代码（按代码排序）
+            failures: {code: (error, attempts)}
+            elapsed: 本块耗时（秒）
+        """
+        done = [code for code in codes if code not in failures]
+        failed = [(code, failures[code][0]) for code in codes if code in failures]
+
+        async with get_db_conn() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    '''UPDATE kline_backfill_items
+                       SET status = 'done', error = NULL, updated_at = CURRENT_TIMESTAMP
+                       WHERE job_id = $1 AND code = ANY($2)''',
+                    job_id, done
+                )
+                if failed:
+                    await conn.executemany(
+                        '''UPDATE kline_backfill_items
+                           SET status = 'failed', error = $3, updated_at = CURRENT_TIMESTAMP
+                           WHERE job_id = $1 AND code = $2''',
+                        [(job_id, code, error) for code, error in failed]
+                    )
+                await conn.execute(
+                    '''UPDATE kline_backfill_jobs
+                       SET cursor = $2,
+                           done_count = done_count + $3,
+                           failed_count = failed_count + $4,
+                           elapsed_seconds = elapsed_seconds + $5,
+                           updated_at = CURRENT_TIMESTAMP
+                       WHERE id = $1''',
+                    job_id, codes[-1], len(done), len(failed), elapsed
+                )
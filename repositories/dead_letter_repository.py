@@ -0,0 +1,103 @@
+# repositories/dead_letter_repository.py
+import os
+from utils.db import get_db_conn
+from utils.logger import get_logger
+
+logger = get_logger('dead_letter_repository')
+
+
+class KlineDeadLetterRepository:
+    """K线抓取死信仓储层（异步版本）"""
+
+    @staticmethod
+    async def record_failures(failures):
+        """记录抓取失败的股票，已存在则累加次数并按失败轮数指数退避
+
+        下次重试时间 = 当前时间 + min(KLINE_DEAD_LETTER_MAX_DELAY_MINUTES,
+                                       KLINE_DEAD_LETTER_BASE_DELAY_MINUTES * 2^(失败轮数-1)) 分钟
+
+        Args:
+            failures: {code: (error, attempts)}
+        """
+        if not failures:
+            return
+
+        base_delay = float(os.getenv('KLINE_DEAD_LETTER_BASE_DELAY_MINUTES', '30'))
+        max_delay = float(os.getenv('KLINE_DEAD_LETTER_MAX_DELAY_MINUTES', '720'))
+        data = [
+            (code, error, attempts, base_delay, max_delay)
+            for code, (error, attempts) in failures.items()
+        ]
+
+        logger.info(f"SQL: 记录 {len(data)} 只股票到死信表")
+        async with get_db_conn() as conn:
+            await conn.executemany(
+                '''INSERT INTO kline_dead_letter (code, error, attempts, failures, next_retry_at)
+                   VALUES ($1, $2, $3, 1, CURRENT_TIMESTAMP + make_interval(mins => LEAST($5::float8, $4::float8)::int))
+                   ON CONFLICT (code) DO UPDATE
+                   SET error = EXCLUDED.error,
+                       attempts = kline_dead_letter.attempts + EXCLUDED.attempts,
+                       failures = kline_dead_letter.failures + 1,
+                       last_failed_at = CURRENT_TIMESTAMP,
+                       next_retry_at = CURRENT_TIMESTAMP + make_interval(
+                           mins => LEAST($5::float8, $4::float8 * power(2, kline_dead_letter.failures))::int
+                       )''',
+                data
+            )
+
+    @staticmethod
+    async def remove(codes):
+        """抓取成功后移出死信表"""
+        if not codes:
+            return 0
+
+        async with get_db_conn() as conn:
+            result = await conn.execute('DELETE FROM kline_dead_letter WHERE code = ANY($1)', list(codes))
+            removed = int(result.split()[-1])
+            if removed:
+                logger.info(f"SQL: {removed} 只股票已移出死信表")
+            return removed
+
+    @staticmethod
+    async def get_due(limit=100, max_failures=None):
+        """获取已到重试时间的股票代码
+
+        Args:
+            limit: 最大数量
+            max_failures: 失败轮数上限，达到上限的不再自动重试（保留在表中待人工处理）
+        """
+        if max_failures is None:
+            max_failures = int(os.getenv('KLINE_DEAD_LETTER_MAX_FAILURES', '10'))
+
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                '''SELECT code FROM kline_dead_letter
+                   WHERE next_retry_at <= CURRENT_TIMESTAMP AND failures < $1
+                   ORDER BY next_retry_at
+                   LIMIT $2''',
+                max_failures, limit
+            )
+            logger.debug(f"SQL: 死信表中 {len(rows)} 只股票到期待重试")
+            return [row['code'] for row in rows]
+
+    @staticmethod
+    async def get_all():
+        """获取死信表全部记录"""
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                '''SELECT code, error, attempts, failures, first_failed_at, last_failed_at, next_retry_at
+                   FROM kline_dead_letter
+                   ORDER BY last_failed_at DESC'''
+            )
+            return [
+                {
+                    'code': row['code'],
+                    'error': row['error'],
+                    'attempts': row['attempts'],
+                    'failures': row['failures'],
+                    'first_failed_at': row['first_failed_at'].strftime('%Y-%m-%d %H:%M:%S') if row['first_failed_at'] else None,
+                    'last_failed_at': row['last_failed_at'].strftime('%Y-%m-%d %H:%M:%S') if row['last_failed_at'] else None,
+                    'next_retry_at': row['next_retry_at'].strftime('%Y-%m-%d %H:%M:%S') if row['next_retry_at'] else None,
+                }
+                for row in rows
+            ]
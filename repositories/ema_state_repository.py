@@ -0,0 +1,92 @@
+# repositories/ema_state_repository.py
+from utils.db import get_db_conn
+from utils.logger import get_logger
+
+logger = get_logger('ema_state_repository')
+
+
+class EmaStateRepository:
+    """EMA增量状态仓储层（异步版本）"""
+
+    _STAGING_COLUMNS = ['code', 'timeframe', 'period', 'last_date', 'value', 'prev_value', 'bars', 'last_close']
+
+    @staticmethod
+    async def get_states(codes, timeframes=None):
+        """批量读取EMA状态
+
+        Args:
+            codes: 股票代码列表
+            timeframes: 周期列表，默认全部
+
+        Returns:
+            dict: {(code, timeframe): {period: {'last_date', 'value', 'prev_value', 'bars', 'last_close'}}}
+        """
+        if not codes:
+            return {}
+
+        async with get_db_conn() as conn:
+            if timeframes is None:
+                rows = await conn.fetch(
+                    '''SELECT code, timeframe, period, last_date, value, prev_value, bars, last_close
+                       FROM ema_state WHERE code = ANY($1)''',
+                    codes
+                )
+            else:
+                rows = await conn.fetch(
+                    '''SELECT code, timeframe, period, last_date, value, prev_value, bars, last_close
+                       FROM ema_state WHERE code = ANY($1) AND timeframe = ANY($2)''',
+                    codes, list(timeframes)
+                )
+
+        states = {}
+        for row in rows:
+            states.setdefault((row['code'], row['timeframe']), {})[row['period']] = {
+                'last_date': row['last_date'],
+                'value': row['value'],
+                'prev_value': row['prev_value'],
+                'bars': row['bars'],
+                'last_close': row['last_close'],
+            }
+        return states
+
+    @staticmethod
+    async def save_states(records):
+        """批量写入EMA状态
+
+        Args:
+            records: [(code, timeframe, period, last_date, value, prev_value, bars, last_close), ...]
+
+        Returns:
+            int: 写入条数
+        """
+        if not records:
+            return 0
+
+        async with get_db_conn() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    '''CREATE TEMP TABLE ema_state_staging (
+                           code TEXT, timeframe TEXT, period INTEGER, last_date DATE,
+                           value DOUBLE PRECISION, prev_value DOUBLE PRECISION, bars INTEGER,
+                           last_close DOUBLE PRECISION
+                       ) ON COMMIT DROP'''
+                )
+                await conn.copy_records_to_table(
+                    'ema_state_staging', records=records, columns=EmaStateRepository._STAGING_COLUMNS
+                )
+                await conn.execute(
+                    '''INSERT INTO ema_state
+                           (code, timeframe, period, last_date, value, prev_value, bars, last_close, updated_at)
+                       SELECT DISTINCT ON (code, timeframe, period)
+                              code, timeframe, period, last_date, value, prev_value, bars, last_close,
+                              CURRENT_TIMESTAMP
+                       FROM ema_state_staging
+                       ORDER BY code, timeframe, period
+                       ON CONFLICT (code, timeframe, period) DO UPDATE
+                       SET last_date = EXCLUDED.last_date, value = EXCLUDED.value,
+                           prev_value = EXCLUDED.prev_value, bars = EXCLUDED.bars,
+                           last_close = EXCLUDED.last_close, updated_at = CURRENT_TIMESTAMP'''
+                )
+
+        logger.info(f"SQL: 写入 {len(records)} 条EMA状态")
+        return len(records)
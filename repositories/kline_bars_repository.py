@@ -0,0 +1,112 @@
+# repositories/kline_bars_repository.py
+import pandas as pd
+from utils.db import get_db_conn
+from utils.logger import get_logger
+
+logger = get_logger('kline_bars_repository')
+
+
+class KlineBarsRepository:
+    """多日K线（2日 / 3日 / 周线）仓储层（异步版本）"""
+
+    _STAGING_COLUMNS = ['code', 'timeframe', 'bucket_start', 'last_date',
+                        'open', 'close', 'high', 'low', 'amount', 'bar_days']
+
+    @staticmethod
+    async def save_bars(records):
+        """批量写入多日K线，已存在的分桶覆盖更新
+
+        Args:
+            records: [(code, timeframe, bucket_start, last_date, open, close, high, low, amount, bar_days), ...]
+
+        Returns:
+            int: 写入条数
+        """
+        if not records:
+            return 0
+
+        async with get_db_conn() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    '''CREATE TEMP TABLE kline_bars_staging (
+                           code TEXT, timeframe TEXT, bucket_start DATE, last_date DATE,
+                           open DOUBLE PRECISION, close DOUBLE PRECISION, high DOUBLE PRECISION,
+                           low DOUBLE PRECISION, amount DOUBLE PRECISION, bar_days INTEGER
+                       ) ON COMMIT DROP'''
+                )
+                await conn.copy_records_to_table(
+                    'kline_bars_staging', records=records, columns=KlineBarsRepository._STAGING_COLUMNS
+                )
+                await conn.execute(
+                    '''INSERT INTO stock_kline_bars
+                           (code, timeframe, bucket_start, last_date, open, close, high, low, amount, bar_days, updated_at)
+                       SELECT DISTINCT ON (code, timeframe, bucket_start)
+                              code, timeframe, bucket_start, last_date, open, close, high, low, amount, bar_days,
+                              CURRENT_TIMESTAMP
+                       FROM kline_bars_staging
+                       ORDER BY code, timeframe, bucket_start
+                       ON CONFLICT (code, timeframe, bucket_start) DO UPDATE
+                       SET last_date = EXCLUDED.last_date, open = EXCLUDED.open, close = EXCLUDED.close,
+                           high = EXCLUDED.high, low = EXCLUDED.low, amount = EXCLUDED.amount,
+                           bar_days = EXCLUDED.bar_days, updated_at = CURRENT_TIMESTAMP'''
+                )
+
+        logger.info(f"SQL: 写入 {len(records)} 条多日K线")
+        return len(records)
+
+    @staticmethod
+    async def get_by_code(code, timeframe, limit=250):
+        """获取一只股票最近 limit 根多日K线
+
+        Returns:
+            DataFrame: 列为 日期（分桶起始日，YYYY-MM-DD）、开盘、收盘、最高、最低、amount，按日期升序；
+                       没有数据时返回 None
+        """
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                '''SELECT bucket_start, open, close, high, low, amount
+                   FROM stock_kline_bars
+                   WHERE code = $1 AND timeframe = $2
+                   ORDER BY bucket_start DESC LIMIT $3''',
+                code, timeframe, limit
+            )
+
+        if not rows:
+            return None
+        df = pd.DataFrame(rows[::-1], columns=['日期', '开盘', '收盘', '最高', '最低', 'amount'])
+        df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
+        return df
+
+    @staticmethod
+    async def get_batch(codes, timeframe, limit=250):
+        """批量获取多只股票最近 limit 根多日K线
+
+        Returns:
+            dict: {code: DataFrame}（列同 get_by_code），没有数据的股票为 None
+        """
+        result = dict.fromkeys(codes)
+        if not codes:
+            return result
+
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                '''SELECT c.code, b.bucket_start, b.open, b.close, b.high, b.low, b.amount
+                   FROM unnest($1::text[]) WITH ORDINALITY AS c(code, ord)
+                   CROSS JOIN LATERAL (
+                       SELECT bucket_start, open, close, high, low, amount
+                       FROM stock_kline_bars
+                       WHERE code = c.code AND timeframe = $2
+                       ORDER BY bucket_start DESC
+                       LIMIT $3
+                   ) AS b
+                   ORDER BY c.ord, b.bucket_start DESC''',
+                list(dict.fromkeys(codes)), timeframe, limit
+            )
+
+        if not rows:
+            return result
+        df = pd.DataFrame(rows, columns=['code', '日期', '开盘', '收盘', '最高', '最低', 'amount'])
+        df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
+        for code, group in df.groupby('code', sort=False):
+            result[code] = group.drop(columns='code').iloc[::-1].reset_index(drop=True)
+        return result
@@ -1,7 +1,11 @@
 from utils.db import get_db_conn
 from utils.logger import get_logger
-from datetime import datetime
+from datetime import date, datetime
+import os
+import time
+import numpy as np
 import pandas as pd
+from utils.kline_normalizer import normalize_kline_frame, build_records, count_rows
 
 logger = get_logger('kline_repository')
 
@@ -9,28 +13,24 @@ logger = get_logger('kline_repository')
 class KlineRepository:
     """K线数据仓储层（异步版本）"""
 
+    _UPSERT_SQL = '''INSERT INTO stock_kline_data
+                       (code, date, open, close, high, low, volume, amount, updated_at)
+                       VALUES ($1, $2, $3, $4, $5, $6, $7, $8, CURRENT_TIMESTAMP)
+                       ON CONFLICT (code, date) DO UPDATE
+                       SET open = EXCLUDED.open, close = EXCLUDED.close, high = EXCLUDED.high,
+                           low = EXCLUDED.low, volume = EXCLUDED.volume, amount = EXCLUDED.amount,
+                           updated_at = CURRENT_TIMESTAMP'''
+
+    _STAGING_COLUMNS = ['code', 'date', 'open', 'close', 'high', 'low', 'volume', 'amount']
+
     @staticmethod
     async def save_batch(code, kline_data):
         """批量保存K线数据"""
         logger.info(f"SQL: 批量插入/更新 {code} 的 K线数据，数据量: {len(kline_data)}")
         async with get_db_conn() as conn:
             try:
-                insert_data = [
-                    (code, row['日期'].strftime('%Y-%m-%d'), row['开盘'], row['收盘'],
-                     row['最高'], row['最低'], 0, row.get('amount', 0))
-                    for _, row in kline_data.iterrows()
-                ]
-                
-                await conn.executemany(
-                    '''INSERT INTO stock_kline_data
-                       (code, date, open, close, high, low, volume, amount, updated_at)
-                       VALUES ($1, $2, $3, $4, $5, $6, $7, $8, CURRENT_TIMESTAMP)
-                       ON CONFLICT (code, date) DO UPDATE
-                       SET open = EXCLUDED.open, close = EXCLUDED.close, high = EXCLUDED.high,
-                           low = EXCLUDED.low, volume = EXCLUDED.volume, amount = EXCLUDED.amount,
-                           updated_at = CURRENT_TIMESTAMP''',
-                    insert_data
-                )
+                insert_data = KlineRepository._build_records(code, kline_data)
+                await conn.executemany(KlineRepository._UPSERT_SQL, insert_data)
                 logger.info(f"SQL: 批量插入/更新成功")
                 return True, len(insert_data)
             except Exception as e:
@@ -38,53 +38,92 @@ class KlineRepository:
                 return False, str(e)
 
     @staticmethod
-    async def save_all_batch(kline_data_dict):
+    def _build_records(code, data):
+        """按列向量化构建写入记录，避免 iterrows 的逐行开销
+
+        Args:
+            code: 股票代码
+            data: K线 DataFrame，或 normalize_kline_frame 规整后的列数组
+
+        Returns:
+            list: [(code, date, open, close, high, low, volume, amount), ...]
+        """
+        columns = data if isinstance(data, dict) else normalize_kline_frame(data)
+        return build_records(code, columns)
+
+    @staticmethod
+    async def _copy_merge(conn, records):
+        """二进制 COPY 到临时表，再用一条 INSERT ... SELECT ... ON CONFLICT 合并"""
+        async with conn.transaction():
+            await conn.execute(
+                '''CREATE TEMP TABLE kline_staging (
+                       code TEXT, date DATE, open DOUBLE PRECISION, close DOUBLE PRECISION,
+                       high DOUBLE PRECISION, low DOUBLE PRECISION, volume BIGINT, amount DOUBLE PRECISION,
+                       ord BIGINT GENERATED ALWAYS AS IDENTITY  -- COPY 写入顺序
+                   ) ON COMMIT DROP'''
+            )
+            await conn.copy_records_to_table(
+                'kline_staging', records=records, columns=KlineRepository._STAGING_COLUMNS
+            )
+            # 同一批内可能出现重复 (code, date)，合并前去重（保留最后写入的一行，与逐行 upsert 一致），
+            # 否则 ON CONFLICT 会报错
+            await conn.execute(
+                '''INSERT INTO stock_kline_data
+                       (code, date, open, close, high, low, volume, amount, updated_at)
+                   SELECT DISTINCT ON (code, date)
+                          code, date, open, close, high, low, volume, amount, CURRENT_TIMESTAMP
+                   FROM kline_staging
+                   ORDER BY code, date, ord DESC
+                   ON CONFLICT (code, date) DO UPDATE
+                   SET open = EXCLUDED.open, close = EXCLUDED.close, high = EXCLUDED.high,
+                       low = EXCLUDED.low, volume = EXCLUDED.volume, amount = EXCLUDED.amount,
+                       updated_at = CURRENT_TIMESTAMP'''
+            )
+
+    @staticmethod
+    async def save_all_batch(kline_data_dict, mode=None):
         """批量保存多只股票的K线数据
         
         Args:
-            kline_data_dict: {code: DataFrame} 的字典
+            kline_data_dict: {code: DataFrame 或规整后的列数组} 的字典
+            mode: 写入模式 'copy'（二进制 COPY 到临时表后集合合并）/ 'executemany'（逐行 upsert），
+                  默认读取环境变量 KLINE_SAVE_MODE
             
         Returns:
             tuple: (success_count, total_count, total_records)
         """
         if not kline_data_dict:
             return 0, 0, 0
-        
-        logger.info(f"SQL: 批量保存 {len(kline_data_dict)} 只股票的K线数据")
+
+        mode = mode or os.getenv('KLINE_SAVE_MODE', 'copy').lower()
+        logger.info(f"SQL: 批量保存 {len(kline_data_dict)} 只股票的K线数据（{mode}）")
         
         async with get_db_conn() as conn:
             try:
+                start = time.perf_counter()
                 all_insert_data = []
-                total_records = 0
                 saved_count = 0
                 
-                for code, df in kline_data_dict.items():
-                    if df is None or df.empty:
+                for code, data in kline_data_dict.items():
+                    if data is None or count_rows(data) == 0:
                         continue
                     
-                    insert_data = [
-                        (code, row['日期'].strftime('%Y-%m-%d'), row['开盘'], row['收盘'],
-                         row['最高'], row['最低'], 0, row.get('amount', 0))
-                        for _, row in df.iterrows()
-                    ]
-                    all_insert_data.extend(insert_data)
-                    total_records += len(insert_data)
+                    all_insert_data.extend(KlineRepository._build_records(code, data))
                     saved_count += 1
                 
+                total_records = len(all_insert_data)
                 if not all_insert_data:
                     return 0, len(kline_data_dict), 0
                 
-                await conn.executemany(
-                    '''INSERT INTO stock_kline_data
-                       (code, date, open, close, high, low, volume, amount, updated_at)
-                       VALUES ($1, $2, $3, $4, $5, $6, $7, $8, CURRENT_TIMESTAMP)
-                       ON CONFLICT (code, date) DO UPDATE
-                       SET open = EXCLUDED.open, close = EXCLUDED.close, high = EXCLUDED.high,
-                           low = EXCLUDED.low, volume = EXCLUDED.volume, amount = EXCLUDED.amount,
-                           updated_at = CURRENT_TIMESTAMP''',
-                    all_insert_data
-                )
-                logger.info(f"SQL: 批量保存成功，{saved_count} 只股票，{total_records} 条记录")
+                if mode == 'copy':
+                    await KlineRepository._copy_merge(conn, all_insert_data)
+                else:
+                    await conn.executemany(KlineRepository._UPSERT_SQL, all_insert_data)
+
+                elapsed = time.perf_counter() - start
+                rate = total_records / elapsed if elapsed > 0 else 0
+                logger.info(f"SQL: 批量保存成功，{saved_count} 只股票，{total_records} 条记录，"
+                            f"耗时 {elapsed:.2f}秒，{rate:.0f} 行/秒（{mode}）")
                 return saved_count, len(kline_data_dict), total_records
             except Exception as e:
                 logger.error(f"SQL: 批量保存失败: {str(e)}")
@@ -107,46 +146,108 @@ class KlineRepository:
         logger.info(f"SQL: 批量查询 {len(codes)} 只股票的K线数据，每只最多 {limit} 条")
 
         async with get_db_conn() as conn:
-            # 使用 IN 子句批量查询
+            # 每只股票沿 (code, date DESC) 覆盖索引只读取最近 limit 条，
+            # 传输量与 limit x 股票数 成正比，与历史长度无关
+            rows = await conn.fetch(
+                '''SELECT c.code, k.date, k.open, k.close, k.high, k.low, k.volume, k.amount
+                   FROM unnest($1::text[]) WITH ORDINALITY AS c(code, ord)
+                   CROSS JOIN LATERAL (
+                       SELECT date, open, close, high, low, volume, amount
+                       FROM stock_kline_data
+                       WHERE code = c.code
+                       ORDER BY date DESC
+                       LIMIT $2
+                   ) AS k
+                   ORDER BY c.ord, k.date DESC''',
+                list(dict.fromkeys(codes)), limit
+            )
+
+        logger.info(f"SQL: 批量查询返回 {len(rows)} 条记录")
+
+        return KlineRepository._frames_by_code(codes, rows)
+
+    @staticmethod
+    async def get_since_batch(since_dates, limit=250):
+        """批量获取多只股票指定日期（含）之后的K线，用于内存K线缓存的增量同步
+
+        Args:
+            since_dates: {code: date} 的字典
+            limit: 每只股票返回的最大记录数（取最近的 limit 条）
+
+        Returns:
+            dict: {code: DataFrame}，没有新数据的股票为 None
+        """
+        if not since_dates:
+            return {}
+
+        codes = list(since_dates)
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                '''SELECT c.code, k.date, k.open, k.close, k.high, k.low, k.volume, k.amount
+                   FROM unnest($1::text[], $2::date[]) WITH ORDINALITY AS c(code, since, ord)
+                   CROSS JOIN LATERAL (
+                       SELECT date, open, close, high, low, volume, amount
+                       FROM stock_kline_data
+                       WHERE code = c.code AND date >= c.since
+                       ORDER BY date DESC
+                       LIMIT $3
+                   ) AS k
+                   ORDER BY c.ord, k.date DESC''',
+                codes, [since_dates[code] for code in codes], limit
+            )
+
+        logger.debug(f"SQL: 增量查询 {len(codes)} 只股票，返回 {len(rows)} 条记录")
+        return KlineRepository._frames_by_code(codes, rows)
+
+    @staticmethod
+    async def get_close_series(codes, start_date=None, end_date=None):
+        """批量获取多只股票区间内的收盘价序列（回测用，每只股票聚合为一行数组，不构造 DataFrame）
+
+        Args:
+            codes: 股票代码列表
+            start_date / end_date: 日期区间（含），None 表示不限制
+
+        Returns:
+            dict: {code: (datetime64[D] 日期数组, float64 收盘价数组)}，按日期正序，无数据的股票不在结果中
+        """
+        if not codes:
+            return {}
+
+        async with get_db_conn() as conn:
             rows = await conn.fetch(
-                '''SELECT code, date, open, close, high, low, volume, amount
+                '''SELECT code, array_agg(date ORDER BY date) AS dates, array_agg(close ORDER BY date) AS closes
                    FROM stock_kline_data
-                   WHERE code = ANY($1)
-                   ORDER BY code, date DESC''',
-                codes
+                   WHERE code = ANY($1::text[])
+                     AND ($2::date IS NULL OR date >= $2)
+                     AND ($3::date IS NULL OR date <= $3)
+                   GROUP BY code''',
+                list(codes), start_date, end_date
             )
 
-            logger.info(f"SQL: 批量查询返回 {len(rows)} 条记录")
-
-            # 按 code 分组数据
-            code_data = {}
-            for row in rows:
-                code = row['code']
-                if code not in code_data:
-                    code_data[code] = []
-                code_data[code].append({
-                    'date': row['date'],
-                    'open': row['open'],
-                    'close': row['close'],
-                    'high': row['high'],
-                    'low': row['low'],
-                    'volume': row['volume'],
-                    'amount': row['amount']
-                })
-
-            # 转换为 DataFrame 并限制数量
-            result = {}
-            for code in codes:
-                if code in code_data and code_data[code]:
-                    data = code_data[code][:limit]  # 限制数量
-                    df = pd.DataFrame(data)
-                    df.columns = ['日期', '开盘', '收盘', '最高', '最低', 'volume', 'amount']
-                    result[code] = df.iloc[::-1]  # 反转回正序
-                else:
-                    result[code] = None
+        logger.debug(f"SQL: 收盘价序列查询 {len(codes)} 只股票，返回 {len(rows)} 只")
+        return {
+            row['code']: (np.array(row['dates'], dtype='datetime64[D]'), np.array(row['closes'], dtype=np.float64))
+            for row in rows
+        }
 
+    @staticmethod
+    def _frames_by_code(codes, rows):
+        """把按股票连续、按日期倒序返回的行切分为 {code: 正序 DataFrame}，无数据的股票为 None
+
+        调用方的 SQL 必须按 (股票在入参中的序号, date DESC) 显式排序，保证同一股票的行连续
+        """
+        result = dict.fromkeys(codes)
+        if not rows:
             return result
 
+        # 一次性构造 DataFrame，再按股票代码变化的位置切分
+        df = pd.DataFrame(rows, columns=['code', '日期', '开盘', '收盘', '最高', '最低', 'volume', 'amount'])
+        row_codes = df.pop('code').to_numpy()
+        bounds = [0, *(np.flatnonzero(row_codes[1:] != row_codes[:-1]) + 1), len(row_codes)]
+        for begin, end in zip(bounds[:-1], bounds[1:]):
+            result[row_codes[begin]] = df.iloc[begin:end].reset_index(drop=True).iloc[::-1]  # 反转回正序
+        return result
+
     @staticmethod
     async def get_by_code(code, limit=250):
         """获取K线数据（返回DataFrame）"""
@@ -202,7 +303,11 @@ class KlineRepository:
 
     @staticmethod
     async def get_latest_date(code):
-        """获取最新K线日期"""
+        """获取最新K线日期
+
+        Returns:
+            date: 最新交易日，没有数据时返回 None
+        """
         logger.debug(f"SQL: SELECT MAX(date) FROM stock_kline_data WHERE code = '{code}'")
         async with get_db_conn() as conn:
             result = await conn.fetchval(
@@ -220,7 +325,7 @@ class KlineRepository:
             codes: 股票代码列表
             
         Returns:
-            dict: {code: latest_date} 的字典
+            dict: {code: latest_date(date)} 的字典
         """
         if not codes:
             return {}
@@ -228,12 +333,13 @@ class KlineRepository:
         logger.debug(f"SQL: 批量查询 {len(codes)} 只股票的最新日期")
         
         async with get_db_conn() as conn:
-            # 使用 ANY 子句批量查询
+            # 每只股票在 (code, date DESC) 索引上只读一条，不聚合整段历史
             results = await conn.fetch(
-                '''SELECT code, MAX(date) as max_date 
-                   FROM stock_kline_data 
-                   WHERE code = ANY($1) 
-                   GROUP BY code''',
+                '''SELECT c.code,
+                          (SELECT k.date FROM stock_kline_data k
+                           WHERE k.code = c.code
+                           ORDER BY k.date DESC LIMIT 1) AS max_date
+                   FROM unnest($1::text[]) AS c(code)''',
                 codes
             )
             
@@ -263,16 +369,12 @@ class KlineRepository:
         
         # 过滤出需要更新的股票
         need_update = []
-        now = datetime.now()
+        today = date.today()
         
         for code in codes:
             latest = latest_dates_dict.get(code)
-            if not latest:
+            if not latest or (today - latest).days >= days:
                 need_update.append(code)
-            else:
-                latest_dt = datetime.strptime(latest, '%Y-%m-%d')
-                if (now - latest_dt).days >= days:
-                    need_update.append(code)
         
         logger.info(f"SQL: 筛选出 {len(need_update)} 只股票需要更新")
         return need_update
@@ -332,6 +434,11 @@ class KlineRepository:
         Returns:
             DataFrame: 包含K线数据的DataFrame，列名包括：日期、开盘、收盘、最高、最低、成交量、成交额
         """
+        if isinstance(start_date, str):
+            start_date = date.fromisoformat(start_date)
+        if isinstance(end_date, str):
+            end_date = date.fromisoformat(end_date)
+
         async with get_db_conn() as conn:
             # 构建查询条件
             if start_date and end_date:
@@ -0,0 +1,144 @@
+# repositories/stock_indicator_repository.py
+from utils.db import get_db_conn
+from utils.indicators import INDICATOR_NAMES
+from utils.logger import get_logger
+
+logger = get_logger('stock_indicator_repository')
+
+# 指标列（与 stock_indicators 表结构一致）
+_VALUE_COLUMNS = ('close',) + INDICATOR_NAMES
+_SELECT_COLUMNS = ', '.join(_VALUE_COLUMNS)
+
+# EPS 缓存有效期条件（与 EpsCacheRepository.get 的 24 小时一致）
+_EPS_FRESH_AFTER = "LOCALTIMESTAMP - INTERVAL '24 hours'"
+
+
+class StockIndicatorRepository:
+    """指标物化表仓储层（异步版本）"""
+
+    _STAGING_COLUMNS = ['code', 'timeframe', 'date', *_VALUE_COLUMNS]
+
+    @staticmethod
+    async def save_batch(records):
+        """批量写入指标行（二进制 COPY 到临时表后合并，同一批内重复的行以最后一行为准）
+
+        Args:
+            records: [(code, timeframe, date, close, *INDICATOR_NAMES 对应的值), ...]，缺失值为 None
+
+        Returns:
+            int: 写入条数
+        """
+        if not records:
+            return 0
+
+        value_types = ', '.join(f'{name} DOUBLE PRECISION' for name in _VALUE_COLUMNS)
+        updates = ', '.join(f'{name} = EXCLUDED.{name}' for name in _VALUE_COLUMNS)
+        async with get_db_conn() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    f'''CREATE TEMP TABLE stock_indicators_staging (
+                            code TEXT, timeframe TEXT, date DATE, {value_types},
+                            ord BIGINT GENERATED ALWAYS AS IDENTITY
+                        ) ON COMMIT DROP'''
+                )
+                await conn.copy_records_to_table(
+                    'stock_indicators_staging', records=records,
+                    columns=StockIndicatorRepository._STAGING_COLUMNS
+                )
+                await conn.execute(
+                    f'''INSERT INTO stock_indicators (code, timeframe, date, {_SELECT_COLUMNS}, updated_at)
+                        SELECT DISTINCT ON (code, timeframe, date)
+                               code, timeframe, date, {_SELECT_COLUMNS}, CURRENT_TIMESTAMP
+                        FROM stock_indicators_staging
+                        ORDER BY code, timeframe, date, ord DESC
+                        ON CONFLICT (code, timeframe, date) DO UPDATE
+                        SET {updates}, updated_at = CURRENT_TIMESTAMP'''
+                )
+
+        logger.info(f"SQL: 写入 {len(records)} 条指标")
+        return len(records)
+
+    @staticmethod
+    async def get_latest(codes, timeframe='1d'):
+        """批量读取最新一根K线的指标
+
+        Returns:
+            dict: {code: Record(code, date, close, 各指标)}，没有指标的股票不在结果中
+        """
+        if not codes:
+            return {}
+
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                f'''SELECT c.code, s.date, {', '.join(f's.{name}' for name in _VALUE_COLUMNS)}
+                    FROM unnest($1::text[]) AS c(code)
+                    CROSS JOIN LATERAL (
+                        SELECT date, {_SELECT_COLUMNS}
+                        FROM stock_indicators
+                        WHERE code = c.code AND timeframe = $2
+                        ORDER BY date DESC
+                        LIMIT 1
+                    ) AS s''',
+                list(dict.fromkeys(codes)), timeframe
+            )
+        return {row['code']: row for row in rows}
+
+    @staticmethod
+    async def get_range(code, timeframe='1d', start_date=None, end_date=None):
+        """读取一只股票区间内（含）的指标行，按日期升序"""
+        async with get_db_conn() as conn:
+            return await conn.fetch(
+                f'''SELECT date, {_SELECT_COLUMNS}
+                    FROM stock_indicators
+                    WHERE code = $1 AND timeframe = $2
+                      AND ($3::date IS NULL OR date >= $3)
+                      AND ($4::date IS NULL OR date <= $4)
+                    ORDER BY date''',
+                code, timeframe, start_date, end_date
+            )
+
+    @staticmethod
+    async def get_version(timeframe):
+        """选股快照版本（判断快照是否过期）
+
+        Returns:
+            tuple: (指标最近更新时间, EPS 缓存最近更新时间, 未过期 EPS 条数)，
+                   后两项覆盖 EPS 刷新和过期（过期不会改变 updated_at）
+        """
+        async with get_db_conn() as conn:
+            row = await conn.fetchrow(
+                f'''SELECT (SELECT max(updated_at) FROM stock_indicators WHERE timeframe = $1) AS indicators,
+                          (SELECT max(updated_at) FROM eps_cache) AS eps,
+                          (SELECT count(*) FROM eps_cache WHERE updated_at > {_EPS_FRESH_AFTER}) AS eps_fresh''',
+                timeframe
+            )
+        return tuple(row)
+
+    @staticmethod
+    async def get_snapshot(timeframe='1d'):
+        """读取全市场（stock_list 中全部股票）最新一根K线的指标（选股用）
+
+        Returns:
+            list: 按 code 排序的行 (code, name, eps_value, date, close, 各指标)，
+                  eps_value 取自 eps_cache（与 EpsCacheRepository 一致，超过 24 小时视为过期），
+                  缺失或过期时为 None；没有指标的股票不在结果中
+
+        eps_cache 只由监控页为监控列表中的股票写入，其他股票没有 EPS，估值状态为「未知」
+        """
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                f'''SELECT l.code, l.name, e.eps_value, s.date, {', '.join(f's.{name}' for name in _VALUE_COLUMNS)}
+                    FROM stock_list l
+                    CROSS JOIN LATERAL (
+                        SELECT date, {_SELECT_COLUMNS}
+                        FROM stock_indicators
+                        WHERE code = l.code AND timeframe = $1
+                        ORDER BY date DESC
+                        LIMIT 1
+                    ) AS s
+                    LEFT JOIN eps_cache e ON e.code = l.code AND e.updated_at > {_EPS_FRESH_AFTER}
+                    ORDER BY l.code''',
+                timeframe
+            )
+        logger.info(f"SQL: 读取 {timeframe} 指标快照，{len(rows)} 行")
+        return rows
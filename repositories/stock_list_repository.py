@@ -28,7 +28,7 @@ class StockListRepository:
             ]
 
     @staticmethod
-    async def get_pending_update(limit=10):
+    async def get_pending_update(limit=10, exclude=None):
         """获取需要更新的股票（每次最多 limit 条）
 
         判断规则：
@@ -37,6 +37,7 @@ class StockListRepository:
 
         Args:
             limit: 每次返回的最大数量
+            exclude: 需要跳过的股票代码（如本轮已失败、等待死信重试的股票）
 
         Returns:
             list: StockList 对象列表
@@ -49,13 +50,14 @@ class StockListRepository:
             rows = await conn.fetch(
                 '''SELECT code, name, last_update, created_at, updated_at
                    FROM stock_list
-                   WHERE last_update IS NULL
-                      OR last_update < $1
+                   WHERE (last_update IS NULL
+                      OR last_update < $1)
+                     AND code <> ALL($3)
                    ORDER BY
                        CASE WHEN last_update IS NULL THEN 0 ELSE 1 END,
                        last_update ASC
                    LIMIT $2''',
-                twelve_hours_ago, limit
+                twelve_hours_ago, limit, list(exclude or [])
             )
 
             logger.info(f"SQL: 查询返回 {len(rows)} 条记录")
@@ -71,6 +73,111 @@ class StockListRepository:
                 for row in rows
             ]
 
+    @staticmethod
+    async def lease_pending_update(owner, limit=10, lease_seconds=900, exclude=None):
+        """领取需要更新的股票并加租约（多进程安全）
+
+        判断规则与 get_pending_update 相同，另外跳过租约未过期的股票。
+        FOR UPDATE SKIP LOCKED 保证并发领取的进程拿到互不重叠的股票。
+
+        Args:
+            owner: 采集进程标识
+            limit: 每次领取的最大数量
+            lease_seconds: 租约时长（秒），过期后其他进程可重新领取
+            exclude: 需要跳过的股票代码
+
+        Returns:
+            list: StockList 对象列表
+        """
+        twelve_hours_ago = datetime.now() - timedelta(hours=12)
+
+        async with get_db_conn() as conn:
+            rows = await conn.fetch(
+                '''UPDATE stock_list s
+                   SET lease_owner = $1,
+                       lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $2)
+                   FROM (
+                       SELECT code FROM stock_list
+                       WHERE (last_update IS NULL OR last_update < $3)
+                         AND (lease_expires_at IS NULL OR lease_expires_at < CURRENT_TIMESTAMP)
+                         AND code <> ALL($5)
+                       ORDER BY
+                           CASE WHEN last_update IS NULL THEN 0 ELSE 1 END,
+                           last_update ASC
+                       LIMIT $4
+                       FOR UPDATE SKIP LOCKED
+                   ) pending
+                   WHERE s.code = pending.code
+                   RETURNING s.code, s.name, s.last_update, s.created_at, s.updated_at''',
+                owner, float(lease_seconds), twelve_hours_ago, limit, list(exclude or [])
+            )
+
+            logger.info(f"SQL: {owner} 领取 {len(rows)} 只股票")
+            from models.stock_list import StockList
+            return [
+                StockList(
+                    code=row['code'],
+                    name=row['name'],
+                    last_update=row['last_update'],
+                    created_at=row['created_at'],
+                    updated_at=row['updated_at']
+                )
+                for row in rows
+            ]
+
+    @staticmethod
+    async def renew_lease(owner, codes, lease_seconds=900):
+        """续租（批次处理时间较长时由心跳调用）"""
+        if not codes:
+            return 0
+
+        async with get_db_conn() as conn:
+            result = await conn.execute(
+                '''UPDATE stock_list
+                   SET lease_expires_at = CURRENT_TIMESTAMP + make_interval(secs => $3)
+                   WHERE lease_owner = $1 AND code = ANY($2)''',
+                owner, list(codes), float(lease_seconds)
+            )
+            return int(result.split()[-1])
+
+    @staticmethod
+    async def complete_lease(owner, codes):
+        """更新成功的股票：刷新 last_update 并释放租约
+
+        失败的股票不在此释放，租约到期前不会被其他进程重复领取（作为冷却时间）。
+
+        Args:
+            owner: 采集进程标识
+            codes: 更新成功的股票代码
+        """
+        if not codes:
+            return
+
+        async with get_db_conn() as conn:
+            await conn.execute(
+                '''UPDATE stock_list
+                   SET last_update = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP,
+                       lease_owner = NULL, lease_expires_at = NULL
+                   WHERE code = ANY($2) AND (lease_owner = $1 OR lease_owner IS NULL)''',
+                owner, list(codes)
+            )
+            logger.info(f"SQL: {owner} 完成 {len(codes)} 只股票")
+
+    @staticmethod
+    async def release_leases(owner):
+        """释放进程持有的全部租约（进程正常退出时调用）"""
+        async with get_db_conn() as conn:
+            result = await conn.execute(
+                '''UPDATE stock_list
+                   SET lease_owner = NULL, lease_expires_at = NULL
+                   WHERE lease_owner = $1''',
+                owner
+            )
+            released = int(result.split()[-1])
+            if released:
+                logger.info(f"SQL: {owner} 释放 {released} 个租约")
+            return released
+
     @staticmethod
     async def update_last_update(codes):
         """更新股票的最后更新时间
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线表在线迁移工具：TEXT 日期 / REAL 价格的单表 -> DATE 类型按年分区表
+
+步骤（旧版本服务可以在 prepare / copy 期间正常运行）：
+    python scripts/migrate_kline_partitioned.py prepare         # 创建 stock_kline_data_new 及分区、索引
+    python scripts/migrate_kline_partitioned.py copy            # 按股票分块复制，中断后重新执行即从游标继续
+    python scripts/migrate_kline_partitioned.py swap            # 锁写、补齐复制期间的写入、切换表名
+    python scripts/migrate_kline_partitioned.py status          # 查看进度
+
+swap 之后旧表保留为 stock_kline_data_legacy，确认无误后可手动 DROP。
+swap 需要与新版本服务（按 DATE 读写）的部署同时进行。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv()
+
+from utils.db import init_db_pool, close_db_pool, get_db_conn
+from utils.logger import get_logger
+
+logger = get_logger('migrate_kline')
+
+SQL_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'sql', 'migrate_kline_partitioned.sql')
+
+# 旧表 -> 新表的复制语句：日期转 DATE，格式异常的行跳过
+_COPY_SQL = '''INSERT INTO stock_kline_data_new
+                   (code, date, open, close, high, low, volume, amount, created_at, updated_at)
+               SELECT code, date::date, open, close, high, low, volume, amount, created_at, updated_at
+               FROM stock_kline_data
+               WHERE {where} AND date ~ '^\\d{{4}}-\\d{{2}}-\\d{{2}}$'
+               ON CONFLICT (code, date) DO UPDATE
+               SET open = EXCLUDED.open, close = EXCLUDED.close, high = EXCLUDED.high,
+                   low = EXCLUDED.low, volume = EXCLUDED.volume, amount = EXCLUDED.amount,
+                   updated_at = EXCLUDED.updated_at'''
+
+
+async def _table_exists(conn, name):
+    return await conn.fetchval('SELECT to_regclass($1) IS NOT NULL', name)
+
+
+async def prepare():
+    """创建新表、分区、索引和进度表"""
+    with open(SQL_FILE, encoding='utf-8') as f:
+        sql = f.read()
+    async with get_db_conn() as conn:
+        await conn.execute(sql)
+    logger.info("新表 stock_kline_data_new 已创建")
+
+
+async def copy(chunk_codes, pause):
+    """按股票代码顺序分块复制，每块一个事务并记录游标"""
+    async with get_db_conn() as conn:
+        if not await _table_exists(conn, 'stock_kline_data_new'):
+            raise SystemExit("请先执行 prepare")
+        state = await conn.fetchrow('SELECT cursor, copied_rows, swapped_at FROM kline_migration_state WHERE id = 1')
+        if state['swapped_at']:
+            raise SystemExit("已完成切换，无需复制")
+
+        await conn.execute(
+            'UPDATE kline_migration_state SET copy_started_at = COALESCE(copy_started_at, CURRENT_TIMESTAMP) WHERE id = 1'
+        )
+        cursor = state['cursor'] or ''
+        codes = [row['code'] for row in await conn.fetch(
+            'SELECT DISTINCT code FROM stock_kline_data WHERE code > $1 ORDER BY code', cursor
+        )]
+
+    logger.info(f"从游标 '{cursor}' 继续，剩余 {len(codes)} 只股票，每块 {chunk_codes} 只")
+    copied = state['copied_rows']
+    start = time.time()
+
+    for i in range(0, len(codes), chunk_codes):
+        chunk = codes[i:i + chunk_codes]
+        async with get_db_conn() as conn:
+            async with conn.transaction():
+                result = await conn.execute(_COPY_SQL.format(where='code = ANY($1)'), chunk)
+                rows = int(result.split()[-1])
+                await conn.execute(
+                    'UPDATE kline_migration_state SET cursor = $1, copied_rows = copied_rows + $2 WHERE id = 1',
+                    chunk[-1], rows
+                )
+        copied += rows
+        done = i + len(chunk)
+        elapsed = time.time() - start
+        logger.info(f"已复制 {done}/{len(codes)} 只股票，累计 {copied} 行，"
+                    f"{copied / elapsed if elapsed else 0:.0f} 行/秒，游标: {chunk[-1]}")
+        if pause:
+            await asyncio.sleep(pause)
+
+    logger.info(f"复制完成，共 {copied} 行，耗时 {time.time() - start:.1f}秒")
+
+
+async def swap():
+    """锁住旧表写入，补齐复制开始后的写入，然后在同一事务中切换表名"""
+    async with get_db_conn() as conn:
+        state = await conn.fetchrow('SELECT copy_started_at, swapped_at FROM kline_migration_state WHERE id = 1')
+        if state['swapped_at']:
+            raise SystemExit("已完成切换")
+        if state['copy_started_at'] is None:
+            raise SystemExit("请先执行 copy")
+
+        start = time.time()
+        async with conn.transaction():
+            # SHARE ROW EXCLUSIVE 阻塞写入但不阻塞读取
+            await conn.execute('LOCK TABLE stock_kline_data IN SHARE ROW EXCLUSIVE MODE')
+            result = await conn.execute(
+                _COPY_SQL.format(where="updated_at >= $1::timestamp - interval '1 minute'"),
+                state['copy_started_at']
+            )
+            logger.info(f"补齐复制期间的写入: {result.split()[-1]} 行")
+
+            await conn.execute('ALTER TABLE stock_kline_data RENAME TO stock_kline_data_legacy')
+            await conn.execute('ALTER TABLE stock_kline_data_new RENAME TO stock_kline_data')
+            await conn.execute(
+                '''ALTER TRIGGER trigger_update_stock_kline_data_updated_at ON stock_kline_data_legacy
+                   RENAME TO trigger_update_stock_kline_data_legacy_updated_at'''
+            )
+            await conn.execute(
+                '''ALTER TRIGGER trigger_update_stock_kline_data_new_updated_at ON stock_kline_data
+                   RENAME TO trigger_update_stock_kline_data_updated_at'''
+            )
+            await conn.execute('UPDATE kline_migration_state SET swapped_at = CURRENT_TIMESTAMP WHERE id = 1')
+
+        await conn.execute('ANALYZE stock_kline_data')
+        logger.info(f"切换完成，写入阻塞 {time.time() - start:.2f}秒；旧表已保留为 stock_kline_data_legacy")
+
+
+async def status():
+    """打印迁移进度"""
+    async with get_db_conn() as conn:
+        if not await _table_exists(conn, 'kline_migration_state'):
+            print("尚未执行 prepare")
+            return
+        state = await conn.fetchrow('SELECT * FROM kline_migration_state WHERE id = 1')
+        for key in ('cursor', 'copied_rows', 'copy_started_at', 'swapped_at'):
+            print(f"{key}: {state[key]}")
+        rows = await conn.fetch(
+            '''SELECT c.relname, c.reltuples::bigint AS estimate
+               FROM pg_class c
+               WHERE c.relname IN ('stock_kline_data', 'stock_kline_data_new', 'stock_kline_data_legacy')'''
+        )
+        for row in rows:
+            print(f"{row['relname']}: 约 {max(row['estimate'], 0)} 行（统计信息估算）")
+
+
+async def main(args):
+    await init_db_pool()
+    try:
+        if args.command == 'prepare':
+            await prepare()
+        elif args.command == 'copy':
+            await copy(args.chunk_codes, args.pause)
+        elif args.command == 'swap':
+            await swap()
+        else:
+            await status()
+    finally:
+        await close_db_pool()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='K线表在线迁移（DATE 类型 + 按年分区）')
+    parser.add_argument('command', choices=['prepare', 'copy', 'swap', 'status'])
+    parser.add_argument('--chunk-codes', type=int, default=50, help='每个事务复制的股票数')
+    parser.add_argument('--pause', type=float, default=0, help='每块之间的休眠秒数，降低对线上的影响')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,251 @@
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime
+from repositories.backfill_repository import BackfillRepository
+from repositories.stock_list_repository import StockListRepository
+from utils.logger import get_logger
+from utils import rate_limiter
+
+# 获取日志实例
+logger = get_logger('backfill_service')
+
+# 本进程中正在运行的任务ID（同步包装器会在其他线程的事件循环中运行任务）
+_running_jobs = set()
+_running_lock = threading.Lock()
+
+# 由管理接口在主事件循环中启动的后台任务
+_tasks = {}
+
+# 本进程领取任务租约使用的标识
+_owner = None
+
+
+class BackfillService:
+    """K线历史回补服务：任务、游标和每只股票的状态持久化在数据库中，重启后从断点继续"""
+
+    @staticmethod
+    def _normalize_date(value, default):
+        """日期统一为 YYYYMMDD"""
+        if not value:
+            return default
+        return value.replace('-', '')
+
+    @staticmethod
+    async def create_job(start_date=None, end_date=None, codes=None):
+        """创建回补任务
+
+        Args:
+            start_date: 开始日期（YYYYMMDD 或 YYYY-MM-DD），默认 20200101
+            end_date: 结束日期，默认今天
+            codes: 股票代码列表，默认股票列表中的全部股票
+
+        Returns:
+            int: 任务ID
+        """
+        from services.kline_service import KlineService
+
+        start_date = BackfillService._normalize_date(start_date, '20200101')
+        end_date = BackfillService._normalize_date(end_date, datetime.now().strftime('%Y%m%d'))
+        if start_date > end_date:
+            raise ValueError(f"开始日期 {start_date} 晚于结束日期 {end_date}")
+
+        if codes is None:
+            stocks = await StockListRepository.get_all()
+            codes = [KlineService._add_prefix_to_code(s.code) for s in stocks]
+        if not codes:
+            raise ValueError("没有需要回补的股票")
+
+        job_id = await BackfillRepository.create_job(start_date, end_date, codes)
+        logger.info(f"回补任务 {job_id} 已创建: {start_date}-{end_date}，{len(codes)} 只股票")
+        return job_id
+
+    @staticmethod
+    async def get_active_job():
+        """获取可以自动继续的任务（运行中、待运行或中途失败；已暂停的任务只能由管理接口继续）"""
+        jobs = await BackfillRepository.get_jobs_by_status(['running', 'pending', 'failed'])
+        return jobs[0] if jobs else None
+
+    @staticmethod
+    def _get_owner():
+        """本进程的租约标识（主机名:进程号:随机后缀）"""
+        global _owner
+        if _owner is None:
+            from services.kline_service import KlineService
+            _owner = KlineService.make_worker_id()
+        return _owner
+
+    @staticmethod
+    async def run_job(job_id, reopen_failed=False):
+        """在当前事件循环中运行任务，直到完成或被暂停
+
+        运行前在数据库中领取任务租约，多个进程（多个 uvicorn worker、worker.py）同时调用时只有一个进程运行；
+        处理期间定期续租，进程崩溃后租约到期，其他进程可以重新领取。
+        reopen_failed 为 True 时已失败的任务从游标处继续运行。
+
+        Returns:
+            str: 任务最终状态；任务已由其他进程运行时返回 'running'
+        """
+        from services.kline_service import KlineService
+
+        with _running_lock:
+            if job_id in _running_jobs:
+                logger.warning(f"回补任务 {job_id} 已在运行")
+                return 'running'
+            _running_jobs.add(job_id)
+
+        owner = BackfillService._get_owner()
+        lease_seconds = int(os.getenv('KLINE_LEASE_SECONDS', '900'))
+        heartbeat = None
+        try:
+            if not await BackfillRepository.claim_job(job_id, owner, lease_seconds, reopen_failed):
+                logger.info(f"回补任务 {job_id} 已由其他进程运行")
+                return 'running'
+            lost = asyncio.Event()
+            heartbeat = asyncio.create_task(BackfillService._renew_lease(job_id, owner, lease_seconds, lost))
+
+            await BackfillRepository.set_status(job_id, 'running')
+            chunk_size = int(os.getenv('KLINE_BACKFILL_CHUNK', '50'))
+            max_concurrent = int(os.getenv('KLINE_UPDATE_CONCURRENT', '10'))
+
+            # 历史回补优先级最低，不挤占页面请求和定时任务的上游配额
+            with rate_limiter.priority_scope(rate_limiter.BACKFILL):
+                while True:
+                    if lost.is_set():
+                        logger.warning(f"回补任务 {job_id} 的租约已被其他进程领取，停止运行")
+                        return 'running'
+                    job = await BackfillRepository.get_job(job_id)
+                    if job is None or job['status'] != 'running':
+                        status = job['status'] if job else 'failed'
+                        logger.info(f"回补任务 {job_id} 已停止: {status}")
+                        return status
+
+                    codes = await BackfillRepository.get_pending_codes(job_id, job['cursor'], chunk_size)
+                    if not codes:
+                        await BackfillRepository.set_status(job_id, 'completed')
+                        logger.info(f"回补任务 {job_id} 完成: 成功 {job['done_count']}，失败 {job['failed_count']}")
+                        return 'completed'
+
+                    chunk_start = time.monotonic()
+                    _, failures = await KlineService._process_batch(
+                        codes, max_concurrent, True, start_date=job['start_date'], end_date=job['end_date']
+                    )
+                    await BackfillRepository.complete_chunk(job_id, codes, failures, time.monotonic() - chunk_start)
+                    await StockListRepository.update_last_update(
+                        [KlineService._strip_prefix(code) for code in codes if code not in failures]
+                    )
+
+                    progress = BackfillService._with_progress(await BackfillRepository.get_job(job_id))
+                    logger.info(f"回补任务 {job_id}: {progress['processed']}/{progress['total_count']} "
+                                f"({progress['progress']}%)，{progress['throughput_per_minute']} 只/分钟，"
+                                f"预计剩余 {progress['eta_seconds']} 秒")
+
+        except asyncio.CancelledError:
+            # 进程关闭时任务被取消，保持 running 状态以便重启后自动续跑
+            logger.info(f"回补任务 {job_id} 被中断，重启后继续")
+            raise
+        except Exception as e:
+            logger.error(f"回补任务 {job_id} 失败: {e}")
+            await BackfillRepository.set_status(job_id, 'failed', str(e))
+            return 'failed'
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+                try:
+                    await BackfillRepository.release_job(job_id, owner)
+                except Exception as e:
+                    logger.warning(f"释放回补任务 {job_id} 租约失败: {e}")
+            with _running_lock:
+                _running_jobs.discard(job_id)
+
+    @staticmethod
+    async def _renew_lease(job_id, owner, lease_seconds, lost):
+        """心跳：每三分之一租约时长续租一次，租约丢失时置位 lost"""
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            try:
+                if not await BackfillRepository.renew_job_lease(job_id, owner, lease_seconds):
+                    lost.set()
+                    return
+            except Exception as e:
+                logger.warning(f"回补任务 {job_id} 续租失败: {e}")
+
+    @staticmethod
+    def start_job(job_id):
+        """在当前事件循环中后台运行任务"""
+        task = _tasks.get(job_id)
+        if task is not None and not task.done():
+            return False
+        _tasks[job_id] = asyncio.create_task(BackfillService.run_job(job_id))
+        return True
+
+    @staticmethod
+    async def pause_job(job_id):
+        """暂停任务（当前数据块处理完后停止）"""
+        job = await BackfillRepository.get_job(job_id)
+        if job is None:
+            return False, '任务不存在'
+        if job['status'] not in ('running', 'pending'):
+            return False, f"任务状态为 {job['status']}，无法暂停"
+        await BackfillRepository.set_status(job_id, 'paused')
+        return True, '任务将在当前数据块完成后暂停'
+
+    @staticmethod
+    async def resume_job(job_id):
+        """继续已暂停、中断或失败的任务
+
+        先领取任务租约（失败的任务恢复为待运行），再把失败的股票重新排队，从头按代码顺序处理未完成的股票。
+        已完成任务中失败的股票不会重试，需要新建任务。
+        """
+        job = await BackfillRepository.get_job(job_id)
+        if job is None:
+            return False, '任务不存在'
+        if job['status'] == 'completed':
+            return False, '任务已完成'
+        if job_id in _running_jobs:
+            # 暂停请求尚未生效（当前数据块仍在处理），恢复状态即可继续
+            await BackfillRepository.set_status(job_id, 'running')
+            return True, '任务已继续'
+
+        lease_seconds = int(os.getenv('KLINE_LEASE_SECONDS', '900'))
+        if not await BackfillRepository.claim_job(job_id, BackfillService._get_owner(), lease_seconds,
+                                                  reopen_failed=True):
+            return False, '任务正由其他进程运行，无法继续'
+        requeued = await BackfillRepository.requeue_failed_items(job_id)
+        if not BackfillService.start_job(job_id):
+            return False, '任务已在运行'
+        return True, f"任务已继续（重新排队 {requeued} 只失败的股票）" if requeued else '任务已继续'
+
+    @staticmethod
+    async def resume_interrupted_jobs():
+        """启动时继续上次进程退出时仍在运行的任务（每个 worker 都会调用，由任务租约保证只有一个进程运行）"""
+        jobs = await BackfillRepository.get_jobs_by_status(['running'])
+        for job in jobs:
+            logger.info(f"继续中断的回补任务 {job['id']}（游标: {job['cursor']}）")
+            BackfillService.start_job(job['id'])
+        return len(jobs)
+
+    @staticmethod
+    async def get_status(job_id=None):
+        """获取任务进度；不指定任务时返回最近的任务列表"""
+        if job_id is None:
+            return [BackfillService._with_progress(job) for job in await BackfillRepository.get_jobs()]
+        return BackfillService._with_progress(await BackfillRepository.get_job(job_id))
+
+    @staticmethod
+    def _with_progress(job):
+        """补充进度、吞吐量和预计剩余时间"""
+        if job is None:
+            return None
+        processed = job['done_count'] + job['failed_count']
+        remaining = job['total_count'] - processed
+        elapsed = job['elapsed_seconds']
+        throughput = processed / elapsed if elapsed else 0
+
+        job['processed'] = processed
+        job['progress'] = round(processed * 100 / job['total_count'], 2) if job['total_count'] else 100
+        job['throughput_per_minute'] = round(throughput * 60, 2)
+        job['eta_seconds'] = round(remaining / throughput) if throughput else None
+        job['running_in_process'] = job['id'] in _running_jobs
+        return job
@@ -0,0 +1,243 @@
+import time
+from datetime import date, timedelta
+import numpy as np
+from repositories.kline_repository import KlineRepository
+from repositories.stock_list_repository import StockListRepository
+from services.monitor_service import TREND_PERIODS
+from utils import backtest
+from utils.executors import run_blocking, REQUEST
+from utils.indicators import build_price_matrix, ema_series
+from utils.logger import get_logger
+
+# 获取日志实例
+logger = get_logger('backtest_service')
+
+# 回测区间开始前额外读取的日历天数，用于 EMA188 预热
+_WARMUP_DAYS = 900
+
+# 每批读取收盘价序列的股票数
+_LOAD_CHUNK = 500
+
+# 信号发出后统计收益的交易日数
+_HORIZONS = (5, 20, 60)
+
+_TREND_NAMES = {backtest.BULL: '多头', backtest.RANGE: '震荡', backtest.BEAR: '空头'}
+_TREND_CODES = {name: code for code, name in _TREND_NAMES.items()}
+
+DEFAULT_PARAMS = {
+    'band': (144, 188),       # 通道的两条 EMA
+    'timeframe': '1d',        # 趋势判断使用的均线组（与 check_trend 一致）
+    'entry_trends': None,     # 允许入场的趋势（多头 / 震荡 / 空头），为空不过滤
+    'break_buffer': 0.0,      # 收盘价低于通道下沿 x (1 - break_buffer) 才算破位
+    'exit_on_bear': False,    # 趋势转为空头时离场
+}
+
+
+class BacktestService:
+    """EMA144/188 通道信号（加仓入场、破位离场）的历史回测：全部股票一次矩阵运算，同一份数据可反复回测多组参数"""
+
+    @staticmethod
+    async def load(codes=None, start_date=None, end_date=None, warmup_days=_WARMUP_DAYS):
+        """读取回测用收盘价矩阵
+
+        Args:
+            codes: 股票代码列表，为空时取 stock_list 全部股票
+            start_date / end_date: 回测区间（date 或 'YYYY-MM-DD'），为空不限制
+            warmup_days: 区间开始前额外读取的日历天数（EMA 预热，不参与统计）
+
+        Returns:
+            dict: {'codes', 'close'（左侧用第一个价格补齐）, 'data_mask'（真实K线）, 'in_range'（回测区间内）,
+                   'dates'（距 1970-01-01 的天数，补齐部分为 NaN）, 'start_date', 'end_date'}
+        """
+        if isinstance(start_date, str):
+            start_date = date.fromisoformat(start_date)
+        if isinstance(end_date, str):
+            end_date = date.fromisoformat(end_date)
+        if codes is None:
+            codes = [stock.code for stock in await StockListRepository.get_all()]
+
+        begin = time.perf_counter()
+        load_since = start_date - timedelta(days=warmup_days) if start_date else None
+        series = {}
+        for i in range(0, len(codes), _LOAD_CHUNK):
+            series.update(await KlineRepository.get_close_series(codes[i:i + _LOAD_CHUNK], load_since, end_date))
+        codes = [code for code in codes if code in series]
+
+        close, lengths = build_price_matrix([series[code][1] for code in codes])
+        days, _ = build_price_matrix([series[code][0].astype(np.int64) for code in codes], fill='nan')
+        data_mask = np.arange(close.shape[1])[None, :] >= (close.shape[1] - lengths)[:, None]
+        in_range = data_mask.copy()
+        if start_date:
+            in_range &= days >= np.datetime64(start_date, 'D').astype(np.int64)
+
+        logger.info(f"回测数据加载 {len(codes)} 只股票 x {close.shape[1]} 根K线，"
+                    f"耗时 {(time.perf_counter() - begin) * 1000:.0f}ms")
+        return {'codes': codes, 'close': close, 'data_mask': data_mask, 'in_range': in_range, 'dates': days,
+                'start_date': start_date, 'end_date': end_date}
+
+    @staticmethod
+    def evaluate(data, params=None, horizons=_HORIZONS, ema_cache=None):
+        """用一组参数回测已加载的数据
+
+        Args:
+            data: load() 的返回值
+            params: 覆盖 DEFAULT_PARAMS 的参数
+            horizons: 统计信号后收益的交易日数
+            ema_cache: {周期: EMA 序列矩阵}，参数扫描时在多组参数间复用
+
+        Returns:
+            dict: {'params', 'aggregate', 'signals', 'stocks'（每只股票一个字典）, 'trades'（引擎原始结果）}
+        """
+        params = {**DEFAULT_PARAMS, **(params or {})}
+        if params['timeframe'] not in TREND_PERIODS:
+            raise ValueError(f"不支持的时间维度: {params['timeframe']}")
+        unknown = set(params['entry_trends'] or ()) - set(_TREND_CODES)
+        if unknown:
+            raise ValueError(f"不支持的趋势: {', '.join(sorted(unknown))}")
+
+        ema_cache = {} if ema_cache is None else ema_cache
+        close, data_mask = data['close'], data['data_mask']
+        if close.size == 0:
+            # 没有任何K线：按 0 只股票 x 1 列走完同样的流程，得到全部为空的统计
+            close, data_mask = np.ones((0, 1)), np.zeros((0, 1), dtype=bool)
+            data = {**data, 'close': close, 'data_mask': data_mask, 'in_range': data_mask}
+
+        def ema(period):
+            if period not in ema_cache:
+                ema_cache[period] = ema_series(close, period)
+            return ema_cache[period]
+
+        # K线根数达到最长 EMA 周期、且在回测区间内的交易日才参与（与监控页 EMA 不足时无信号一致）
+        periods = tuple(params['band']) + TREND_PERIODS[params['timeframe']]
+        bar_index = np.cumsum(data_mask, axis=1) - 1
+        ready = data['in_range'] & (bar_index >= max(periods) - 1)
+
+        ema_a, ema_b = ema(params['band'][0]), ema(params['band'][1])
+        signals = backtest.band_signals(close, ema_a, ema_b, ready)
+        trend = backtest.trend_codes(*(ema(p) for p in TREND_PERIODS[params['timeframe']]))
+
+        entry = signals['band_entry']
+        if params['entry_trends']:
+            entry = entry & np.isin(trend, [_TREND_CODES[name] for name in params['entry_trends']])
+        exit_ = ready & (close < np.fmin(ema_a, ema_b) * (1.0 - params['break_buffer']))
+        if params['exit_on_bear']:
+            exit_ = exit_ | (ready & (trend == backtest.BEAR))
+
+        result = backtest.simulate(close, entry, exit_, ready)
+        trades, stocks = result['trades'], result['stocks']
+
+        # 入场时的趋势分布
+        entry_trend = trend[trades['row'], trades['entry']]
+        by_trend = {}
+        for code, name in _TREND_NAMES.items():
+            selected = trades['return'][entry_trend == code]
+            by_trend[name] = BacktestService._trade_stats(selected)
+
+        active = ready.any(axis=1)
+        aggregate = {
+            'stocks': int(active.sum()),
+            **BacktestService._trade_stats(trades['return']),
+            'avg_bars_held': BacktestService._number(trades['bars'].mean()) if len(trades['bars']) else None,
+            'open_trades': int(trades['open'].sum()),
+            'avg_total_return': BacktestService._number(np.nanmean(stocks['total_return'][active]))
+            if active.any() else None,
+            'avg_buy_hold_return': BacktestService._number(np.nanmean(stocks['buy_hold_return'][active]))
+            if active.any() else None,
+            'avg_max_drawdown': BacktestService._number(np.nanmean(stocks['max_drawdown'][active]))
+            if active.any() else None,
+            'avg_exposure': BacktestService._number(np.nanmean(stocks['exposure'][active]))
+            if active.any() else None,
+            'by_entry_trend': by_trend,
+        }
+
+        signal_stats = {
+            name: {
+                'count': int(signals[key].sum()),
+                'forward_returns': {
+                    str(h): {k: BacktestService._number(v) if isinstance(v, float) else v for k, v in stats.items()}
+                    for h, stats in backtest.forward_returns(close, signals[key], horizons, data_mask).items()
+                },
+            }
+            for name, key in (('加仓', 'band_entry'), ('破位', 'break_event'))
+        }
+
+        stock_rows = []
+        for i in np.flatnonzero(active):
+            row = {'code': data['codes'][i]}
+            for key, values in stocks.items():
+                row[key] = int(values[i]) if key == 'trades' else BacktestService._number(values[i])
+            stock_rows.append(row)
+
+        return {
+            'params': {**params, 'band': list(params['band'])},
+            'aggregate': aggregate,
+            'signals': signal_stats,
+            'stocks': stock_rows,
+            'trades': trades,
+        }
+
+    @staticmethod
+    async def run(codes=None, start_date=None, end_date=None, params=None, horizons=_HORIZONS):
+        """读取数据并回测一组参数
+
+        Returns:
+            dict: evaluate() 的结果（不含引擎原始交易数组），附加回测区间和耗时
+        """
+        data = await BacktestService.load(codes, start_date, end_date)
+        begin = time.perf_counter()
+        # 全市场回测每组参数约 2 秒的矩阵运算，放到线程池执行，不阻塞事件循环
+        result = await run_blocking(REQUEST, BacktestService.evaluate, data, params, horizons)
+        elapsed = (time.perf_counter() - begin) * 1000
+        logger.info(f"回测 {result['aggregate']['stocks']} 只股票，{result['aggregate']['trades']} 笔交易，"
+                    f"耗时 {elapsed:.0f}ms")
+        result.pop('trades')
+        return {**BacktestService._period(data), **result, 'elapsed_ms': round(elapsed, 1)}
+
+    @staticmethod
+    async def sweep(param_sets, codes=None, start_date=None, end_date=None, horizons=_HORIZONS):
+        """参数扫描：数据只读取一次，EMA 序列在各组参数间复用，每组参数只返回汇总统计
+
+        Returns:
+            dict: {'start_date', 'end_date', 'results': [{'params', 'aggregate', 'signals'}], 'elapsed_ms'}
+        """
+        data = await BacktestService.load(codes, start_date, end_date)
+        begin = time.perf_counter()
+        results = await run_blocking(REQUEST, BacktestService._sweep, data, param_sets, horizons)
+        elapsed = (time.perf_counter() - begin) * 1000
+        logger.info(f"参数扫描 {len(param_sets)} 组参数 x {len(data['codes'])} 只股票，耗时 {elapsed:.0f}ms")
+        return {**BacktestService._period(data), 'results': results, 'elapsed_ms': round(elapsed, 1)}
+
+    @staticmethod
+    def _sweep(data, param_sets, horizons):
+        """逐组参数回测（阻塞，在线程池中执行），EMA 序列在各组参数间复用"""
+        ema_cache, results = {}, []
+        for params in param_sets:
+            result = BacktestService.evaluate(data, params, horizons, ema_cache)
+            results.append({key: result[key] for key in ('params', 'aggregate', 'signals')})
+        return results
+
+    @staticmethod
+    def _trade_stats(returns):
+        """一组交易收益的笔数、胜率、平均 / 中位收益"""
+        if not len(returns):
+            return {'trades': 0, 'win_rate': None, 'avg_return': None, 'median_return': None}
+        return {
+            'trades': int(len(returns)),
+            'win_rate': BacktestService._number((returns > 0).mean()),
+            'avg_return': BacktestService._number(returns.mean()),
+            'median_return': BacktestService._number(np.median(returns)),
+        }
+
+    @staticmethod
+    def _period(data):
+        """实际参与统计的首末交易日"""
+        days = data['dates'][data['in_range']]
+        if not days.size:
+            return {'start_date': None, 'end_date': None}
+        return {'start_date': str(np.datetime64(int(np.nanmin(days)), 'D')),
+                'end_date': str(np.datetime64(int(np.nanmax(days)), 'D'))}
+
+    @staticmethod
+    def _number(value):
+        """NaN -> None，其余保留四位小数（收益率、胜率）"""
+        return None if value is None or np.isnan(value) else round(float(value), 4)
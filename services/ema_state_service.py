@@ -0,0 +1,299 @@
+import os
+import time
+from datetime import date
+import numpy as np
+from repositories.ema_state_repository import EmaStateRepository
+from repositories.kline_repository import KlineRepository
+from utils import kline_bars
+from utils.executors import run_blocking, INGEST
+from utils.indicators import EMA_PERIODS, build_price_matrix, ema_last, ema_step
+from utils.kline_normalizer import normalize_kline_frame, count_rows
+from utils.logger import get_logger
+
+# 获取日志实例
+logger = get_logger('ema_state_service')
+
+# 维护EMA状态的K线周期：日线 + 多日K线
+TIMEFRAMES = ('1d',) + kline_bars.TIMEFRAMES
+
+_ALPHAS = 2.0 / (np.asarray(EMA_PERIODS, dtype=np.float64) + 1.0)
+
+# 重算时读取日线的起始日（早于任何数据）
+_FULL_HISTORY = date(1990, 1, 1)
+_MAX_DAILY_ROWS = 100000
+
+# 重算时每批读取历史的股票数
+_REPAIR_CHUNK = 100
+
+# 盘中临时EMA的递推起点缓存：{(code, timeframe): (当日日期, 加载时间, 起点数组, 今日之前的K线根数)}
+_live_bases = {}
+
+
+def _advance(state, dates, closes):
+    """按新K线递推一组EMA状态（全部EMA周期一起计算）
+
+    Args:
+        state: {'last_date', 'value', 'prev_value', 'bars', 'last_close'}，value / prev_value 为按 EMA_PERIODS 排列的数组
+        dates: 新K线日期（datetime.date，升序）
+        closes: 新K线收盘价
+
+    Returns:
+        dict: 新状态；新K线早于最后一根K线（历史价格变化）时返回 None，需要从全部历史重算
+    """
+    last_date, value, prev, bars = state['last_date'], state['value'], state['prev_value'], state['bars']
+    last_close = state['last_close']
+    for bar_date, close in zip(dates, closes):
+        if bar_date == last_date:
+            # 最后一根K线被改写（盘中更新、多日K线分桶内新增交易日）
+            value = close if bars == 1 else _ALPHAS * close + (1 - _ALPHAS) * prev
+            last_close = close
+        elif bar_date > last_date:
+            prev = value
+            value = _ALPHAS * close + (1 - _ALPHAS) * value
+            last_date = bar_date
+            last_close = close
+            bars += 1
+        else:
+            return None
+    return {'last_date': last_date, 'value': value, 'prev_value': prev, 'bars': bars, 'last_close': last_close}
+
+
+class EmaStateService:
+    """EMA增量状态：采集落库后按新K线 O(1) 递推，监控页直接读取最新EMA，不再加载历史K线重算"""
+
+    @staticmethod
+    async def apply_saved(kline_data_dict, multi_day_bars=None):
+        """用刚落库的K线更新EMA状态
+
+        Args:
+            kline_data_dict: 传给 KlineRepository.save_all_batch 的 {code: DataFrame 或列数组}
+            multi_day_bars: KlineBarService.refresh 返回的 {code: {timeframe: 重算的多日K线}}
+
+        Returns:
+            tuple: (递推更新的股票数, 从全部历史重算的股票数)
+        """
+        updates = {}
+        for code, data in kline_data_dict.items():
+            if data is None or count_rows(data) == 0:
+                continue
+            columns = data if isinstance(data, dict) else normalize_kline_frame(data)
+            order = np.argsort(columns['date'], kind='stable')
+            updates[(code, '1d')] = (columns['date'][order].tolist(), columns['close'][order])
+        for code, by_timeframe in (multi_day_bars or {}).items():
+            for tf, bars in by_timeframe.items():
+                if len(bars['bucket_start']):
+                    updates[(code, tf)] = (bars['bucket_start'].tolist(), bars['close'])
+        if not updates:
+            return 0, 0
+
+        codes = list({code for code, _ in updates})
+        states = await EmaStateRepository.get_states(codes)
+
+        records, repair = [], set()
+        for (code, tf), (dates, closes) in updates.items():
+            rows = states.get((code, tf))
+            if rows is None or any(period not in rows for period in EMA_PERIODS):
+                repair.add(code)
+                continue
+            first = rows[EMA_PERIODS[0]]
+            state = {
+                'last_date': first['last_date'],
+                'bars': first['bars'],
+                'last_close': first['last_close'],
+                'value': np.array([rows[p]['value'] for p in EMA_PERIODS]),
+                'prev_value': np.array([np.nan if rows[p]['prev_value'] is None else rows[p]['prev_value']
+                                        for p in EMA_PERIODS]),
+            }
+            state = _advance(state, dates, closes)
+            if state is None:
+                repair.add(code)
+                continue
+            records.extend(EmaStateService._records(code, tf, state))
+
+        # 需要重算的股票由 repair 写入全部周期，丢弃其递推结果
+        records = [record for record in records if record[0] not in repair]
+        await EmaStateRepository.save_states(records)
+        if repair:
+            await EmaStateService.repair(list(repair))
+        return len({record[0] for record in records}), len(repair)
+
+    @staticmethod
+    def _records(code, timeframe, state):
+        return [
+            (code, timeframe, period, state['last_date'], float(state['value'][i]),
+             None if np.isnan(state['prev_value'][i]) else float(state['prev_value'][i]), state['bars'],
+             None if state['last_close'] is None else float(state['last_close']))
+            for i, period in enumerate(EMA_PERIODS)
+        ]
+
+    @staticmethod
+    async def repair(codes):
+        """从全部历史日线重算股票所有周期的EMA状态（复权等导致历史价格变化时使用）
+
+        按 _REPAIR_CHUNK 只股票分批读取历史，全市场重算时内存和单条查询耗时都有上限。
+
+        Returns:
+            int: 重算的股票数
+        """
+        repaired = 0
+        for i in range(0, len(codes), _REPAIR_CHUNK):
+            repaired += await EmaStateService._repair_chunk(codes[i:i + _REPAIR_CHUNK])
+        return repaired
+
+    @staticmethod
+    async def _repair_chunk(codes):
+        start = time.perf_counter()
+        frames = await KlineRepository.get_since_batch({code: _FULL_HISTORY for code in codes},
+                                                       limit=_MAX_DAILY_ROWS)
+        # 规整、聚合和矩阵运算放到线程池，事件循环只等待读写数据库
+        records, keys = await run_blocking(INGEST, EmaStateService._repair_records, frames)
+        await EmaStateRepository.save_states(records)
+        for key in keys:
+            _live_bases.pop(key, None)
+
+        repaired = len({code for code, _ in keys})
+        logger.info(f"EMA状态重算 {repaired} 只股票，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return repaired
+
+    @staticmethod
+    def _repair_records(frames):
+        """从全部历史日线计算各周期的EMA状态（阻塞，在线程池中执行）
+
+        Returns:
+            tuple: (EmaStateRepository.save_states 的记录, 有K线的 (code, timeframe) 列表)
+        """
+        series = {}
+        for code, df in frames.items():
+            if df is None:
+                continue
+            daily = normalize_kline_frame(df)
+            series[(code, '1d')] = (daily['date'], daily['close'])
+            for tf in kline_bars.TIMEFRAMES:
+                bars = kline_bars.aggregate(daily, tf)
+                series[(code, tf)] = (bars['bucket_start'], bars['close'])
+
+        keys = [key for key, (dates, _) in series.items() if len(dates)]
+        closes = [series[key][1] for key in keys]
+        matrix, lengths = build_price_matrix(closes)
+        values = ema_last(matrix, EMA_PERIODS)
+        prev_matrix, prev_lengths = build_price_matrix([c[:-1] for c in closes])
+        prev_values = ema_last(prev_matrix, EMA_PERIODS)
+        prev_values[prev_lengths == 0] = np.nan
+
+        records = []
+        for i, (code, tf) in enumerate(keys):
+            dates, bar_closes = series[(code, tf)]
+            state = {'last_date': dates[-1].item(), 'value': values[i], 'prev_value': prev_values[i],
+                     'bars': int(lengths[i]), 'last_close': float(bar_closes[-1])}
+            records.extend(EmaStateService._records(code, tf, state))
+        return records, keys
+
+    @staticmethod
+    async def get_latest(codes, timeframe='1d', as_of=None):
+        """读取最新EMA
+
+        Args:
+            as_of: {code: 最新K线日期}，状态的最后一根K线早于该日期（采集后递推失败）的股票视为过期；
+                   多日K线的 last_date 为分桶起始日，只用于日线
+
+        Returns:
+            dict: {code: {EMA周期: 保留两位小数的EMA，K线根数不足该周期时为 None}}，
+                  没有完整状态或状态过期的股票不在结果中
+        """
+        as_of = as_of or {}
+        states = await EmaStateRepository.get_states(codes, [timeframe])
+        result = {}
+        for code in codes:
+            rows = states.get((code, timeframe))
+            if rows is None or any(period not in rows for period in EMA_PERIODS):
+                continue
+            if as_of.get(code) and rows[EMA_PERIODS[0]]['last_date'] < as_of[code]:
+                continue
+            result[code] = {
+                period: round(rows[period]['value'], 2) if rows[period]['bars'] >= period else None
+                for period in EMA_PERIODS
+            }
+        return result
+
+    @staticmethod
+    async def _get_live_bases(codes, timeframe, bar_date):
+        """行情所在交易日之前的EMA（盘中临时EMA的递推起点）
+
+        最后一根K线早于该交易日时起点为 value；该交易日K线已落库（盘中、收盘后采集，或休市日取到
+        上一交易日行情）时起点为 prev_value，即改写最后一根K线而不是新增一根。
+        起点在一个交易日内不变，按 EMA_LIVE_BASE_SECONDS 缓存在进程内。
+
+        Returns:
+            dict: {code: (起点数组（无历史时为 NaN）, 该交易日之前的K线根数)}，
+                  没有完整状态或状态晚于该交易日（行情过旧）的股票不在结果中
+        """
+        ttl = float(os.getenv('EMA_LIVE_BASE_SECONDS', '300'))
+        now = time.monotonic()
+        bases, missing = {}, []
+        for code in codes:
+            cached = _live_bases.get((code, timeframe))
+            if cached and cached[0] == bar_date and now - cached[1] < ttl:
+                bases[code] = cached[2:]
+            else:
+                missing.append(code)
+        if not missing:
+            return bases
+
+        states = await EmaStateRepository.get_states(missing, [timeframe])
+        for code in missing:
+            rows = states.get((code, timeframe))
+            if rows is None or any(period not in rows for period in EMA_PERIODS):
+                continue
+            first = rows[EMA_PERIODS[0]]
+            if first['last_date'] < bar_date:
+                base = np.array([rows[p]['value'] for p in EMA_PERIODS])
+                bars = first['bars']
+            elif first['last_date'] == bar_date:
+                base = np.array([np.nan if rows[p]['prev_value'] is None else rows[p]['prev_value']
+                                 for p in EMA_PERIODS])
+                bars = first['bars'] - 1
+            else:
+                continue
+            _live_bases[(code, timeframe)] = (bar_date, now, base, bars)
+            bases[code] = (base, bars)
+        return bases
+
+    @staticmethod
+    async def get_live(prices, timeframe='1d', today=None, trade_dates=None):
+        """盘中临时EMA：以实时价格作为行情所在交易日的收盘，在该交易日之前的EMA状态上递推一根K线
+
+        K线日期取行情时间戳对应的交易日（trade_dates），而不是当天日期：周末、节假日行情停在上一
+        交易日，该K线已落库时改写它，不会多递推出一根不存在的K线。不读取历史K线，全部股票一次向量运算完成。
+
+        Args:
+            prices: {code: 实时价格}，价格为 None 的股票跳过
+            timeframe: EMA状态的K线周期
+            today: 缺少行情交易日时使用的日期，默认 date.today()
+            trade_dates: {code: 行情所在交易日}，取自 PortfolioService 行情结果
+
+        Returns:
+            dict: {code: {EMA周期: 保留两位小数的EMA，K线根数（含该交易日）不足该周期时为 None}}
+        """
+        today = today or date.today()
+        trade_dates = trade_dates or {}
+        by_date = {}
+        for code, price in prices.items():
+            if price is not None:
+                by_date.setdefault(trade_dates.get(code) or today, []).append(code)
+
+        bases = {}
+        for bar_date, codes in by_date.items():
+            bases.update(await EmaStateService._get_live_bases(codes, timeframe, bar_date))
+        if not bases:
+            return {}
+
+        codes = list(bases)
+        values = ema_step(np.stack([bases[code][0] for code in codes]), [prices[code] for code in codes])
+        result = {}
+        for i, code in enumerate(codes):
+            bars = bases[code][1] + 1
+            result[code] = {
+                period: round(float(values[i, j]), 2) if bars >= period else None
+                for j, period in enumerate(EMA_PERIODS)
+            }
+        return result
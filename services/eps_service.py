@@ -1,6 +1,7 @@
 import akshare as ak
 from datetime import datetime
 from utils.logger import get_logger
+from utils import rate_limiter
 
 # 获取日志实例
 logger = get_logger('fetch_eps')
@@ -8,6 +9,7 @@ logger = get_logger('fetch_eps')
 def get_current_year_eps_forecast(stock_code):
     """获取当前年度每股收益预测均值"""
     try:
+        rate_limiter.acquire_sync(rate_limiter.THS)
         profit_forecast = ak.stock_profit_forecast_ths(symbol=stock_code)
         
         if profit_forecast is not None and not profit_forecast.empty:
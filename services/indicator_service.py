@@ -0,0 +1,118 @@
+import threading
+import time
+import numpy as np
+from services.kline_bar_service import KlineBarService
+from services.kline_store import KlineStore
+from utils import kline_bars
+from utils.indicators import build_price_matrix, technical_last
+from utils.logger import get_logger
+
+# 获取日志实例
+logger = get_logger('indicator_service')
+
+# 计算技术指标读取的K线根数（MACD 等递推指标的预热长度）
+_BARS = 250
+
+# 结果缓存：{(code, timeframe): ((最后一根K线日期, 最后收盘价), {指标名: 值})}
+# 最后收盘价用于识别盘中采集对当日K线的改写
+_cache = {}
+_lock = threading.Lock()
+
+
+class IndicatorService:
+    """技术指标（MACD / RSI / 布林带 / ATR）：多只股票一次矩阵计算，结果按 (股票, 周期, 最后一根K线日期) 缓存"""
+
+    @staticmethod
+    async def get_batch(codes, timeframe='1d'):
+        """批量获取最新技术指标
+
+        Args:
+            codes: 股票代码列表
+            timeframe: '1d' / '2d' / '3d' / '1w'
+
+        Returns:
+            dict: {code: {指标名: 保留两位小数的值，K线不足时为 None}}，没有K线的股票为 None
+                  指标名见 utils.indicators.technical_last
+        """
+        if not codes:
+            return {}
+
+        bars_map = await IndicatorService.load_bars(codes, timeframe)
+        result, todo = {}, {}
+        with _lock:
+            for code in dict.fromkeys(codes):
+                bars = bars_map.get(code)
+                if bars is None or len(bars['date']) == 0:
+                    result[code] = None
+                    continue
+                key = (bars['date'][-1], float(bars['close'][-1]))
+                cached = _cache.get((code, timeframe))
+                if cached is not None and cached[0] == key:
+                    result[code] = cached[1]
+                else:
+                    todo[code] = (key, bars)
+
+        if todo:
+            hits = sum(1 for values in result.values() if values is not None)
+            start = time.perf_counter()
+            computed = IndicatorService._compute({code: bars for code, (_, bars) in todo.items()})
+            with _lock:
+                for code, values in computed.items():
+                    _cache[(code, timeframe)] = (todo[code][0], values)
+            result.update(computed)
+            logger.info(f"计算 {len(todo)} 只股票 {timeframe} 技术指标（缓存命中 {hits} 只），"
+                        f"耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        return result
+
+    @staticmethod
+    async def load_bars(codes, timeframe, limit=_BARS):
+        """读取最近 limit 根K线（日线取自 KlineStore，多日K线取自 stock_kline_bars）
+
+        Returns:
+            dict: {code: {'date': datetime64[D] 数组, 'close' / 'high' / 'low': float64 数组}}，无数据为 None
+        """
+        if timeframe == '1d':
+            store = await KlineStore.get_batch(codes, limit=limit)
+            return {
+                code: None if bars is None else
+                {'date': bars.dates, 'close': bars.close, 'high': bars.high, 'low': bars.low}
+                for code, bars in store.items()
+            }
+        if timeframe not in kline_bars.TIMEFRAMES:
+            raise ValueError(f"不支持的K线周期: {timeframe}")
+
+        frames = await KlineBarService.get_bars_batch(codes, timeframe, limit)
+        return {
+            code: None if df is None else {
+                'date': np.asarray(df['日期'].to_numpy(), dtype='datetime64[D]'),
+                'close': df['收盘'].to_numpy(dtype=np.float64),
+                'high': df['最高'].to_numpy(dtype=np.float64),
+                'low': df['最低'].to_numpy(dtype=np.float64),
+            }
+            for code, df in frames.items()
+        }
+
+    @staticmethod
+    def _compute(bars_map):
+        """对 {code: 列数组} 一次矩阵计算全部技术指标的最新值"""
+        codes = list(bars_map)
+        close, _ = build_price_matrix([bars_map[code]['close'] for code in codes], _BARS, fill='nan')
+        high, _ = build_price_matrix([bars_map[code]['high'] for code in codes], _BARS, fill='nan')
+        low, _ = build_price_matrix([bars_map[code]['low'] for code in codes], _BARS, fill='nan')
+        latest = technical_last(close, high, low)
+        return {
+            code: {name: None if np.isnan(values[i]) else round(float(values[i]), 2)
+                   for name, values in latest.items()}
+            for i, code in enumerate(codes)
+        }
+
+    @staticmethod
+    def invalidate(codes=None):
+        """清除技术指标缓存（codes 为空时清除全部）"""
+        with _lock:
+            if codes is None:
+                _cache.clear()
+                return
+            codes = set(codes)
+            for key in [key for key in _cache if key[0] in codes]:
+                del _cache[key]
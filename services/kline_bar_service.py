@@ -0,0 +1,116 @@
+import time
+from datetime import date
+import numpy as np
+from repositories.kline_bars_repository import KlineBarsRepository
+from repositories.kline_repository import KlineRepository
+from utils import kline_bars
+from utils.kline_normalizer import normalize_kline_frame, count_rows
+from utils.logger import get_logger
+
+# 获取日志实例
+logger = get_logger('kline_bar_service')
+
+# 重建时读取日线的起始日（早于任何数据）
+_FULL_HISTORY = date(1990, 1, 1)
+
+# 单只股票增量重算时最多读取的日线条数
+_MAX_DAILY_ROWS = 100000
+
+
+class KlineBarService:
+    """多日K线（2日 / 3日 / 周线）：由日线增量聚合并持久化，读取时直接按索引查询"""
+
+    @staticmethod
+    async def refresh(kline_data_dict):
+        """日线落库后重算受影响的多日K线
+
+        只重算新日线所在分桶及之后的分桶：先找出最早新日线所在的各周期分桶起始日，
+        从中最早的一天起读取日线，再按周期分别聚合。
+
+        Args:
+            kline_data_dict: 传给 KlineRepository.save_all_batch 的 {code: DataFrame 或列数组}
+
+        Returns:
+            dict: 重算的多日K线 {code: {timeframe: kline_bars.aggregate 的结果}}
+        """
+        since_dates = {}
+        for code, data in kline_data_dict.items():
+            if data is None or count_rows(data) == 0:
+                continue
+            columns = data if isinstance(data, dict) else normalize_kline_frame(data)
+            since_dates[code] = columns['date'].min()
+        return await KlineBarService._rebuild_from(since_dates)
+
+    @staticmethod
+    async def rebuild(codes):
+        """从全部日线重建股票的多日K线"""
+        return await KlineBarService._rebuild_from({code: np.datetime64(_FULL_HISTORY, 'D') for code in codes})
+
+    @staticmethod
+    async def _rebuild_from(changed_dates):
+        """重算 {code: 最早变化的日线日期} 之后的多日K线
+
+        Returns:
+            dict: {code: {timeframe: kline_bars.aggregate 的结果}}
+        """
+        if not changed_dates:
+            return {}
+
+        start = time.perf_counter()
+        # 每个周期从变化日期所在分桶的起始日开始重算，保证分桶完整
+        bucket_froms = {
+            code: {tf: kline_bars.bucket_starts(np.array([changed], dtype='datetime64[D]'), tf)[0]
+                   for tf in kline_bars.TIMEFRAMES}
+            for code, changed in changed_dates.items()
+        }
+        since_dates = {code: min(froms.values()).item() for code, froms in bucket_froms.items()}
+        frames = await KlineRepository.get_since_batch(since_dates, limit=_MAX_DAILY_ROWS)
+
+        records = []
+        aggregated = {}
+        for code, df in frames.items():
+            if df is None:
+                continue
+            daily = normalize_kline_frame(df)
+            for tf in kline_bars.TIMEFRAMES:
+                mask = daily['date'] >= bucket_froms[code][tf]
+                bars = kline_bars.aggregate({key: value[mask] for key, value in daily.items()}, tf)
+                aggregated.setdefault(code, {})[tf] = bars
+                records.extend(zip(
+                    [code] * len(bars['bucket_start']), [tf] * len(bars['bucket_start']),
+                    bars['bucket_start'].tolist(), bars['last_date'].tolist(),
+                    bars['open'].tolist(), bars['close'].tolist(), bars['high'].tolist(),
+                    bars['low'].tolist(), bars['amount'].tolist(), bars['bar_days'].tolist()
+                ))
+
+        saved = await KlineBarsRepository.save_bars(records)
+        logger.info(f"多日K线重算 {len(changed_dates)} 只股票，写入 {saved} 条，"
+                    f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return aggregated
+
+    @staticmethod
+    async def get_bars(code, timeframe, count=250):
+        """获取最近 count 根多日K线（尚未生成时先从日线重建）
+
+        Returns:
+            DataFrame: 列为 日期、开盘、收盘、最高、最低、amount，没有日线数据时返回 None
+        """
+        df = await KlineBarsRepository.get_by_code(code, timeframe, count)
+        if df is None:
+            await KlineBarService.rebuild([code])
+            df = await KlineBarsRepository.get_by_code(code, timeframe, count)
+        return df
+
+    @staticmethod
+    async def get_bars_batch(codes, timeframe, count=250):
+        """批量获取多只股票最近 count 根多日K线（尚未生成的股票先从日线重建）
+
+        Returns:
+            dict: {code: DataFrame}，没有日线数据的股票为 None
+        """
+        result = await KlineBarsRepository.get_batch(codes, timeframe, count)
+        missing = [code for code, df in result.items() if df is None]
+        if missing:
+            await KlineBarService.rebuild(missing)
+            result.update(await KlineBarsRepository.get_batch(missing, timeframe, count))
+        return result
@@ -0,0 +1,263 @@
+import asyncio
+import os
+import random
+import time
+from repositories.kline_repository import KlineRepository
+from services.ema_state_service import EmaStateService
+from services.kline_bar_service import KlineBarService
+from services.kline_store import KlineStore
+from services.stock_indicator_service import StockIndicatorService
+from utils.executors import run_in_process
+from utils.kline_normalizer import normalize_kline_frame, count_rows
+from utils.logger import get_logger
+
+# 获取日志实例
+logger = get_logger('kline_pipeline')
+
+
+class KlinePipeline:
+    """K线流式流水线：抓取协程把 DataFrame 放入有界队列，写入协程按行数或时间分块落库
+
+    抓取与写入并行进行，内存中最多同时存在 并发数 + 队列长度 + 一个写入块 的数据，
+    与处理的股票总数无关。
+
+    抓取到的 DataFrame 先规整为紧凑的列数组再入队；KLINE_NORMALIZE_MODE=process 时
+    规整在进程池中进行，日期解析等 CPU 计算不占用事件循环。
+    """
+
+    def __init__(self, force_update=False, latest_dates=None, max_concurrent=10, limiter=None,
+                 queue_size=None, chunk_rows=None, flush_seconds=None, writers=None,
+                 max_attempts=None, retry_base_delay=None, retry_max_delay=None,
+                 start_date=None, end_date=None, normalize_mode=None):
+        """
+        Args:
+            force_update: 是否强制更新
+            latest_dates: 预查询的 {code: latest_date}
+            max_concurrent: 抓取并发数（未提供 limiter 时使用固定并发）
+            limiter: AdaptiveLimiter，提供时由其动态控制抓取并发
+            queue_size: 队列最大长度（DataFrame 个数），默认读取 KLINE_WRITE_QUEUE_SIZE
+            chunk_rows: 单次写入的行数阈值，默认读取 KLINE_WRITE_CHUNK_ROWS
+            flush_seconds: 单次写入的时间阈值（秒），默认读取 KLINE_WRITE_FLUSH_SECONDS
+            writers: 写入协程数量，默认读取 KLINE_WRITERS
+            max_attempts: 单只股票最多抓取次数，默认读取 KLINE_RETRY_ATTEMPTS
+            retry_base_delay: 重试退避基数（秒），默认读取 KLINE_RETRY_BASE_DELAY
+            retry_max_delay: 重试退避上限（秒），默认读取 KLINE_RETRY_MAX_DELAY
+            start_date: 指定开始日期 YYYYMMDD（历史回补使用）
+            end_date: 指定结束日期 YYYYMMDD
+            normalize_mode: 'inline'（事件循环中规整）/ 'process'（进程池中规整），
+                            默认读取 KLINE_NORMALIZE_MODE
+        """
+        self.force_update = force_update
+        self.latest_dates = latest_dates or {}
+        self.max_concurrent = max(1, max_concurrent)
+        self.limiter = limiter
+        self.queue_size = queue_size or int(os.getenv('KLINE_WRITE_QUEUE_SIZE', '20'))
+        self.chunk_rows = chunk_rows or int(os.getenv('KLINE_WRITE_CHUNK_ROWS', '50000'))
+        self.flush_seconds = flush_seconds or float(os.getenv('KLINE_WRITE_FLUSH_SECONDS', '5'))
+        self.writers = writers or int(os.getenv('KLINE_WRITERS', '1'))
+        self.max_attempts = max(1, max_attempts or int(os.getenv('KLINE_RETRY_ATTEMPTS', '3')))
+        self.retry_base_delay = retry_base_delay or float(os.getenv('KLINE_RETRY_BASE_DELAY', '2'))
+        self.retry_max_delay = retry_max_delay or float(os.getenv('KLINE_RETRY_MAX_DELAY', '30'))
+        self.start_date = start_date
+        self.end_date = end_date
+        self.normalize_mode = (normalize_mode or os.getenv('KLINE_NORMALIZE_MODE', 'inline')).lower()
+
+        self.success_count = 0
+        self.no_data_count = 0
+        self.error_count = 0
+        self.saved_count = 0
+        self.saved_records = 0
+        self.failed_codes = []
+        self.failures = {}
+
+    async def run(self, codes):
+        """运行流水线
+
+        Args:
+            codes: 股票代码列表
+
+        Returns:
+            dict: 统计信息
+        """
+        start = time.time()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        code_iter = iter(codes)
+
+        async def fetcher():
+            # 所有抓取协程共享同一个代码迭代器，单线程事件循环下无需加锁
+            for code in code_iter:
+                success, df = await self._fetch_with_retry(code)
+
+                if not success:
+                    self.error_count += 1
+                    self.failed_codes.append(code)
+                elif df is None or df.empty:
+                    self.no_data_count += 1
+                else:
+                    try:
+                        columns = await self._normalize(df)
+                    except Exception as e:
+                        logger.error(f"规整 {code} 数据失败: {e}")
+                        self.error_count += 1
+                        self.failed_codes.append(code)
+                        self.failures[code] = (f"数据规整失败: {e}", 1)
+                        continue
+                    self.success_count += 1
+                    # 队列满时在此等待，形成背压
+                    await queue.put((code, columns))
+
+        writer_tasks = [asyncio.create_task(self._writer(queue)) for _ in range(self.writers)]
+        # 自适应模式下按上限启动抓取协程，实际并发由限制器控制
+        max_fetchers = self.limiter.max_limit if self.limiter else self.max_concurrent
+        fetch_count = min(max_fetchers, len(codes)) or 1
+        fetch_tasks = [asyncio.create_task(fetcher()) for _ in range(fetch_count)]
+
+        async def finish_fetching():
+            await asyncio.gather(*fetch_tasks)
+            for _ in writer_tasks:
+                await queue.put(None)
+
+        # 抓取与写入一起等待：任一阶段出错时立即抛出，并取消另一阶段，
+        # 避免写入协程退出后抓取协程永远阻塞在 queue.put（或反之）
+        tasks = fetch_tasks + writer_tasks
+        try:
+            await asyncio.gather(finish_fetching(), *writer_tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        elapsed = time.time() - start
+        logger.info(f"流水线完成: {self.success_count} 只有新数据, {self.no_data_count} 只无新数据, "
+                    f"{self.error_count} 只失败，写入 {self.saved_count} 只 {self.saved_records} 条，"
+                    f"耗时: {elapsed:.2f}秒")
+        return self.stats()
+
+    async def _fetch_with_retry(self, code):
+        """抓取单只股票，失败时按带抖动的指数退避重试
+
+        Returns:
+            tuple: (是否成功, DataFrame)；最终失败时错误和抓取次数记入 self.failures
+        """
+        from services.kline_service import KlineService
+
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                # 并发槽位在 fetch_kline_async 内部占用，返回前释放，写入背压不占用上游并发
+                df = await KlineService.fetch_kline_async(
+                    code, self.force_update, self.latest_dates.get(code), self.start_date, self.end_date,
+                    limiter=self.limiter
+                )
+                return True, df
+            except asyncio.TimeoutError:
+                error = "请求超时"
+            except Exception as e:
+                error = str(e) or type(e).__name__
+
+            if attempt < self.max_attempts:
+                # 退避时间在 [上限/2, 上限] 之间随机，避免失败的请求同时重试
+                backoff = min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt - 1))
+                delay = backoff / 2 + random.uniform(0, backoff / 2)
+                logger.warning(f"获取 {code} 失败（第 {attempt} 次）: {error}，{delay:.1f}秒后重试")
+                await asyncio.sleep(delay)
+
+        logger.error(f"获取 {code} 失败，已重试 {self.max_attempts} 次: {error}")
+        self.failures[code] = (error, self.max_attempts)
+        return False, None
+
+    async def _normalize(self, df):
+        """把 DataFrame 规整为列数组"""
+        if self.normalize_mode == 'process':
+            return await run_in_process(normalize_kline_frame, df)
+        return normalize_kline_frame(df)
+
+    async def _writer(self, queue):
+        """写入协程：攒够行数或超时后批量落库"""
+        buffer = {}
+        buffered_rows = 0
+        first_at = None
+
+        while True:
+            timeout = None
+            if first_at is not None:
+                timeout = max(0.0, self.flush_seconds - (time.monotonic() - first_at))
+
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                await self._flush(buffer)
+                buffer, buffered_rows, first_at = {}, 0, None
+                continue
+
+            if item is None:
+                await self._flush(buffer)
+                return
+
+            code, columns = item
+            buffer[code] = columns
+            buffered_rows += count_rows(columns)
+            if first_at is None:
+                first_at = time.monotonic()
+
+            if buffered_rows >= self.chunk_rows:
+                await self._flush(buffer)
+                buffer, buffered_rows, first_at = {}, 0, None
+
+    async def _flush(self, buffer):
+        """写入一个数据块"""
+        if not buffer:
+            return
+
+        save_start = time.time()
+        saved_count, total, records = await KlineRepository.save_all_batch(buffer)
+        if saved_count == 0:
+            # 整块写入失败，这些股票视为失败
+            logger.error(f"写入块失败: {total} 只股票")
+            self.failed_codes.extend(buffer.keys())
+            for code in buffer:
+                self.failures[code] = ("写入数据库失败", 1)
+            self.success_count -= len(buffer)
+            self.error_count += len(buffer)
+            return
+
+        self.saved_count += saved_count
+        self.saved_records += records
+        # 已缓存的股票直接追加新K线，读取路径无需回查数据库；启用文件缓存时同时更新文件
+        try:
+            KlineStore.apply_saved(buffer)
+        except Exception as e:
+            # 丢弃这些股票的缓存，下次读取时从数据库重新加载
+            logger.error(f"更新K线缓存失败: {e}")
+            KlineStore.invalidate(buffer.keys())
+        try:
+            await KlineStore.persist_saved(buffer)
+        except Exception as e:
+            logger.error(f"更新K线文件失败: {e}")
+        # 增量维护 2日 / 3日 / 周线，以及各周期的EMA状态和指标物化表
+        multi_day_bars = {}
+        try:
+            multi_day_bars = await KlineBarService.refresh(buffer)
+        except Exception as e:
+            logger.error(f"更新多日K线失败: {e}")
+        try:
+            await EmaStateService.apply_saved(buffer, multi_day_bars)
+        except Exception as e:
+            logger.error(f"更新EMA状态失败: {e}")
+        try:
+            await StockIndicatorService.refresh(buffer, multi_day_bars)
+        except Exception as e:
+            logger.error(f"更新指标物化表失败: {e}")
+        logger.info(f"写入块完成: {saved_count} 只股票，{records} 条记录，耗时: {time.time() - save_start:.2f}秒")
+
+    def stats(self):
+        """统计信息"""
+        return {
+            'success_count': self.success_count,
+            'no_data_count': self.no_data_count,
+            'error_count': self.error_count,
+            'saved_count': self.saved_count,
+            'saved_records': self.saved_records,
+            'failed_codes': list(self.failed_codes),
+            'failures': dict(self.failures),
+        }
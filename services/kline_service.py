@@ -1,14 +1,22 @@
 import akshare as ak
-import pandas as pd
 from datetime import datetime, timedelta
 import os
 import asyncio
+import socket
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import uuid
 from repositories.kline_repository import KlineRepository
 from repositories.monitor_repository import MonitorStockRepository
 from repositories.stock_list_repository import StockListRepository
+from repositories.dead_letter_repository import KlineDeadLetterRepository
+from services.kline_pipeline import KlinePipeline
+from services.kline_bar_service import KlineBarService
+from services.kline_store import KlineStore
+from utils.kline_bars import TIMEFRAMES as KLINE_BAR_TIMEFRAMES
+from utils.adaptive_limiter import AdaptiveLimiter
 from utils.logger import get_logger
+from utils.executors import run_blocking, INGEST
+from utils import rate_limiter
 
 
 os.environ.pop('http_proxy', None)
@@ -18,6 +26,9 @@ os.environ.pop('all_proxy', None)
 # 获取日志实例
 logger = get_logger('kline_service')
 
+# K线采集的自适应并发限制器（进程内共享，跨批次保留学到的并发上限）
+_kline_limiter = None
+
 
 class KlineService:
     """K线管理服务（异步版本）"""
@@ -32,54 +43,8 @@ class KlineService:
             latest_date: 预查询的最新日期，避免重复查询数据库
         """
         try:
-            # 转换代码格式
-            if code.startswith('sh'):
-                symbol = 'sh' + code[2:]
-            elif code.startswith('sz'):
-                symbol = 'sz' + code[2:]
-            else:
-                symbol = 'sh' + code if code.startswith('6') else 'sz' + code
-            
-            # 确定数据范围
-            if force_update:
-                start_date = "20200101"
-            else:
-                if latest_date:
-                    latest = latest_date
-                else:
-                    latest = await KlineRepository.get_latest_date(code)
-                
-                if latest:
-                    next_day = (datetime.strptime(latest, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y%m%d')
-                    start_date = next_day
-                else:
-                    # 没有历史数据，从2020年开始获取
-                    start_date = "20200101"
-            
-            end_date = datetime.now().strftime('%Y%m%d')
-            
-            if start_date >= end_date:
-                return True, code, None
-            
-            # 在线程池中执行阻塞的 akshare 调用，添加120秒超时
-            loop = asyncio.get_event_loop()
-            df = await asyncio.wait_for(
-                loop.run_in_executor(
-                    None, 
-                    lambda: ak.stock_zh_a_hist_tx(symbol=symbol, start_date=start_date, end_date=end_date, adjust="qfq")
-                ),
-                timeout=120
-            )
-            
-            if df is None or df.empty:
-                return True, code, None
-            
-            # 转换列名
-            if 'date' in df.columns and 'close' in df.columns:
-                df = df.rename(columns={'date': '日期', 'open': '开盘', 'close':  '收盘', 'high': '最高', 'low': '最低'})
-            
+            df = await KlineService.fetch_kline_async(code, force_update, latest_date)
             return True, code, df
-        
         except asyncio.TimeoutError:
             logger.warning(f"获取 {code} 数据超时")
             return False, code, None
@@ -87,11 +52,127 @@ class KlineService:
             logger.error(f"获取 {code} 数据失败: {str(e)}")
             return False, code, None
 
+    @staticmethod
+    async def fetch_kline_async(code, force_update=False, latest_date=None, start_date=None, end_date=None,
+                                limiter=None):
+        """获取单只股票的新增K线数据，失败时抛出异常（由调用方决定重试）
+
+        Args:
+            code: 股票代码
+            force_update: 是否强制更新
+            latest_date: 预查询的最新日期，避免重复查询数据库
+            start_date: 指定开始日期 YYYYMMDD（历史回补使用），默认按最新日期推算
+            end_date: 指定结束日期 YYYYMMDD，默认今天
+            limiter: 自适应并发限制器，取到限流令牌后才占用槽位，只按 akshare 调用本身的耗时调整并发
+
+        Returns:
+            DataFrame: 新增K线数据，没有新数据时返回 None
+
+        Raises:
+            asyncio.TimeoutError: 请求超时
+        """
+        # 转换代码格式
+        if code.startswith('sh'):
+            symbol = 'sh' + code[2:]
+        elif code.startswith('sz'):
+            symbol = 'sz' + code[2:]
+        else:
+            symbol = 'sh' + code if code.startswith('6') else 'sz' + code
+        
+        # 确定数据范围（未指定开始日期时）
+        if not start_date and force_update:
+            start_date = "20200101"
+        elif not start_date:
+            if latest_date:
+                latest = latest_date
+            else:
+                latest = await KlineRepository.get_latest_date(code)
+            
+            if latest:
+                start_date = (latest + timedelta(days=1)).strftime('%Y%m%d')
+            else:
+                # 没有历史数据，从2020年开始获取
+                start_date = "20200101"
+        
+        end_date = end_date or datetime.now().strftime('%Y%m%d')
+        
+        if start_date >= end_date:
+            return None
+        
+        # akshare 按年分段请求，每年消耗一个令牌
+        await rate_limiter.acquire(
+            rate_limiter.TX, tokens=int(end_date[:4]) - int(start_date[:4]) + 1
+        )
+
+        # 限流等待和线程池排队都不计入上游延迟：令牌之后再占并发槽位，只计 akshare 调用本身的耗时
+        started_at = await limiter.acquire() if limiter else None
+        timing = {}
+
+        def fetch():
+            fetch_start = time.monotonic()
+            try:
+                return ak.stock_zh_a_hist_tx(symbol=symbol, start_date=start_date, end_date=end_date, adjust="qfq")
+            finally:
+                timing['latency'] = time.monotonic() - fetch_start
+
+        # 在采集专用线程池中执行阻塞的 akshare 调用，添加120秒超时
+        success = False
+        try:
+            df = await asyncio.wait_for(run_blocking(INGEST, fetch), timeout=120)
+            success = True
+        finally:
+            if limiter:
+                limiter.release(started_at, success, timing.get('latency'))
+        
+        if df is None or df.empty:
+            return None
+        
+        # 转换列名
+        if 'date' in df.columns and 'close' in df.columns:
+            df = df.rename(columns={'date': '日期', 'open': '开盘', 'close':  '收盘', 'high': '最高', 'low': '最低'})
+        
+        return df
+
     @staticmethod
     def update_single_kline(code, force_update=False):
         """同步包装器，用于向后兼容"""
         return asyncio.run(KlineService.update_single_kline_async(code, force_update))[0]
     
+    @staticmethod
+    def get_concurrency_limiter(initial_limit=None):
+        """获取K线采集的自适应并发限制器
+
+        KLINE_ADAPTIVE_CONCURRENCY=false 时返回 None，退回固定并发。
+
+        Args:
+            initial_limit: 首次创建时的初始并发数，默认读取 KLINE_UPDATE_CONCURRENT
+        """
+        global _kline_limiter
+        if os.getenv('KLINE_ADAPTIVE_CONCURRENCY', 'true').lower() != 'true':
+            return None
+
+        if _kline_limiter is None:
+            if initial_limit is None:
+                initial_limit = int(os.getenv('KLINE_UPDATE_CONCURRENT', '10'))
+            _kline_limiter = AdaptiveLimiter(
+                'kline_update',
+                initial_limit=initial_limit,
+                min_limit=int(os.getenv('KLINE_CONCURRENT_MIN', '2')),
+                max_limit=int(os.getenv('KLINE_CONCURRENT_MAX', '100')),
+                latency_target=float(os.getenv('KLINE_LATENCY_TARGET', '15'))
+            )
+        return _kline_limiter
+
+    @staticmethod
+    def get_batch_size(max_concurrent):
+        """每批领取的股票数（KLINE_BATCH_SIZE）
+
+        不小于并发上限：一批股票数就是该批最多能启动的抓取协程数，批次过小时自适应并发无法增长到上限。
+        """
+        limiter = KlineService.get_concurrency_limiter(max_concurrent)
+        ceiling = limiter.max_limit if limiter else max_concurrent
+        return max(int(os.getenv('KLINE_BATCH_SIZE', '200')), ceiling)
+
     @staticmethod
     def _add_prefix_to_code(code):
         """为股票代码添加前缀（sh/sz/bj）"""
@@ -103,6 +184,11 @@ class KlineService:
             return f'bj{code}'
         return code
 
+    @staticmethod
+    def _strip_prefix(code):
+        """去掉股票代码的交易所前缀（stock_list 中的代码不带前缀）"""
+        return code[2:] if code[:2] in ('sh', 'sz', 'bj') else code
+
     @staticmethod
     async def batch_update_kline_async(force_update=False, max_concurrent=None):
         """异步批量更新K线数据"""
@@ -115,156 +201,200 @@ class KlineService:
 
         if force_update:
             if update_all:
-                # 循环获取需要更新的股票（每次10条）
-                logger.info("开始强制更新所有股票的K线（分批处理）")
-                total_processed = 0
-                batch_count = 0
+                # 全市场强制更新走可断点续传的回补任务，存在未完成（含中途失败）的任务时从游标处继续该任务
+                from services.backfill_service import BackfillService
 
-                while True:
-                    # 获取需要更新的股票（每次默认10条）
-                    stocks = await StockListRepository.get_pending_update(limit=max_concurrent)
-
-                    if not stocks:
-                        logger.info("所有股票已处理完成")
-                        break
-
-                    batch_count += 1
-                    codes = [KlineService._add_prefix_to_code(s.code) for s in stocks]
-                    logger.info(f"批次 {batch_count}: 处理 {len(codes)} 只股票")
-
-                    # 处理这批股票
-                    batch_result = await KlineService._process_batch(codes, max_concurrent, force_update)
-
-                    # 更新这些股票的 last_update 时间
-                    updated_codes = [s.code for s in stocks]
-                    await StockListRepository.update_last_update(updated_codes)
-
-                    total_processed += len(codes)
-                    logger.info(f"批次 {batch_count} 完成，累计处理 {total_processed} 只股票")
-
-                    # 如果返回 False，说明有错误，可以选择继续或停止
-                    if not batch_result and force_update:
-                        logger.warning(f"批次 {batch_count} 处理出现错误，继续处理下一批")
+                job = await BackfillService.get_active_job()
+                if job:
+                    job_id = job['id']
+                    logger.info(f"继续未完成的回补任务 {job_id}（{job['status']}，游标: {job['cursor']}）")
+                else:
+                    job_id = await BackfillService.create_job()
 
-                logger.info(f"强制更新完成，共处理 {total_processed} 只股票")
-                return True
+                status = await BackfillService.run_job(job_id, reopen_failed=True)
+                logger.info(f"强制更新结束，回补任务 {job_id} 状态: {status}")
+                return status == 'completed'
             else:
                 # 只更新监控股票
                 stocks = await MonitorStockRepository.get_enabled()
                 codes = [s.code for s in stocks]
                 logger.info(f"强制更新 {len(codes)} 只监控股票的K线")
-                return await KlineService._process_batch(codes, max_concurrent, force_update)
+                batch_result, _ = await KlineService._process_batch(codes, max_concurrent, force_update)
+                return batch_result
         else:
             if update_all:
-                # 循环获取需要更新的股票（每次10条）
-                logger.info("开始增量更新所有股票的K线（分批处理）")
-                total_processed = 0
-                batch_count = 0
+                # 通过租约队列领取股票，可与其他进程（worker.py）同时运行
+                await KlineService.update_all_with_leases(max_concurrent)
+                return True
+            else:
+                # 只更新需要更新的监控股票
+                codes = await KlineRepository.get_need_update(days=1)
+                logger.info(f"增量更新 {len(codes)} 只监控股票的K线")
+                batch_result, _ = await KlineService._process_batch(codes, max_concurrent, force_update)
+                return batch_result
+
+    @staticmethod
+    def make_worker_id():
+        """生成采集进程标识（主机名:进程号:随机后缀）"""
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
 
-                while True:
-                    # 获取需要更新的股票（每次10条）
-                    stocks = await StockListRepository.get_pending_update(limit=max_concurrent)
+    @staticmethod
+    async def update_all_with_leases(max_concurrent=None, owner=None, stop_event=None):
+        """增量更新所有股票的K线，按批领取租约
 
-                    if not stocks:
-                        logger.info("没有更多股票需要更新")
-                        break
+        多个进程可同时调用：每批通过 FOR UPDATE SKIP LOCKED 领取互不重叠的股票，
+        处理期间定期续租；进程崩溃后租约到期，股票会被其他进程重新领取。
 
-                    batch_count += 1
-                    codes = [KlineService._add_prefix_to_code(s.code) for s in stocks]
-                    logger.info(f"批次 {batch_count}: 处理 {len(codes)} 只股票")
+        Args:
+            max_concurrent: 初始抓取并发数（自适应并发关闭时为固定并发数）
+            owner: 采集进程标识，默认自动生成
+            stop_event: asyncio.Event，置位后处理完当前批次即退出
 
-                    # 处理这批股票
-                    batch_result = await KlineService._process_batch(codes, max_concurrent, force_update)
+        Returns:
+            dict: {'batches': 批次数, 'processed': 处理数, 'failed': 失败数}
+        """
+        if max_concurrent is None:
+            max_concurrent = int(os.getenv('KLINE_UPDATE_CONCURRENT', '10'))
+        owner = owner or KlineService.make_worker_id()
+        lease_seconds = int(os.getenv('KLINE_LEASE_SECONDS', '900'))
+        batch_size = KlineService.get_batch_size(max_concurrent)
+
+        logger.info(f"{owner} 开始增量更新所有股票的K线（每批 {batch_size} 只，租约 {lease_seconds} 秒）")
+        total_processed = 0
+        total_failed = 0
+        batch_count = 0
+        # 本轮失败的股票（已进入死信表），不再重复领取
+        skipped = set()
+
+        while not (stop_event and stop_event.is_set()):
+            stocks = await StockListRepository.lease_pending_update(
+                owner, limit=batch_size, lease_seconds=lease_seconds, exclude=skipped
+            )
+            if not stocks:
+                logger.info(f"{owner} 没有更多股票需要更新")
+                break
+
+            batch_count += 1
+            codes = [KlineService._add_prefix_to_code(s.code) for s in stocks]
+            bare_codes = [s.code for s in stocks]
+            logger.info(f"{owner} 批次 {batch_count}: 处理 {len(codes)} 只股票")
+
+            heartbeat = asyncio.create_task(KlineService._renew_leases(owner, bare_codes, lease_seconds))
+            try:
+                batch_result, failed = await KlineService._process_batch(codes, max_concurrent, False)
+            finally:
+                heartbeat.cancel()
+
+            # 只刷新成功股票的 last_update，失败的租约保留到过期，由死信重试任务补齐
+            await StockListRepository.complete_lease(
+                owner, [s.code for s in stocks if KlineService._add_prefix_to_code(s.code) not in failed]
+            )
+            skipped.update(s.code for s in stocks if KlineService._add_prefix_to_code(s.code) in failed)
 
-                    # 更新这些股票的 last_update 时间
-                    updated_codes = [s.code for s in stocks]
-                    await StockListRepository.update_last_update(updated_codes)
+            total_processed += len(codes)
+            total_failed += len(failed)
+            logger.info(f"{owner} 批次 {batch_count} 完成，累计处理 {total_processed} 只股票")
 
-                    total_processed += len(codes)
-                    logger.info(f"批次 {batch_count} 完成，累计处理 {total_processed} 只股票")
+            if not batch_result:
+                logger.warning(f"{owner} 批次 {batch_count} 处理出现错误，继续处理下一批")
 
-                    # 如果返回 False，说明有错误，可以选择继续或停止
-                    if not batch_result:
-                        logger.warning(f"批次 {batch_count} 处理出现错误，继续处理下一批")
+        logger.info(f"{owner} 增量更新完成，共处理 {total_processed} 只股票，失败 {total_failed} 只")
+        return {'batches': batch_count, 'processed': total_processed, 'failed': total_failed}
 
-                logger.info(f"增量更新完成，共处理 {total_processed} 只股票")
-                return True
-            else:
-                # 只更新需要更新的监控股票
-                codes = await KlineRepository.get_need_update(days=1)
-                logger.info(f"增量更新 {len(codes)} 只监控股票的K线")
-                return await KlineService._process_batch(codes, max_concurrent, force_update)
+    @staticmethod
+    async def _renew_leases(owner, codes, lease_seconds):
+        """心跳：每三分之一租约时长续租一次"""
+        while True:
+            await asyncio.sleep(lease_seconds / 3)
+            try:
+                await StockListRepository.renew_lease(owner, codes, lease_seconds)
+            except Exception as e:
+                logger.warning(f"{owner} 续租失败: {e}")
 
     @staticmethod
-    async def _process_batch(codes, max_concurrent, force_update):
+    async def _process_batch(codes, max_concurrent, force_update, start_date=None, end_date=None):
         """处理一批股票的K线更新
 
+        重试后仍失败的股票记入死信表，成功的移出死信表。
+
         Args:
             codes: 股票代码列表
             max_concurrent: 最大并发数
             force_update: 是否强制更新
+            start_date: 指定开始日期 YYYYMMDD（历史回补使用）
+            end_date: 指定结束日期 YYYYMMDD
 
         Returns:
-            bool: 是否全部成功
+            tuple: (是否全部成功, 失败股票 {code: (error, attempts)})
         """
         if not codes:
-            return True
+            return True, {}
 
         # 批量查询所有股票的最新日期（非强制更新时）
         latest_dates = {}
         if not force_update:
             latest_dates = await KlineRepository.get_latest_dates_batch(codes)
 
-        # 使用信号量控制并发数量
-        semaphore = asyncio.Semaphore(max_concurrent)
+        # 流式处理：抓取与写入并行，内存占用与股票总数无关
+        limiter = KlineService.get_concurrency_limiter(max_concurrent)
+        pipeline = KlinePipeline(force_update, latest_dates, max_concurrent, limiter=limiter,
+                                 start_date=start_date, end_date=end_date)
+        stats = await pipeline.run(codes)
 
-        async def update_with_semaphore(code):
-            async with semaphore:
-                return await KlineService.update_single_kline_async(code, force_update, latest_dates.get(code))
+        success_count = stats['success_count']
+        total = len(codes)
 
-        # 创建所有任务
-        tasks = [update_with_semaphore(code) for code in codes]
+        failures = stats['failures']
+        await KlineDeadLetterRepository.record_failures(failures)
+        await KlineDeadLetterRepository.remove([code for code in codes if code not in failures])
 
-        # 并发执行所有任务，只获取数据不保存
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        status = 'success' if success_count == total else 'partial'
+        await KlineRepository.record_update(success_count, total, status)
 
-        # 收集所有需要保存的数据
-        kline_data_dict = {}
-        success_count = 0
-        total = len(codes)
-        no_data_count = 0
-        error_count = 0
+        if limiter:
+            logger.info(f"批次处理完成: {success_count}/{total}，当前并发上限: {limiter.limit}")
+        else:
+            logger.info(f"批次处理完成: {success_count}/{total}")
+        return success_count == total, failures
 
-        for result in results:
-            if isinstance(result, Exception):
-                error_count += 1
-            else:
-                success, code, df = result
-                if success:
-                    if df is not None and not df.empty:
-                        kline_data_dict[code] = df
-                        success_count += 1
-                    else:
-                        no_data_count += 1
-                else:
-                    error_count += 1
+    @staticmethod
+    async def drain_dead_letters_async(limit=None):
+        """重试死信表中已到期的股票
 
-        logger.info(f"数据获取完成: {success_count} 只有新数据, {no_data_count} 只无新数据, {error_count} 只失败")
+        成功的股票移出死信表并刷新 last_update，仍失败的按退避时间推迟下次重试。
 
-        # 一次性保存所有数据到数据库
-        if kline_data_dict:
-            save_start = time.time()
-            saved_count, _, records = await KlineRepository.save_all_batch(kline_data_dict)
-            save_time = time.time() - save_start
-            logger.info(f"批量保存完成: {saved_count} 只股票，{records} 条记录，耗时: {save_time:.2f}秒")
-        else:
-            logger.info("没有新数据需要保存")
+        Args:
+            limit: 单次最多重试的股票数，默认读取 KLINE_DEAD_LETTER_DRAIN_LIMIT
 
-        status = 'success' if success_count == total else 'partial'
-        await KlineRepository.record_update(success_count, total, status)
+        Returns:
+            tuple: (成功数, 失败数)
+        """
+        if limit is None:
+            limit = int(os.getenv('KLINE_DEAD_LETTER_DRAIN_LIMIT', '200'))
+
+        codes = await KlineDeadLetterRepository.get_due(limit=limit)
+        if not codes:
+            logger.info("死信表中没有到期的股票")
+            return 0, 0
+
+        logger.info(f"开始重试死信表中的 {len(codes)} 只股票")
+        max_concurrent = int(os.getenv('KLINE_UPDATE_CONCURRENT', '10'))
+        with rate_limiter.priority_scope(rate_limiter.SCHEDULED):
+            _, failed = await KlineService._process_batch(codes, max_concurrent, force_update=False)
+
+        recovered = [code for code in codes if code not in failed]
+        await StockListRepository.update_last_update([KlineService._strip_prefix(code) for code in recovered])
+
+        logger.info(f"死信重试完成: {len(recovered)} 只成功, {len(failed)} 只仍失败")
+        return len(recovered), len(failed)
 
-        logger.info(f"批次处理完成: {success_count}/{total}")
-        return success_count == total
+    @staticmethod
+    async def auto_drain_dead_letters_async():
+        """定时任务：重试死信表中的股票"""
+        try:
+            await KlineService.drain_dead_letters_async()
+        except Exception as e:
+            logger.error(f"死信重试异常: {e}")
 
     @staticmethod
     def batch_update_kline(force_update=False, max_workers=3):
@@ -275,9 +405,22 @@ class KlineService:
     
     @staticmethod
     async def get_kline_with_cache(code, period='daily', count=250):
-        """从本地数据库获取K线数据"""
+        """从本地获取K线数据
+
+        日线读取进程内K线缓存（未缓存时从数据库加载）；2d / 3d / 1w 读取已持久化的多日K线表，
+        分桶边界固定，不再按请求重采样。
+        """
         try:
-            df = await KlineRepository.get_by_code(code, limit=1000)
+            if period in KLINE_BAR_TIMEFRAMES:
+                df = await KlineBarService.get_bars(code, period, count)
+                if df is None:
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] 本地无 {code} 的K线数据")
+                    return None
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] 从本地获取 {code} 的 {len(df)} 条{period}K线")
+                return df
+
+            bars = await KlineStore.get(code, limit=1000)
+            df = bars.to_frame() if bars is not None else None
             
             if df is None or df.empty:
                 print(f"[{datetime.now().strftime('%H:%M:%S')}] 本地无 {code} 的K线数据")
@@ -285,25 +428,6 @@ class KlineService:
             
             print(f"[{datetime.now().strftime('%H:%M:%S')}] 从本地获取 {code} 的 {len(df)} 条K线")
             
-            # 重采样处理
-            if period == '2d':
-                df['日期'] = pd.to_datetime(df['日期'], errors='coerce')
-                df = df.set_index('日期')
-                df = df.resample('2B').agg({
-                    '开盘': 'first', '收盘': 'last', '最高': 'max', '最低': 'min', 'amount': 'sum'
-                }).dropna()
-                df = df.reset_index()
-                df['日期'] = df['日期'].dt.strftime('%Y-%m-%d')
-            
-            elif period == '3d': 
-                df['日期'] = pd.to_datetime(df['日期'], errors='coerce')
-                df = df.set_index('日期')
-                df = df.resample('3B').agg({
-                    '开盘': 'first', '收盘': 'last', '最高': 'max', '最低': 'min', 'amount': 'sum'
-                }).dropna()
-                df = df.reset_index()
-                df['日期'] = df['日期'].dt.strftime('%Y-%m-%d')
-            
             if len(df) > count:
                 df = df.tail(count)
             
@@ -329,7 +453,8 @@ class KlineService:
                 return
             
             logger.info(f"需要更新: {reason}，开始更新{scope}")
-            await KlineService.batch_update_kline_async(force_update=False)
+            with rate_limiter.priority_scope(rate_limiter.SCHEDULED):
+                await KlineService.batch_update_kline_async(force_update=False)
             logger.info(f"{scope}K线更新完成")
         
         except Exception as e: 
@@ -368,7 +493,7 @@ class KlineService:
             if not valid_dates:
                 return True, "没有历史K线数据，需初始化"
             
-            latest_dt = datetime.strptime(max(valid_dates), "%Y-%m-%d")
+            latest_dt = datetime.combine(max(valid_dates), datetime.min.time())
             now = datetime.now()
             hours = (now - latest_dt).total_seconds() / 3600
             
@@ -0,0 +1,401 @@
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from repositories.kline_repository import KlineRepository
+from utils import kline_mmap
+from utils.executors import run_blocking, INGEST
+from utils.kline_normalizer import count_rows
+from utils.logger import get_logger
+
+# 获取日志实例
+logger = get_logger('kline_store')
+
+# 缓存的列；日期以 1970-01-01 起的天数（int64）保存，可零拷贝视为 datetime64[D]
+_FIELDS = ('date', 'open', 'close', 'high', 'low', 'amount')
+
+# 与仓储层 DataFrame 相同的中文列名 -> 字段
+_COLUMN_ALIASES = {'日期': 'date', '开盘': 'open', '收盘': 'close', '最高': 'high', '最低': 'low'}
+
+# {code: _Series}；同步包装器会在其他线程的事件循环中读写，用线程锁保护
+_series = {}
+_lock = threading.Lock()
+
+
+def _to_columns(data):
+    """仓储层 DataFrame 或规整后的列数组 -> {字段: 连续数组}"""
+    if isinstance(data, dict):
+        dates = np.asarray(data['date'], dtype='datetime64[D]')
+        values = {key: data[key] for key in _FIELDS[1:]}
+    else:
+        dates = np.asarray(data['日期'].to_numpy(), dtype='datetime64[D]')
+        values = {key: data[name] for name, key in _COLUMN_ALIASES.items() if key != 'date'}
+        values['amount'] = data['amount']
+    columns = {'date': dates.astype(np.int64)}
+    for key, value in values.items():
+        columns[key] = np.ascontiguousarray(value, dtype=np.float64)
+    if np.any(np.diff(columns['date']) <= 0):
+        order = np.argsort(columns['date'], kind='stable')
+        columns = {key: value[order] for key, value in columns.items()}
+    return columns
+
+
+class KlineBars:
+    """一只股票最近若干根K线的只读视图（各字段为缓存数组的切片，不复制数据）
+
+    支持 len() 和按中文列名取列（bars['收盘']），可直接替代仓储层返回的 DataFrame
+    用于指标计算；需要 DataFrame 时调用 to_frame()。
+    """
+
+    __slots__ = _FIELDS
+
+    def __init__(self, date, open, close, high, low, amount):
+        self.date = date
+        self.open = open
+        self.close = close
+        self.high = high
+        self.low = low
+        self.amount = amount
+
+    def __len__(self):
+        return len(self.date)
+
+    def __getitem__(self, name):
+        return getattr(self, _COLUMN_ALIASES.get(name, name))
+
+    @property
+    def dates(self):
+        """日期数组（datetime64[D]）"""
+        return self.date.view('datetime64[D]')
+
+    def to_frame(self):
+        """转换为与 KlineRepository.get_by_code 相同列名的 DataFrame（复制数据）"""
+        return pd.DataFrame({
+            '日期': self.dates,
+            '开盘': self.open,
+            '收盘': self.close,
+            '最高': self.high,
+            '最低': self.low,
+            'volume': np.zeros(len(self.date), dtype=np.int64),
+            'amount': self.amount,
+        })
+
+
+class _Series:
+    """一只股票的列式K线缓冲区
+
+    追加写入缓冲区尾部的空闲位置，已发出的视图不受影响；需要改写已有数据或扩容时
+    分配新缓冲区（写时复制），旧视图仍指向旧数组，读者不会看到写了一半的数据。
+    """
+
+    def __init__(self, columns, max_rows, complete, identity=None):
+        self.max_rows = max_rows
+        self.complete = complete  # 缓存中已包含该股票的全部历史
+        self.synced_at = time.monotonic()
+        self.identity = identity  # 内存映射文件的标识；None 表示进程私有缓冲区
+        if identity is None:
+            self.length = 0
+            self.buffers = None
+            self._reallocate(columns, len(columns['date']))
+        else:
+            # 直接使用只读映射，不复制；容量等于长度，任何改写都会先复制为私有缓冲区
+            self.buffers = columns
+            self.length = len(columns['date'])
+
+    def _reallocate(self, columns, length):
+        """分配新缓冲区并写入 columns 的最后 max_rows 行"""
+        keep = min(length, self.max_rows)
+        if keep < length:
+            self.complete = False
+        capacity = max(16, keep * 5 // 4)
+        buffers = {}
+        for key in _FIELDS:
+            buffer = np.empty(capacity, dtype=np.int64 if key == 'date' else np.float64)
+            buffer[:keep] = columns[key][length - keep:length]
+            buffers[key] = buffer
+        self.buffers = buffers
+        self.length = keep
+        self.identity = None
+
+    def view(self, limit):
+        start = max(0, self.length - limit)
+        return KlineBars(*(self.buffers[key][start:self.length] for key in _FIELDS))
+
+    def _append(self, columns, offset):
+        """追加 columns[offset:]"""
+        count = len(columns['date']) - offset
+        if count <= 0:
+            return
+        end = self.length + count
+        if end > len(self.buffers['date']):
+            merged = {key: np.concatenate([self.buffers[key][:self.length], columns[key][offset:]])
+                      for key in _FIELDS}
+            self._reallocate(merged, end)
+            return
+        for key in _FIELDS:
+            self.buffers[key][self.length:end] = columns[key][offset:]
+        self.length = end
+
+    def merge(self, columns):
+        """合并新写入的K线（按日期升序）
+
+        Returns:
+            bool: False 表示新数据没有覆盖到缓存末尾（如历史回补），无法就地合并，应丢弃该股票的缓存
+        """
+        incoming = columns['date']
+        if len(incoming) == 0:
+            return True
+        dates = self.buffers['date'][:self.length]
+        if self.length == 0 or incoming[0] > dates[-1]:
+            self._append(columns, 0)
+            return True
+        if incoming[-1] < dates[-1]:
+            return False
+
+        # 与缓存重叠的部分完全相同时（例如同步时重读最后一天）只追加新增部分
+        pos = int(np.searchsorted(dates, incoming[0]))
+        overlap = self.length - pos
+        if overlap <= len(incoming) and all(
+            np.array_equal(self.buffers[key][pos:self.length], columns[key][:overlap]) for key in _FIELDS
+        ):
+            self._append(columns, overlap)
+            return True
+
+        # 改写了已有数据（当天K线更新、复权价格变化），写时复制
+        merged = {key: np.concatenate([self.buffers[key][:pos], columns[key]]) for key in _FIELDS}
+        self._reallocate(merged, pos + len(incoming))
+        return True
+
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+
+class KlineStore:
+    """进程内列式K线缓存：监控页等读取路径的主数据源，数据库仍是唯一的真实数据
+
+    - 未缓存的股票从数据库批量加载最近 KLINE_STORE_ROWS 条
+    - 本进程落库的新K线（采集流水线）直接追加到缓存
+    - 其他进程（worker.py）写入的数据：超过 KLINE_STORE_SYNC_SECONDS 的缓存在读取前
+      按最新日期增量同步
+
+    配置 KLINE_MMAP_DIR 后改为以磁盘列式文件为缓存（见 utils.kline_mmap）：采集落库后
+    更新文件，各 uvicorn worker 只读映射同一份文件、通过页缓存共享内存，读取时发现文件
+    已被替换则重新映射；文件缺失时回退到数据库加载并补写文件。映射的文件同样按
+    KLINE_STORE_SYNC_SECONDS 与数据库增量同步，采集不更新本机文件时（其他主机、未配置
+    相同目录的 worker.py）读到新数据后更新文件。
+    """
+
+    @staticmethod
+    def _max_rows():
+        return int(os.getenv('KLINE_STORE_ROWS', '1000'))
+
+    @staticmethod
+    async def get_batch(codes, limit=250):
+        """批量获取多只股票最近 limit 条K线
+
+        Returns:
+            dict: {code: KlineBars}，没有数据的股票为 None
+        """
+        if not codes:
+            return {}
+
+        max_rows = max(limit, KlineStore._max_rows())
+        sync_seconds = float(os.getenv('KLINE_STORE_SYNC_SECONDS', '300'))
+        now = time.monotonic()
+
+        missing, stale, mapped = [], {}, {}
+        with _lock:
+            for code in dict.fromkeys(codes):
+                series = _series.get(code)
+                if series is None or (series.length < limit and not series.complete):
+                    missing.append(code)
+                    continue
+                if series.identity is not None:
+                    mapped[code] = series.identity
+                if now - series.synced_at >= sync_seconds:
+                    stale[code] = series.buffers['date'][series.length - 1].astype('datetime64[D]').item()
+
+        if kline_mmap.get_mmap_dir():
+            # 文件已被采集进程替换的股票重新映射，未缓存的股票优先从文件映射；
+            # 文件未变但超过同步间隔的仍按数据库增量同步（采集在其他主机或未写文件的进程中运行）
+            replaced = [code for code, identity in mapped.items() if kline_mmap.file_identity(code) != identity]
+            for code in replaced:
+                stale.pop(code, None)
+            missing = KlineStore._map_files(missing + replaced, limit, max_rows)
+        if missing:
+            await KlineStore._load(missing, max_rows)
+        if stale:
+            await KlineStore._sync(stale, max_rows)
+
+        with _lock:
+            result = {}
+            for code in codes:
+                series = _series.get(code)
+                result[code] = series.view(limit) if series is not None and series.length else None
+            return result
+
+    @staticmethod
+    async def get(code, limit=250):
+        """获取单只股票最近 limit 条K线（KlineBars 或 None）"""
+        return (await KlineStore.get_batch([code], limit))[code]
+
+    @staticmethod
+    def _map_files(codes, limit, max_rows):
+        """只读映射股票的K线文件
+
+        Returns:
+            list: 没有可用文件（缺失、损坏或行数不足）、需要从数据库加载的股票
+        """
+        remaining = []
+        for code in codes:
+            columns, identity = kline_mmap.open_columns(code)
+            rows = len(columns['date']) if columns is not None else 0
+            complete = rows < max_rows
+            if columns is None or (rows < limit and not complete):
+                remaining.append(code)
+                continue
+            with _lock:
+                _series[code] = _Series(columns, max_rows, complete, identity=identity)
+        return remaining
+
+    @staticmethod
+    async def _load(codes, max_rows):
+        """从数据库加载股票的最近 max_rows 条K线（启用文件缓存时同时补写文件）"""
+        start = time.perf_counter()
+        frames = await KlineRepository.get_batch_by_codes(codes, limit=max_rows)
+        loaded = {code: _to_columns(df) for code, df in frames.items() if df is not None}
+        if kline_mmap.get_mmap_dir() and loaded:
+            # 读取路径只补写缺失或更旧的文件，不覆盖采集在读库之后写入的更新文件
+            await run_blocking(INGEST, KlineStore._write_files, loaded, True)
+            KlineStore._map_files(list(loaded), 0, max_rows)
+        else:
+            with _lock:
+                for code, columns in loaded.items():
+                    _series[code] = _Series(columns, max_rows, complete=len(columns['date']) < max_rows)
+        logger.info(f"K线缓存加载 {len(codes)} 只股票，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    @staticmethod
+    def _write_files(columns_by_code, only_if_newer=False):
+        """写入K线文件（阻塞，在线程池中执行）
+
+        Args:
+            only_if_newer: 只在文件缺失或文件最新日期早于待写数据时写入（读取路径补写文件）
+        """
+        with kline_mmap.write_lock():
+            for code, columns in columns_by_code.items():
+                if only_if_newer:
+                    existing, _ = kline_mmap.open_columns(code)
+                    existing_last = kline_mmap.last_date(existing)
+                    if existing_last is not None and existing_last >= kline_mmap.last_date(columns):
+                        continue
+                kline_mmap.write_columns(code, columns)
+
+    @staticmethod
+    async def _sync(since_dates, max_rows):
+        """增量同步其他进程写入的K线（从缓存中的最新日期开始，含当天以覆盖盘中更新）"""
+        frames = await KlineRepository.get_since_batch(since_dates, limit=max_rows)
+        now = time.monotonic()
+        refreshed = {}
+        with _lock:
+            for code, df in frames.items():
+                series = _series.get(code)
+                if series is None:
+                    continue
+                mapped = series.identity is not None
+                if df is not None and (len(df) >= max_rows or not series.merge(_to_columns(df))):
+                    # 落后太多或无法就地合并，下次读取时重新加载
+                    del _series[code]
+                    continue
+                series.synced_at = now
+                if mapped and series.identity is None:
+                    # 映射的文件已过期（合并时复制为私有缓冲区），用同步后的数据更新文件供其他 worker 使用
+                    refreshed[code] = {key: series.buffers[key][:series.length].copy() for key in _FIELDS}
+
+        if refreshed:
+            await run_blocking(INGEST, KlineStore._write_files, refreshed, True)
+            KlineStore._map_files(list(refreshed), 0, max_rows)
+            logger.info(f"K线文件过期，已从数据库同步 {len(refreshed)} 只股票")
+
+    @staticmethod
+    def apply_saved(kline_data_dict):
+        """把本进程刚落库的K线合并进缓存（只更新已缓存的股票）
+
+        Args:
+            kline_data_dict: 传给 KlineRepository.save_all_batch 的 {code: DataFrame 或列数组}
+        """
+        with _lock:
+            for code, data in kline_data_dict.items():
+                series = _series.get(code)
+                # 映射文件的股票由 persist_saved 更新文件，读取时重新映射
+                if series is None or series.identity is not None or data is None:
+                    continue
+                if not series.merge(_to_columns(data)):
+                    del _series[code]
+
+    @staticmethod
+    async def persist_saved(kline_data_dict):
+        """把刚落库的K线合并进磁盘文件（未配置 KLINE_MMAP_DIR 时不执行）
+
+        已有文件就地合并后原子替换；文件缺失或无法合并（如历史回补）的股票从数据库重建。
+        """
+        if not kline_mmap.get_mmap_dir():
+            return
+        max_rows = KlineStore._max_rows()
+        incoming = {code: _to_columns(data) for code, data in kline_data_dict.items()
+                    if data is not None and count_rows(data) > 0}
+        start = time.perf_counter()
+        rebuild = await run_blocking(INGEST, KlineStore._merge_files, incoming, max_rows)
+        if rebuild:
+            frames = await KlineRepository.get_batch_by_codes(rebuild, limit=max_rows)
+            await run_blocking(INGEST, KlineStore._write_files,
+                               {code: _to_columns(df) for code, df in frames.items() if df is not None})
+        logger.info(f"K线文件更新 {len(incoming)} 只股票（从数据库重建 {len(rebuild)} 只），"
+                    f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    @staticmethod
+    def _merge_files(incoming, max_rows):
+        """合并K线文件（阻塞，在线程池中执行）
+
+        Returns:
+            list: 需要从数据库重建的股票
+        """
+        rebuild = []
+        with kline_mmap.write_lock():
+            for code, columns in incoming.items():
+                existing, _ = kline_mmap.open_columns(code)
+                merged = kline_mmap.merge_columns(existing, columns, max_rows) if existing is not None else None
+                if merged is None:
+                    rebuild.append(code)
+                else:
+                    kline_mmap.write_columns(code, merged)
+        return rebuild
+
+    @staticmethod
+    def invalidate(codes=None):
+        """丢弃指定股票（默认全部）的缓存"""
+        with _lock:
+            if codes is None:
+                _series.clear()
+            else:
+                for code in codes:
+                    _series.pop(code, None)
+
+    @staticmethod
+    def stats(top=50):
+        """缓存占用：总量及占用最多的 top 只股票"""
+        with _lock:
+            per_code = [
+                {'code': code, 'rows': series.length, 'capacity': len(series.buffers['date']),
+                 'bytes': series.nbytes(), 'complete': series.complete, 'mapped': series.identity is not None}
+                for code, series in _series.items()
+            ]
+        per_code.sort(key=lambda item: item['bytes'], reverse=True)
+        return {
+            'codes': len(per_code),
+            'rows': sum(item['rows'] for item in per_code),
+            'bytes': sum(item['bytes'] for item in per_code),
+            'max_rows': KlineStore._max_rows(),
+            'mmap_dir': kline_mmap.get_mmap_dir(),
+            'per_code': per_code[:top],
+        }
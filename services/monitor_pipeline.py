@@ -0,0 +1,379 @@
+import asyncio
+import time
+import numpy as np
+from repositories.cache_repository import MonitorDataCacheRepository
+from repositories.eps_cache_repository import EpsCacheRepository
+from repositories.kline_repository import KlineRepository
+from repositories.monitor_repository import MonitorStockRepository
+from services.data_service import DataService
+from services.ema_state_service import EmaStateService
+from services.indicator_service import IndicatorService
+from services.kline_store import KlineStore
+from services.stock_indicator_service import StockIndicatorService
+from services.portfolio_service import PortfolioService
+from utils.executors import run_blocking, EPS
+from utils.logger import get_logger
+
+# 获取日志实例
+logger = get_logger('monitor_pipeline')
+
+# 指标注册表：指标名（即监控数据中的字段名） -> {'kind': 计算方式, 其余为参数}
+INDICATORS = {
+    'ema5': {'kind': 'ema', 'period': 5},
+    'ema7': {'kind': 'ema', 'period': 7},
+    'ema10': {'kind': 'ema', 'period': 10},
+    'ema20': {'kind': 'ema', 'period': 20},
+    'ema21': {'kind': 'ema', 'period': 21},
+    'ema30': {'kind': 'ema', 'period': 30},
+    'ema42': {'kind': 'ema', 'period': 42},
+    'ema60': {'kind': 'ema', 'period': 60},
+    'ema144': {'kind': 'ema', 'period': 144},
+    'ema188': {'kind': 'ema', 'period': 188},
+    # 技术指标优先取指标物化表，没有指标行时由 IndicatorService 批量计算（见 utils.indicators.technical_last）
+    'macd_dif': {'kind': 'technical'},
+    'macd_dea': {'kind': 'technical'},
+    'macd_hist': {'kind': 'technical'},
+    'rsi14': {'kind': 'technical'},
+    'boll_upper': {'kind': 'technical'},
+    'boll_mid': {'kind': 'technical'},
+    'boll_lower': {'kind': 'technical'},
+    'atr14': {'kind': 'technical'},
+}
+
+TECHNICAL_INDICATORS = tuple(name for name, spec in INDICATORS.items() if spec['kind'] == 'technical')
+
+# 各时间维度需要的指标（均按日K线计算，时间维度决定趋势判断使用哪组均线）
+TIMEFRAME_INDICATORS = {
+    '1d': ('ema144', 'ema188', 'ema5', 'ema10', 'ema20') + TECHNICAL_INDICATORS,
+    '2d': ('ema144', 'ema188', 'ema10', 'ema30', 'ema60') + TECHNICAL_INDICATORS,
+    '3d': ('ema144', 'ema188', 'ema7', 'ema21', 'ema42') + TECHNICAL_INDICATORS,
+}
+
+# 写入监控缓存表的指标（技术指标有自己的缓存，每次请求重新读取）
+_CACHE_FIELDS = tuple(name for name, spec in INDICATORS.items() if spec['kind'] == 'ema')
+
+# 技术面判断必需的指标，缺失时股票不出现在监控结果中
+REQUIRED_INDICATORS = ('ema144', 'ema188')
+
+# 计算指标所需的K线条数
+_KLINE_ROWS = 1000
+
+# 监控缓存有效期（分钟）
+_CACHE_MINUTES = 30
+
+
+def indicator_fields(values, timeframe):
+    """按时间维度取出监控数据的指标字段
+
+    Args:
+        values: {指标名: 值}
+        timeframe: '1d' / '2d' / '3d'
+
+    Returns:
+        dict: 全部注册指标的字段，当前时间维度不需要的为 None
+    """
+    fields = dict.fromkeys(INDICATORS)
+    for name in TIMEFRAME_INDICATORS.get(timeframe, REQUIRED_INDICATORS):
+        fields[name] = values.get(name)
+    return fields
+
+
+def ema_indicator_values(emas, names):
+    """{EMA周期: 值} -> {指标名: 值}（只取 names 中的 EMA 指标）"""
+    return {
+        name: emas.get(INDICATORS[name]['period'])
+        for name in names if INDICATORS[name]['kind'] == 'ema'
+    }
+
+
+class MonitorPipeline:
+    """监控页数据流水线
+
+    加载 → 实时价格 → 指标 → EPS → 分类，每个阶段对全部股票批量执行并单独计时。
+    每只股票在流水线中是一个字典：stock（监控配置）、price、indicators、closes（需要计算指标时的收盘价）、
+    result（命中监控缓存时的完整数据）、latest（指标物化表中最新一根日线的指标）。
+    """
+
+    @staticmethod
+    async def run():
+        """获取监控数据
+
+        Returns:
+            list: 监控数据字典列表（含估值、技术面、趋势分类）
+        """
+        start = time.perf_counter()
+        timings = {}
+
+        async def stage(name, func, *args):
+            stage_start = time.perf_counter()
+            result = await func(*args)
+            timings[name] = (time.perf_counter() - stage_start) * 1000
+            return result
+
+        items = await stage('load', MonitorPipeline._load)
+        pending = [item for item in items if item['result'] is None]
+        await stage('quotes', MonitorPipeline._quotes, pending)
+        await stage('indicators', MonitorPipeline._indicators, items)
+        results = MonitorPipeline._build_results(items)
+        await stage('eps', MonitorPipeline._eps, results)
+        await stage('cache', MonitorPipeline._save_cache, results)
+        await stage('classify', MonitorPipeline._classify, results)
+
+        logger.info(
+            f"获取监控数据完成，共 {len(results)} 只股票（缓存命中 {len(items) - len(pending)} 只），"
+            f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms，各阶段: "
+            + '，'.join(f"{name} {ms:.0f}ms" for name, ms in timings.items())
+        )
+        return results
+
+    @staticmethod
+    async def _load():
+        """加载阶段：监控配置、30分钟内的监控缓存、指标物化表的最新一行；没有可用指标行的股票读取EMA状态或K线"""
+        deleted = await MonitorDataCacheRepository.clean_old_data(1)
+        if deleted > 0:
+            logger.info(f"清理了 {deleted} 条过期缓存")
+
+        stocks = await MonitorStockRepository.get_enabled()
+        cache_results = await MonitorDataCacheRepository.get_batch_by_code_and_timeframe(
+            [(stock.code, stock.timeframe) for stock in stocks], _CACHE_MINUTES
+        )
+
+        items = []
+        for stock in stocks:
+            item = {'stock': stock, 'price': None, 'indicators': {}, 'closes': None, 'result': None, 'latest': None}
+            cached = cache_results.get((stock.code, stock.timeframe))
+            if cached:
+                item['result'] = {
+                    'code': stock.code,
+                    'name': stock.name,
+                    'current_price': cached.current_price,
+                    **dict.fromkeys(INDICATORS),
+                    **{name: getattr(cached, name) for name in _CACHE_FIELDS},
+                    'eps_forecast': cached.eps_forecast,
+                    'timeframe': stock.timeframe,
+                    'reasonable_pe_min': stock.reasonable_pe_min,
+                    'reasonable_pe_max': stock.reasonable_pe_max,
+                }
+            items.append(item)
+
+        # 各股票已落库的最新K线日期：指标行、EMA状态早于该日期（采集后刷新失败）时视为过期，改为从K线计算
+        codes = list(dict.fromkeys(stock.code for stock in stocks))
+        try:
+            kline_dates = await KlineRepository.get_latest_dates_batch(codes)
+        except Exception as e:
+            logger.error(f"读取最新K线日期失败，不检查指标是否过期: {e}")
+            kline_dates = {}
+
+        # 优先读取采集后物化的指标行（每只股票一次索引查询，含EMA和技术指标）
+        try:
+            latest = await StockIndicatorService.get_latest(codes, '1d')
+        except Exception as e:
+            logger.error(f"读取指标物化表失败，改为读取EMA状态: {e}")
+            latest = {}
+        stale = [code for code, row in latest.items() if kline_dates.get(code) and row['date'] < kline_dates[code]]
+        for code in stale:
+            del latest[code]
+        if stale:
+            logger.warning(f"{len(stale)} 只股票的指标行早于最新K线（{stale[0]} 等），改为读取EMA状态或K线")
+        for item in items:
+            item['latest'] = latest.get(item['stock'].code)
+
+        pending = [item for item in items if item['result'] is None]
+        for item in pending:
+            if item['latest'] is not None:
+                item['indicators'] = {name: item['latest'][name]
+                                      for name in TIMEFRAME_INDICATORS[item['stock'].timeframe]}
+        pending = [item for item in pending if item['latest'] is None]
+        if not pending:
+            logger.info(f"监控股票 {len(items)} 只，缓存命中 {sum(1 for item in items if item['result'])} 只，"
+                        f"指标物化表命中 {len(latest)} 只")
+            return items
+
+        # 尚无指标行的股票读取采集时递推维护的EMA状态，每只股票只读一行状态
+        codes = list(dict.fromkeys(item['stock'].code for item in pending))
+        try:
+            ema_map = await EmaStateService.get_latest(codes, '1d', as_of=kline_dates)
+        except Exception as e:
+            logger.error(f"读取EMA状态失败，改为从K线计算: {e}")
+            ema_map = {}
+        for item in pending:
+            emas = ema_map.get(item['stock'].code)
+            if emas is not None:
+                item['indicators'] = ema_indicator_values(emas, TIMEFRAME_INDICATORS[item['stock'].timeframe])
+
+        # 尚无EMA状态的股票批量获取K线
+        missing = [code for code in codes if code not in ema_map]
+        if missing:
+            kline_data_dict = await KlineStore.get_batch(missing, limit=_KLINE_ROWS)
+            for item in pending:
+                bars = kline_data_dict.get(item['stock'].code)
+                if bars is not None:
+                    item['closes'] = bars['收盘']
+        logger.info(f"监控股票 {len(items)} 只，缓存命中 {sum(1 for item in items if item['result'])} 只，"
+                    f"指标物化表命中 {len(latest)} 只，EMA状态命中 {len(ema_map)} 只，"
+                    f"{len(missing)} 只需要加载K线计算")
+        return items
+
+    @staticmethod
+    async def _quotes(items):
+        """实时价格阶段：批量行情接口获取全部未缓存股票的实时价格"""
+        try:
+            price_results = await PortfolioService.get_real_time_prices_async([item['stock'].code for item in items])
+        except Exception as e:
+            logger.error(f"批量获取实时价格失败: {e}")
+            return
+        for item, result in zip(items, price_results):
+            item['price'] = result[1]  # (code, current_price, dividend, yield, trade_date)
+
+    @staticmethod
+    async def _indicators(items):
+        """指标阶段：按注册表计算各股票时间维度需要的指标
+
+        EMA：只为未命中缓存、没有指标行和EMA状态的股票计算，同一时间维度的股票一次矩阵运算完成，
+        只计算该时间维度需要的周期。技术指标：优先取指标物化表，其余股票一次批量计算（IndicatorService 按最后一根K线缓存）。
+        """
+        by_timeframe = {}
+        for item in items:
+            if item['result'] is None and item['closes'] is not None and not item['indicators']:
+                by_timeframe.setdefault(item['stock'].timeframe, []).append(item)
+
+        for timeframe, group in by_timeframe.items():
+            names = TIMEFRAME_INDICATORS[timeframe]
+            periods = sorted({INDICATORS[name]['period'] for name in names if INDICATORS[name]['kind'] == 'ema'})
+            ema_map = DataService.batch_ema({i: item['closes'] for i, item in enumerate(group)}, periods)
+            for i, item in enumerate(group):
+                item['indicators'] = ema_indicator_values(ema_map[i], names)
+
+        # 有指标行的股票直接取物化的技术指标（未命中缓存的已在加载阶段取出）
+        technical = []
+        for item in items:
+            if not any(name in TECHNICAL_INDICATORS for name in TIMEFRAME_INDICATORS[item['stock'].timeframe]):
+                continue
+            if item['latest'] is None:
+                technical.append(item)
+            elif item['result'] is not None:
+                for name in TIMEFRAME_INDICATORS[item['stock'].timeframe]:
+                    if name in TECHNICAL_INDICATORS:
+                        item['result'][name] = item['latest'][name]
+        if technical:
+            try:
+                values = await IndicatorService.get_batch([item['stock'].code for item in technical], '1d')
+            except Exception as e:
+                logger.error(f"计算技术指标失败: {e}")
+                values = {}
+            for item in technical:
+                stock_values = values.get(item['stock'].code) or {}
+                target = item['result'] if item['result'] is not None else item['indicators']
+                for name in TIMEFRAME_INDICATORS[item['stock'].timeframe]:
+                    if name in TECHNICAL_INDICATORS:
+                        target[name] = stock_values.get(name)
+
+    @staticmethod
+    def _build_results(items):
+        """组装监控数据；缺少实时价格或必需指标的股票跳过"""
+        results = []
+        for item in items:
+            if item['result'] is not None:
+                results.append(item['result'])
+                continue
+            stock = item['stock']
+            if item['price'] is None:
+                logger.warning(f"无法获取 {stock.code} 的当前价格")
+                continue
+            if any(item['indicators'].get(name) is None for name in REQUIRED_INDICATORS):
+                logger.warning(f"无法计算 {stock.code} 的EMA值（K线数据不足）")
+                continue
+            results.append({
+                'code': stock.code,
+                'name': stock.name,
+                'current_price': round(item['price'], 2),
+                **indicator_fields(item['indicators'], stock.timeframe),
+                'eps_forecast': None,
+                'timeframe': stock.timeframe,
+                'reasonable_pe_min': stock.reasonable_pe_min,
+                'reasonable_pe_max': stock.reasonable_pe_max,
+            })
+        return results
+
+    @staticmethod
+    async def _eps(results):
+        """EPS阶段：先批量读取EPS缓存，其余在EPS线程池中并发获取"""
+        need_eps = [result for result in results if result.get('eps_forecast') is None]
+        if not need_eps:
+            return
+
+        cached_eps = await EpsCacheRepository.get_batch([result['code'] for result in need_eps])
+        uncached = []
+        for result in need_eps:
+            if result['code'] in cached_eps:
+                result['eps_forecast'] = cached_eps[result['code']]
+            else:
+                uncached.append(result)
+        logger.info(f"从缓存获取 {len(need_eps) - len(uncached)} 只股票的 EPS，需要重新获取 {len(uncached)} 只")
+        if not uncached:
+            return
+
+        eps_results = await asyncio.gather(
+            *[run_blocking(EPS, DataService.get_eps_forecast_sync, result['code']) for result in uncached],
+            return_exceptions=True
+        )
+        for result, eps in zip(uncached, eps_results):
+            if isinstance(eps, Exception):
+                logger.error(f"获取 {result['code']} EPS失败: {eps}")
+                continue
+            if eps is not None:
+                await EpsCacheRepository.set(result['code'], eps)
+            result['eps_forecast'] = eps
+
+    @staticmethod
+    async def _save_cache(results):
+        """批量写入监控缓存（含EPS）"""
+        if results:
+            await MonitorDataCacheRepository.save_batch([
+                {
+                    'code': result['code'],
+                    'timeframe': result['timeframe'],
+                    'current_price': result['current_price'],
+                    **{name: result[name] for name in _CACHE_FIELDS},
+                    'eps_forecast': result['eps_forecast'],
+                }
+                for result in results
+            ])
+
+    @staticmethod
+    async def _classify(results):
+        """分类阶段：合理价格区间、估值状态、技术面状态、趋势
+
+        全部股票取出列数组后由 MonitorService.classify_batch 一次向量运算完成；
+        结果中不含 NaN，路由可以直接序列化。
+        """
+        from services.monitor_service import MonitorService, TECHNICAL_STATUSES, TREND_STATUSES, VALUATION_STATUSES
+
+        if not results:
+            return
+
+        def column(name):
+            return np.array([stock.get(name) for stock in results], dtype=np.float64)
+
+        # 指标字段由各计算服务保证为有限值或 None；实时价格和 EPS 来自外部数据源，其中的 NaN 换成 None
+        price, eps = column('current_price'), column('eps_forecast')
+        for name, values in (('current_price', price), ('eps_forecast', eps)):
+            for i in np.flatnonzero(np.isnan(values)):
+                results[i][name] = None
+
+        status = MonitorService.classify_batch(
+            price, column('ema144'), column('ema188'), MonitorService.trend_columns(results), eps,
+            column('reasonable_pe_min'), column('reasonable_pe_max'),
+        )
+        columns = {
+            'reasonable_price_min': [None if price != price else round(price, 2)
+                                     for price in status['reasonable_price_min'].tolist()],
+            'reasonable_price_max': [None if price != price else round(price, 2)
+                                     for price in status['reasonable_price_max'].tolist()],
+            'valuation_status': MonitorService.status_labels(status['valuation_status'], VALUATION_STATUSES).tolist(),
+            'technical_status': MonitorService.status_labels(status['technical_status'], TECHNICAL_STATUSES).tolist(),
+            'trend': MonitorService.status_labels(status['trend'], TREND_STATUSES).tolist(),
+        }
+        for name, values in columns.items():
+            for stock, value in zip(results, values):
+                stock[name] = value
@@ -1,21 +1,80 @@
 # services/monitor_service.py
 from repositories.monitor_repository import MonitorStockRepository
-from services.data_service import DataService
+from services.ema_state_service import EmaStateService
+from services.monitor_pipeline import MonitorPipeline, TIMEFRAME_INDICATORS, indicator_fields, ema_indicator_values
+from services.portfolio_service import PortfolioService
 from datetime import datetime
 import os
+import numpy as np
 
 os.environ.pop('http_proxy', None)
 os.environ.pop('https_proxy', None)
 os.environ.pop('all_proxy', None)
 
+# 各时间维度判断趋势使用的均线周期（短、中、长）
+TREND_PERIODS = {
+    '1d': (5, 10, 20),
+    '2d': (10, 30, 60),
+    '3d': (7, 21, 42),
+}
+
+# classify_batch 返回的状态编码即下列元组中的下标
+TECHNICAL_STATUSES = ('无信号', '加仓', '破位')
+TREND_STATUSES = ('未知', '多头', '震荡', '空头')
+VALUATION_STATUSES = ('未知', '低估', '正常', '高估')
+
 
 class MonitorService:
     """监控业务逻辑"""
 
     @staticmethod
     async def get_monitor_data():
-        """获取监控数据"""
-        return await DataService.get_monitor_data()
+        """获取监控数据（含估值、技术面、趋势分类）"""
+        return await MonitorPipeline.run()
+
+    @staticmethod
+    async def get_live_data():
+        """获取盘中临时监控数据
+
+        以实时价格作为行情所在交易日的收盘，在采集维护的EMA状态上递推出临时EMA，并给出技术面状态和趋势。
+        不读取历史K线，适合交易时段每隔几秒刷新；尚无EMA状态的股票不在结果中。
+        """
+        stocks = await MonitorStockRepository.get_enabled()
+        price_results = await PortfolioService.get_real_time_prices_async([stock.code for stock in stocks])
+        prices = {stock.code: result[1] for stock, result in zip(stocks, price_results)}
+        trade_dates = {stock.code: result[4] for stock, result in zip(stocks, price_results)}
+        live_emas = await EmaStateService.get_live(prices, '1d', trade_dates=trade_dates)
+
+        results = []
+        for stock in stocks:
+            emas = live_emas.get(stock.code)
+            if emas is None or emas[144] is None or emas[188] is None:
+                continue
+            current_price = prices[stock.code]
+            values = ema_indicator_values(emas, TIMEFRAME_INDICATORS[stock.timeframe])
+            results.append({
+                'code': stock.code,
+                'name': stock.name,
+                'current_price': round(current_price, 2),
+                **indicator_fields(values, stock.timeframe),
+                'timeframe': stock.timeframe,
+            })
+        if not results:
+            return results
+
+        status = MonitorService.classify_batch(
+            [prices[item['code']] for item in results],
+            [item['ema144'] for item in results],
+            [item['ema188'] for item in results],
+            MonitorService.trend_columns(results),
+            [None] * len(results), 0, 0
+        )
+        technical = MonitorService.status_labels(status['technical_status'], TECHNICAL_STATUSES).tolist()
+        trend = MonitorService.status_labels(status['trend'], TREND_STATUSES).tolist()
+        for item, technical_status, item_trend in zip(results, technical, trend):
+            item['technical_status'] = technical_status
+            item['trend'] = item_trend
+        return results
 
     @staticmethod
     async def get_all_monitor_stocks():
@@ -56,6 +115,71 @@ class MonitorService:
         success = await MonitorStockRepository.toggle_enabled(code, enabled)
         return success, "操作成功" if success else "操作失败"
 
+    @staticmethod
+    def classify_batch(prices, ema144, ema188, trend_emas, eps, pe_min, pe_max):
+        """批量分类：一次向量运算得到全部股票的技术面状态、趋势、估值状态和合理价格区间
+
+        规则与 check_technical_status / check_trend / check_valuation_status / calculate_reasonable_price 一致，
+        None、NaN 和 0 视为缺失。
+
+        Args:
+            prices / ema144 / ema188 / eps: 等长序列
+            trend_emas: (短, 中, 长) 三个等长序列，每只股票取其时间维度对应的均线（见 TREND_PERIODS）
+            pe_min / pe_max: 合理市盈率区间，等长序列或标量
+
+        Returns:
+            dict: 'technical_status' / 'trend' / 'valuation_status' 为 int8 编码数组
+                  （编码见 TECHNICAL_STATUSES / TREND_STATUSES / VALUATION_STATUSES），
+                  'reasonable_price_min' / 'reasonable_price_max' 为 float64 数组（未取整，无EPS时为 NaN）
+        """
+        def column(values):
+            values = np.asarray(values, dtype=np.float64)
+            return values, ~np.isnan(values) & (values != 0)
+
+        prices, has_price = column(prices)
+        (ema144, has_144), (ema188, has_188) = column(ema144), column(ema188)
+        with np.errstate(invalid='ignore'):
+            # 技术面：EMA144 / EMA188 通道内为加仓，跌破通道下沿为破位
+            band_low, band_high = np.fmin(ema144, ema188), np.fmax(ema144, ema188)
+            has_band = has_144 & has_188 & has_price
+            technical = np.select(
+                [has_band & (prices < band_low), has_band & (prices <= band_high)], [2, 1], 0
+            ).astype(np.int8)
+
+            # 趋势：短、中、长三条均线多头 / 空头排列
+            (fast, has_fast), (mid, has_mid), (slow, has_slow) = (column(values) for values in trend_emas)
+            has_trend = has_fast & has_mid & has_slow
+            trend = np.select(
+                [~has_trend, (fast > mid) & (mid > slow), (fast < mid) & (mid < slow)], [0, 1, 3], 2
+            ).astype(np.int8)
+
+            # 估值：价格相对 EPS x 合理市盈率区间
+            eps, has_eps = column(eps)
+            min_price = np.where(has_eps, eps * np.asarray(pe_min, dtype=np.float64), np.nan)
+            max_price = np.where(has_eps, eps * np.asarray(pe_max, dtype=np.float64), np.nan)
+            valuation = np.select(
+                [~has_eps | ~has_price, prices < min_price, prices > max_price], [0, 1, 3], 2
+            ).astype(np.int8)
+
+        return {
+            'technical_status': technical,
+            'trend': trend,
+            'valuation_status': valuation,
+            'reasonable_price_min': min_price,
+            'reasonable_price_max': max_price,
+        }
+
+    @staticmethod
+    def trend_columns(stocks):
+        """监控数据字典列表 -> classify_batch 的 trend_emas（每只股票按自己的时间维度取均线，未知时间维度为 None）"""
+        names = [[f'ema{period}' for period in TREND_PERIODS.get(stock.get('timeframe'), ())] for stock in stocks]
+        return [[stock.get(fields[i]) if fields else None for stock, fields in zip(stocks, names)] for i in range(3)]
+
+    @staticmethod
+    def status_labels(codes, statuses):
+        """状态编码数组 -> 状态名数组"""
+        return np.asarray(statuses)[codes]
+
     @staticmethod
     def calculate_reasonable_price(eps_forecast, pe_min, pe_max):
         """计算合理价格范围"""
@@ -2,11 +2,12 @@
 import os
 import asyncio
 import aiohttp
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from concurrent.futures import ThreadPoolExecutor
 import akshare as ak
 from repositories.portfolio_repository import StockRepository
 from utils.logger import get_logger
+from utils import http_client, rate_limiter
 
 # 获取日志实例
 logger = get_logger('portfolio')
@@ -16,6 +17,13 @@ os.environ.pop('http_proxy', None)
 os.environ.pop('https_proxy', None)
 os.environ.pop('all_proxy', None)
 
+# 雪球单股 / 批量行情接口
+_QUOTE_URL = 'https://stock.xueqiu.com/v5/stock/quote.json'
+_BATCH_QUOTE_URL = 'https://stock.xueqiu.com/v5/stock/batch/quote.json'
+
+# 行情时间戳按北京时间换算交易日
+_CHINA_TZ = timezone(timedelta(hours=8))
+
 
 class PortfolioService: 
     """投资组合业务逻辑"""
@@ -31,60 +39,154 @@ class PortfolioService:
             'Referer': 'https://xueqiu.com/'
         }
     
+    @staticmethod
+    def _to_symbol(stock_code: str) -> str:
+        """转换股票代码格式为雪球格式（sh600000 / 600000 -> SH600000）"""
+        if stock_code.startswith('sh'):
+            return 'SH' + stock_code[2:]
+        if stock_code.startswith('sz'):
+            return 'SZ' + stock_code[2:]
+        return 'SH' + stock_code if stock_code.startswith('6') else 'SZ' + stock_code
+
+    @staticmethod
+    def _parse_quote(stock_code: str, quote) -> tuple:
+        """雪球行情 quote 字段 -> (stock_code, current_price, dividend_ttm, dividend_yield_ttm, trade_date)
+
+        trade_date 为行情时间戳对应的交易日（北京时间），非交易日返回最近一个交易日；无有效价格时价格等均为 None
+        """
+        if quote:
+            current_price = quote.get('current')
+            if current_price and current_price > 0:
+                timestamp = quote.get('timestamp')
+                trade_date = datetime.fromtimestamp(timestamp / 1000, _CHINA_TZ).date() if timestamp else None
+                return (stock_code, current_price, quote.get('dividend') or 0, quote.get('dividend_yield') or 0,
+                        trade_date)
+        return stock_code, None, None, None, None
+
     @staticmethod
     async def _fetch_stock_price(session: aiohttp.ClientSession, stock_code: str) -> tuple:
         """异步获取单只股票实时价格
         
         Returns:
-            tuple: (stock_code, current_price, dividend_ttm, dividend_yield_ttm)
+            tuple: (stock_code, current_price, dividend_ttm, dividend_yield_ttm, trade_date)
         """
         try:
-            # 转换股票代码格式为雪球格式
-            if stock_code.startswith('sh'):
-                symbol = 'SH' + stock_code[2:]
-            elif stock_code.startswith('sz'):
-                symbol = 'SZ' + stock_code[2:]
-            else:
-                symbol = 'SH' + stock_code if stock_code.startswith('6') else 'SZ' + stock_code
+            symbol = PortfolioService._to_symbol(stock_code)
             
             # 使用雪球API获取股票数据
-            url = f"https://stock.xueqiu.com/v5/stock/quote.json?symbol={symbol}&extend=detail"
+            await rate_limiter.acquire(rate_limiter.XUEQIU)
             
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            async with session.get(_QUOTE_URL, params={'symbol': symbol, 'extend': 'detail'},
+                                   headers=PortfolioService._get_headers(),
+                                   timeout=aiohttp.ClientTimeout(total=10)) as response:
                 response.raise_for_status()
                 data = await response.json()
                 
                 if data and 'data' in data and 'quote' in data['data']:
-                    quote = data['data']['quote']
-                    current_price = quote.get('current')
-                    dividend_ttm = quote.get('dividend')
-                    dividend_yield_ttm = quote.get('dividend_yield')
-                    
-                    if current_price and current_price > 0:
-                        return stock_code, current_price, dividend_ttm or 0, dividend_yield_ttm or 0
+                    return PortfolioService._parse_quote(stock_code, data['data']['quote'])
         
         except Exception as e:
             logger.error(f"获取 {stock_code} 实时价格失败: {str(e)[:100]}")
         
-        return stock_code, None, None, None
+        return stock_code, None, None, None, None
+
+    @staticmethod
+    async def _fetch_batch_prices(session: aiohttp.ClientSession, symbols: list, max_attempts=2):
+        """一次请求获取多只股票的行情，失败时退避后重试整块
+
+        Args:
+            symbols: 雪球格式代码列表（不超过 XUEQIU_BATCH_QUOTE_SIZE 只）
+            max_attempts: 最多请求次数
+
+        Returns:
+            dict: {symbol: quote 字典}；全部尝试都失败时返回 None
+        """
+        for attempt in range(1, max_attempts + 1):
+            try:
+                await rate_limiter.acquire(rate_limiter.XUEQIU)
+                async with session.get(_BATCH_QUOTE_URL, params={'symbol': ','.join(symbols), 'extend': 'detail'},
+                                       headers=PortfolioService._get_headers(),
+                                       timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+                items = ((data or {}).get('data') or {}).get('items') or []
+                return {item['quote']['symbol']: item['quote'] for item in items if item.get('quote')}
+            except Exception as e:
+                log = logger.warning if attempt < max_attempts else logger.error
+                log(f"批量获取 {len(symbols)} 只股票实时价格失败（{symbols[0]} 等，"
+                    f"第 {attempt}/{max_attempts} 次）: {str(e)[:100]}")
+                if attempt < max_attempts:
+                    await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+        return None
+
+    @staticmethod
+    async def get_real_time_prices_async(stock_codes) -> list:
+        """批量获取实时价格：按雪球批量行情接口拆成尽量少的请求并发获取
+
+        每次请求的股票数通过 XUEQIU_BATCH_QUOTE_SIZE 配置（默认 100），500 只股票只需 5 次请求。
+        批量请求失败时重试（XUEQIU_BATCH_QUOTE_ATTEMPTS，默认 2 次），仍失败的块逐只请求单股行情接口。
+
+        Returns:
+            list: 与 stock_codes 顺序一致的 (stock_code, current_price, dividend_ttm, dividend_yield_ttm, trade_date)，
+                  获取失败的股票价格为 None
+        """
+        if not stock_codes:
+            return []
+        batch_size = max(1, int(os.getenv('XUEQIU_BATCH_QUOTE_SIZE', '100')))
+        max_attempts = max(1, int(os.getenv('XUEQIU_BATCH_QUOTE_ATTEMPTS', '2')))
+        code_by_symbol = {}
+        for code in stock_codes:
+            code_by_symbol.setdefault(PortfolioService._to_symbol(code), code)
+        symbols = list(code_by_symbol)
+        chunks = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+
+        async with http_client.session() as session:
+            results = await asyncio.gather(*[PortfolioService._fetch_batch_prices(session, chunk, max_attempts)
+                                             for chunk in chunks])
+            quotes = {symbol: quote for result in results if result for symbol, quote in result.items()}
+
+            # 批量请求仍失败的块逐只获取，避免一次失败丢掉整块股票的价格
+            failed = [symbol for chunk, result in zip(chunks, results) if result is None for symbol in chunk]
+            fallback = {}
+            if failed:
+                logger.warning(f"{len(failed)} 只股票批量行情获取失败，改为逐只获取")
+                singles = await asyncio.gather(*[PortfolioService._fetch_stock_price(session, code_by_symbol[symbol])
+                                                 for symbol in failed])
+                fallback = dict(zip(failed, singles))
+
+        prices = []
+        for code in stock_codes:
+            symbol = PortfolioService._to_symbol(code)
+            if symbol in fallback:
+                prices.append((code, *fallback[symbol][1:]))
+            else:
+                prices.append(PortfolioService._parse_quote(code, quotes.get(symbol)))
+        missing = sum(1 for price in prices if price[1] is None)
+        logger.info(f"批量获取 {len(symbols)} 只股票实时价格，{len(chunks)} 块"
+                    + (f"，{len(failed)} 只逐只获取" if failed else '')
+                    + (f"，{missing} 只无有效价格" if missing else ''))
+        return prices
     
     @staticmethod
     async def get_real_time_price_async(stock_code, max_retries=3):
-        """获取单只股票实时价格（异步方法）
+        """获取单只股票实时价格（异步方法），没有有效价格时退避后重试，最多请求 max_retries 次
 
         Returns:
-            tuple: (stock_code, current_price, dividend_ttm, dividend_yield_ttm)
+            tuple: (stock_code, current_price, dividend_ttm, dividend_yield_ttm, trade_date)
         """
-        headers = PortfolioService._get_headers()
-        async with aiohttp.ClientSession(headers=headers, trust_env=False) as session:
-            return await PortfolioService._fetch_stock_price(session, stock_code)
+        async with http_client.session() as session:
+            for attempt in range(1, max(1, max_retries) + 1):
+                result = await PortfolioService._fetch_stock_price(session, stock_code)
+                if result[1] is not None or attempt >= max_retries:
+                    return result
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
 
     @staticmethod
     def get_real_time_price(stock_code, max_retries=3):
         """获取单只股票实时价格（同步方法，用于向后兼容）
 
         Returns:
-            tuple: (stock_code, current_price, dividend_ttm, dividend_yield_ttm)
+            tuple: (stock_code, current_price, dividend_ttm, dividend_yield_ttm, trade_date)
         """
         return asyncio.run(PortfolioService.get_real_time_price_async(stock_code, max_retries))
     
@@ -107,26 +209,8 @@ class PortfolioService:
         stock_codes = [stock.code for stock in stocks]
         logger.info(f"开始获取 {len(stock_codes)} 只股票的实时价格")
 
-        headers = PortfolioService._get_headers()
-        connector = aiohttp.TCPConnector(limit=10, ttl_dns_cache=300)
-
-        async with aiohttp.ClientSession(headers=headers, connector=connector, trust_env=False) as session:
-            # 创建所有异步任务
-            tasks = [PortfolioService._fetch_stock_price(session, code) for code in stock_codes]
-
-            # 并发执行所有任务
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # 处理结果
-            processed_results = []
-            for result in results:
-                if isinstance(result, Exception):
-                    logger.error(f"获取股票数据时发生异常: {result}")
-                    processed_results.append((None, None, None, None))
-                else:
-                    processed_results.append(result)
-
-            results = processed_results
+        # 批量行情接口一次请求获取多只股票
+        results = await PortfolioService.get_real_time_prices_async(stock_codes)
 
         # 构建股票数据映射
         stock_data_map = {
@@ -145,6 +229,8 @@ class PortfolioService:
             shares = stock.shares
 
             data = stock_data_map.get(code, {})
+            if not data.get('price'):
+                logger.warning(f"{code} 没有实时价格，按成本价计算市值")
             current_price = data.get('price') or cost_price
 
             row = {
@@ -1,5 +1,6 @@
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from utils.logger import get_logger
 
 logger = get_logger('scheduler_service')
@@ -71,6 +72,36 @@ class SchedulerService:
         except Exception as e:
             logger.error(f"添加定时任务失败: {e}")
     
+    @staticmethod
+    def add_interval_job(func, minutes, job_id=None, args=(), kwargs=None):
+        """
+        添加定时任务（固定间隔）
+        
+        Args:
+            func: 要执行的函数（可以是协程函数）
+            minutes: 间隔分钟数
+            job_id: 任务ID（可选）
+            args: 位置参数
+            kwargs: 关键字参数
+        """
+        try:
+            if kwargs is None:
+                kwargs = {}
+            
+            scheduler.add_job(
+                func,
+                trigger=IntervalTrigger(minutes=minutes),
+                id=job_id,
+                args=args,
+                kwargs=kwargs,
+                replace_existing=job_id is not None,
+                max_instances=1,
+                coalesce=True
+            )
+            logger.info(f"已添加定时任务: {job_id or func.__name__} - 每 {minutes} 分钟执行")
+        except Exception as e:
+            logger.error(f"添加定时任务失败: {e}")
+    
     @staticmethod
     def remove_job(job_id):
         """移除定时任务"""
@@ -0,0 +1,152 @@
+import asyncio
+import time
+import numpy as np
+from repositories.stock_indicator_repository import StockIndicatorRepository
+from services.monitor_service import (MonitorService, TREND_PERIODS, TECHNICAL_STATUSES, TREND_STATUSES,
+                                      VALUATION_STATUSES)
+from utils.indicators import EMA_PERIODS, TECHNICAL_NAMES
+from utils.logger import get_logger
+
+# 获取日志实例
+logger = get_logger('screener_service')
+
+_PERIOD_INDEX = {period: i for i, period in enumerate(EMA_PERIODS)}
+
+# 全市场最新日线指标快照（列数组），指标物化表更新后重新加载
+_snapshot = None
+_reload_lock = asyncio.Lock()
+
+
+def _column(rows, name):
+    """取一列数值，None -> NaN"""
+    return np.array([np.nan if row[name] is None else row[name] for row in rows], dtype=np.float64)
+
+
+def _load_columns(rows):
+    """StockIndicatorRepository.get_snapshot 的行 -> 列数组（每只股票一行，EMA 按 EMA_PERIODS 排列）"""
+    # 与监控页一致：价格和指标保留两位小数后比较
+    return {
+        'code': np.array([row['code'] for row in rows], dtype=object),
+        'name': np.array([row['name'] for row in rows], dtype=object),
+        'eps': _column(rows, 'eps_value'),
+        'close': np.round(_column(rows, 'close'), 2),
+        'last_date': np.array([row['date'] for row in rows], dtype='datetime64[D]'),
+        'ema': np.column_stack([np.round(_column(rows, f'ema{period}'), 2) for period in EMA_PERIODS])
+        if rows else np.empty((0, len(EMA_PERIODS))),
+        'technical': {name: np.round(_column(rows, name), 2) for name in TECHNICAL_NAMES},
+    }
+
+
+class ScreenerService:
+    """全市场选股：基于采集后物化的最新日线指标，全部股票一次向量运算完成筛选
+
+    估值状态依赖 eps_cache，而 EPS 只为监控列表中的股票抓取缓存，其余股票估值状态为「未知」
+    """
+
+    @staticmethod
+    async def get_snapshot():
+        """获取全市场快照；指标物化表或 EPS 缓存自上次加载后有变化（更新、过期）时重新加载"""
+        global _snapshot
+        version = await StockIndicatorRepository.get_version('1d')
+        if _snapshot is not None and _snapshot['version'] == version:
+            return _snapshot
+
+        async with _reload_lock:
+            if _snapshot is not None and _snapshot['version'] == version:
+                return _snapshot
+            start = time.perf_counter()
+            rows = await StockIndicatorRepository.get_snapshot('1d')
+            _snapshot = {'version': version, **_load_columns(rows)}
+            logger.info(f"加载选股快照 {len(_snapshot['code'])} 只股票，"
+                        f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return _snapshot
+
+    @staticmethod
+    def classify(snapshot, timeframe='1d', pe_min=15, pe_max=20):
+        """对快照中全部股票计算技术面状态、趋势、估值状态
+
+        由 MonitorService.classify_batch 计算，规则与监控页一致。
+
+        Returns:
+            dict: {'technical_status' / 'trend' / 'valuation_status': 字符串数组,
+                   'reasonable_price_min' / 'reasonable_price_max': float64 数组（无EPS时为 NaN）}
+        """
+        ema = snapshot['ema']
+        status = MonitorService.classify_batch(
+            snapshot['close'], ema[:, _PERIOD_INDEX[144]], ema[:, _PERIOD_INDEX[188]],
+            [ema[:, _PERIOD_INDEX[period]] for period in TREND_PERIODS[timeframe]],
+            snapshot['eps'], pe_min, pe_max
+        )
+        return {
+            'technical_status': MonitorService.status_labels(status['technical_status'], TECHNICAL_STATUSES),
+            'trend': MonitorService.status_labels(status['trend'], TREND_STATUSES),
+            'valuation_status': MonitorService.status_labels(status['valuation_status'], VALUATION_STATUSES),
+            'reasonable_price_min': status['reasonable_price_min'],
+            'reasonable_price_max': status['reasonable_price_max'],
+        }
+
+    @staticmethod
+    async def screen(timeframe='1d', technical=None, trend=None, valuation=None,
+                     pe_min=15, pe_max=20, limit=200, offset=0):
+        """全市场筛选
+
+        Args:
+            timeframe: 趋势判断使用的时间维度 '1d' / '2d' / '3d'（EMA 均按日线计算，与监控页一致）
+            technical: 技术面状态列表（加仓 / 破位 / 无信号），为空不筛选
+            trend: 趋势列表（多头 / 空头 / 震荡 / 未知），为空不筛选
+            valuation: 估值状态列表（低估 / 正常 / 高估 / 未知），为空不筛选；
+                       仅监控列表中的股票有 EPS，其余股票为「未知」
+            pe_min / pe_max: 合理市盈率区间
+            limit / offset: 分页（按股票代码排序）
+
+        Returns:
+            dict: {'total': 参与筛选的股票数, 'matched': 命中数, 'as_of': 最新K线日期, 'stocks': [...]}
+        """
+        if timeframe not in TREND_PERIODS:
+            raise ValueError(f"不支持的时间维度: {timeframe}")
+
+        snapshot = await ScreenerService.get_snapshot()
+        start = time.perf_counter()
+        labels = ScreenerService.classify(snapshot, timeframe, pe_min, pe_max)
+
+        mask = ~np.isnan(snapshot['close'])
+        for key, wanted in (('technical_status', technical), ('trend', trend), ('valuation_status', valuation)):
+            if wanted:
+                mask &= np.isin(labels[key], list(wanted))
+        matched = np.flatnonzero(mask)
+        page = matched[offset:offset + limit]
+
+        ema = snapshot['ema']
+        trend_periods = TREND_PERIODS[timeframe]
+        stocks = []
+        for i in page:
+            stock = {
+                'code': snapshot['code'][i],
+                'name': snapshot['name'][i],
+                'close': round(float(snapshot['close'][i]), 2),
+                'last_date': str(snapshot['last_date'][i]),
+                'ema144': ScreenerService._value(ema[i, _PERIOD_INDEX[144]]),
+                'ema188': ScreenerService._value(ema[i, _PERIOD_INDEX[188]]),
+                'eps_forecast': ScreenerService._value(snapshot['eps'][i]),
+            }
+            for period in trend_periods:
+                stock[f'ema{period}'] = ScreenerService._value(ema[i, _PERIOD_INDEX[period]])
+            for name, values in snapshot['technical'].items():
+                stock[name] = ScreenerService._value(values[i])
+            for key, values in labels.items():
+                stock[key] = str(values[i]) if values.dtype.kind == 'U' else ScreenerService._value(values[i])
+            stocks.append(stock)
+
+        logger.info(f"全市场筛选 {int(mask.size)} 只股票，命中 {len(matched)} 只，"
+                    f"耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        return {
+            'total': int((~np.isnan(snapshot['close'])).sum()),
+            'matched': int(len(matched)),
+            'as_of': str(snapshot['last_date'].max()) if len(snapshot['last_date']) else None,
+            'stocks': stocks,
+        }
+
+    @staticmethod
+    def _value(value):
+        """NaN -> None，其余保留两位小数"""
+        return None if np.isnan(value) else round(float(value), 2)
@@ -0,0 +1,226 @@
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+from repositories.kline_repository import KlineRepository
+from repositories.stock_indicator_repository import StockIndicatorRepository
+from services.indicator_service import IndicatorService
+from utils import kline_bars
+from utils.executors import run_blocking, INGEST
+from utils.indicators import EMA_PERIODS, INDICATOR_NAMES, build_price_matrix, ema_series, technical_series
+from utils.kline_normalizer import normalize_kline_frame, count_rows
+from utils.logger import get_logger
+
+# 获取日志实例
+logger = get_logger('stock_indicator_service')
+
+# 物化指标的K线周期：日线 + 多日K线
+TIMEFRAMES = ('1d',) + kline_bars.TIMEFRAMES
+
+# 增量刷新读取的K线根数（与监控页从K线计算EMA时的长度一致）
+_WINDOW = 1000
+
+# 变化的K线之前至少需要的根数（EMA188 等递推指标的预热）；窗口外还有更早历史且不足时从全部历史重算
+_WARMUP_BARS = 500
+
+# 重算时读取日线的起始日（早于任何数据）
+_FULL_HISTORY = date(1990, 1, 1)
+_MAX_DAILY_ROWS = 100000
+
+# 重算时每批读取历史的股票数
+_REBUILD_CHUNK = 100
+
+# 每次矩阵计算的序列数（限制内存）
+_COMPUTE_CHUNK = 500
+
+
+class StockIndicatorService:
+    """指标物化表：采集落库后只为有新K线的股票增量计算并写入每根K线的全部指标，读取方按索引直接查询"""
+
+    @staticmethod
+    async def refresh(kline_data_dict, multi_day_bars=None):
+        """用刚落库的K线刷新指标行
+
+        每个 (股票, 周期) 从最早变化的K线起重写到最新一根；变化的K线前预热不足
+        （历史回补、复权）且窗口外还有更早历史时，改为从全部历史重算该股票。
+
+        Args:
+            kline_data_dict: 传给 KlineRepository.save_all_batch 的 {code: DataFrame 或列数组}
+            multi_day_bars: KlineBarService.refresh 返回的 {code: {timeframe: 重算的多日K线}}
+
+        Returns:
+            tuple: (增量刷新的股票数, 从全部历史重算的股票数)
+        """
+        changed = {}
+        for code, data in kline_data_dict.items():
+            if data is None or count_rows(data) == 0:
+                continue
+            columns = data if isinstance(data, dict) else normalize_kline_frame(data)
+            changed[(code, '1d')] = np.asarray(columns['date'], dtype='datetime64[D]').min()
+        for code, by_timeframe in (multi_day_bars or {}).items():
+            for tf, bars in by_timeframe.items():
+                if len(bars['bucket_start']):
+                    changed[(code, tf)] = bars['bucket_start'].min()
+        if not changed:
+            return 0, 0
+
+        start = time.perf_counter()
+        series, since, rebuild = {}, {}, set()
+        for tf in TIMEFRAMES:
+            codes = [code for code, key_tf in changed if key_tf == tf]
+            if not codes:
+                continue
+            for code, bars in (await IndicatorService.load_bars(codes, tf, _WINDOW)).items():
+                if bars is None or len(bars['date']) == 0:
+                    continue
+                first = changed[(code, tf)]
+                if len(bars['date']) >= _WINDOW and np.searchsorted(bars['date'], first) < _WARMUP_BARS:
+                    rebuild.add(code)
+                    continue
+                series[(code, tf)] = bars
+                since[(code, tf)] = first
+
+        # 需要重算的股票由 rebuild 写入全部周期
+        series = {key: bars for key, bars in series.items() if key[0] not in rebuild}
+        # 指标计算和生成记录放到线程池，事件循环只等待读写数据库
+        records = await run_blocking(INGEST, StockIndicatorService._records, series, since)
+        saved = await StockIndicatorRepository.save_batch(records)
+        refreshed = len({code for code, _ in series})
+        logger.info(f"指标增量刷新 {refreshed} 只股票，写入 {saved} 条，"
+                    f"耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        if rebuild:
+            await StockIndicatorService.rebuild(sorted(rebuild))
+        return refreshed, len(rebuild)
+
+    @staticmethod
+    async def rebuild(codes):
+        """从全部历史日线重算股票所有周期的全部指标行（初始化、复权等历史价格变化时使用）
+
+        Returns:
+            int: 重算的股票数
+        """
+        rebuilt = 0
+        for i in range(0, len(codes), _REBUILD_CHUNK):
+            rebuilt += await StockIndicatorService._rebuild_chunk(codes[i:i + _REBUILD_CHUNK])
+        return rebuilt
+
+    @staticmethod
+    async def _rebuild_chunk(codes):
+        start = time.perf_counter()
+        frames = await KlineRepository.get_since_batch({code: _FULL_HISTORY for code in codes},
+                                                       limit=_MAX_DAILY_ROWS)
+        records, rebuilt = await run_blocking(INGEST, StockIndicatorService._rebuild_records, frames)
+        saved = await StockIndicatorRepository.save_batch(records)
+        logger.info(f"指标重算 {rebuilt} 只股票，写入 {saved} 条，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        return rebuilt
+
+    @staticmethod
+    def _rebuild_records(frames):
+        """从全部历史日线聚合各周期K线并计算全部指标行（阻塞，在线程池中执行）
+
+        Returns:
+            tuple: (StockIndicatorRepository.save_batch 的记录, 有K线的股票数)
+        """
+        series = {}
+        for code, df in frames.items():
+            if df is None:
+                continue
+            daily = normalize_kline_frame(df)
+            series[(code, '1d')] = {name: daily[name] for name in ('date', 'close', 'high', 'low')}
+            for tf in kline_bars.TIMEFRAMES:
+                bars = kline_bars.aggregate(daily, tf)
+                series[(code, tf)] = {'date': bars['bucket_start'], 'close': bars['close'],
+                                      'high': bars['high'], 'low': bars['low']}
+        return StockIndicatorService._records(series), len({code for code, _ in series})
+
+    @staticmethod
+    def _records(series, since=None):
+        """计算指标并生成待写入的行（阻塞，在线程池中执行）
+
+        Args:
+            series: {(code, timeframe): {'date': datetime64[D] 数组, 'close' / 'high' / 'low': float64 数组}}
+            since: {(code, timeframe): 起始日期}，只生成该日期（含）之后的行；为空生成全部行
+
+        Returns:
+            list: StockIndicatorRepository.save_batch 的记录
+        """
+        since = since or {}
+        records = []
+        # 同一周期的序列长度相近，按周期分组后再分块，矩阵补齐浪费少
+        for tf in TIMEFRAMES:
+            keys = [key for key in series if key[1] == tf and len(series[key]['date'])]
+            for i in range(0, len(keys), _COMPUTE_CHUNK):
+                chunk = keys[i:i + _COMPUTE_CHUNK]
+                records.extend(StockIndicatorService._chunk_records(
+                    chunk, [series[key] for key in chunk], [since.get(key) for key in chunk]
+                ))
+        return records
+
+    @staticmethod
+    def _chunk_records(keys, bars_list, since_list):
+        """一次矩阵计算一组序列的全部指标，取出起始日期之后的行"""
+        close, lengths = build_price_matrix([bars['close'] for bars in bars_list], fill='nan')
+        high, _ = build_price_matrix([bars['high'] for bars in bars_list], fill='nan')
+        low, _ = build_price_matrix([bars['low'] for bars in bars_list], fill='nan')
+        width = close.shape[1]
+
+        # EMA 在左侧用第一个价格补齐的矩阵上计算；K线根数不足周期时为 NaN（与 EmaStateService 一致）
+        padded, _ = build_price_matrix([bars['close'] for bars in bars_list])
+        count = np.cumsum(~np.isnan(close), axis=1)
+        values = {f'ema{period}': np.where(count >= period, ema_series(padded, period), np.nan)
+                  for period in EMA_PERIODS}
+        values.update(technical_series(close, high, low))
+
+        # 每只股票从起始日期所在列写到最后一列
+        begin = np.array([
+            width - n + (0 if first is None else int(np.searchsorted(bars['date'], first)))
+            for bars, n, first in zip(bars_list, lengths, since_list)
+        ])
+        mask = np.arange(width)[None, :] >= begin[:, None]
+        rows = np.nonzero(mask)[0]
+        if not len(rows):
+            return []
+
+        matrix = np.column_stack([close[mask]] + [values[name][mask] for name in INDICATOR_NAMES])
+        cells = matrix.astype(object)
+        cells[np.isnan(matrix)] = None
+        dates = np.concatenate([bars['date'][begin[i] - (width - n):]
+                                for i, (bars, n) in enumerate(zip(bars_list, lengths))])
+        codes = [key[0] for key in keys]
+        timeframes = [key[1] for key in keys]
+        return [
+            (codes[row], timeframes[row], bar_date, *cell)
+            for row, bar_date, cell in zip(rows.tolist(), dates.astype('datetime64[D]').tolist(), cells.tolist())
+        ]
+
+    @staticmethod
+    async def get_latest(codes, timeframe='1d'):
+        """读取最新一根K线的指标
+
+        Returns:
+            dict: {code: {'date': K线日期, 指标名: 保留两位小数的值（缺失为 None）}}，没有指标行的股票不在结果中
+        """
+        rows = await StockIndicatorRepository.get_latest(codes, timeframe)
+        return {
+            code: {'date': row['date'],
+                   **{name: None if row[name] is None else round(row[name], 2) for name in INDICATOR_NAMES}}
+            for code, row in rows.items()
+        }
+
+    @staticmethod
+    async def get_frame(code, timeframe='1d', start_date=None, end_date=None):
+        """读取一只股票区间内的指标（导出用）
+
+        Returns:
+            DataFrame: 列为 日期 和各指标名（保留四位小数），没有指标时返回 None
+        """
+        if isinstance(start_date, str):
+            start_date = date.fromisoformat(start_date)
+        if isinstance(end_date, str):
+            end_date = date.fromisoformat(end_date)
+        rows = await StockIndicatorRepository.get_range(code, timeframe, start_date, end_date)
+        if not rows:
+            return None
+        df = pd.DataFrame(rows, columns=['日期', 'close', *INDICATOR_NAMES]).drop(columns='close')
+        df[list(INDICATOR_NAMES)] = df[list(INDICATOR_NAMES)].astype(np.float64).round(4)
+        return df
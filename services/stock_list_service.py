@@ -5,6 +5,8 @@ import os
 import asyncio
 from repositories.stock_list_repository import StockListRepository
 from utils.logger import get_logger
+from utils.executors import run_blocking, INGEST
+from utils import rate_limiter
 
 # 清除代理设置
 os.environ.pop('http_proxy', None)
@@ -24,6 +26,7 @@ class StockListService:
         logger.info("开始从 akshare 获取沪深京 A 股列表")
         try:
             # 获取实时行情数据
+            rate_limiter.acquire_sync(rate_limiter.EM)
             df = ak.stock_zh_a_spot_em()
 
             # 提取代码和名称列
@@ -45,8 +48,8 @@ class StockListService:
         logger.info("开始更新股票列表")
         start_time = datetime.now()
 
-        # 从 akshare 获取最新数据
-        stock_list = StockListService.fetch_stock_list_from_akshare()
+        # 从 akshare 获取最新数据（阻塞调用放到采集线程池）
+        stock_list = await run_blocking(INGEST, StockListService.fetch_stock_list_from_akshare)
 
         if stock_list is None:
             logger.error("获取股票列表失败，更新终止")
@@ -113,7 +116,8 @@ class StockListService:
         """异步自动更新股票列表（定时任务调用）"""
         logger.info("定时任务：自动更新股票列表")
         try:
-            success, message = await StockListService.update_stock_list_async()
+            with rate_limiter.priority_scope(rate_limiter.SCHEDULED):
+                success, message = await StockListService.update_stock_list_async()
             if success:
                 logger.info(f"定时任务完成: {message}")
             else:
@@ -4,6 +4,7 @@ import aiohttp
 from datetime import datetime
 from typing import List, Dict, Optional
 import logging
+from utils import http_client, rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +28,7 @@ class XueqiuService:
         """异步获取指定雪球组合的调仓历史
         
         Args:
-            session: aiohttp ClientSession对象
+            session: aiohttp ClientSession对象（utils.http_client.session()）
             cube_symbol: 组合ID，如 ZH2363479
             count: 每页数量，默认20
             page: 页码，默认1
@@ -43,7 +44,9 @@ class XueqiuService:
         }
         
         try:
-            async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            await rate_limiter.acquire(rate_limiter.XUEQIU)
+            async with session.get(url, params=params, headers=XueqiuService._get_headers(),
+                                   timeout=aiohttp.ClientTimeout(total=10)) as response:
                 response.raise_for_status()
                 data = await response.json()
                 if data and 'list' in data:
@@ -106,12 +109,9 @@ class XueqiuService:
             字典，key为组合ID，value为调仓历史列表
         """
         result = {}
-        headers = XueqiuService._get_headers()
         
-        # 使用aiohttp的连接器，限制并发连接数
-        connector = aiohttp.TCPConnector(limit=10, ttl_dns_cache=300)
-        
-        async with aiohttp.ClientSession(headers=headers, connector=connector, trust_env=False) as session:
+        # 使用共享的长连接会话（每个主机的并发连接数由连接池限制）
+        async with http_client.session() as session:
             # 创建所有异步任务
             tasks = [XueqiuService._fetch_cube_data(session, symbol) for symbol in cube_symbols]
             
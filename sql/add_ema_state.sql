@@ -0,0 +1,16 @@
+-- 添加EMA增量状态表
+-- 执行时间: 2026-10-17
+
+-- 每只股票、每个周期（日线 / 多日K线）、每个EMA周期一行，采集落库后按新K线递推更新；
+-- 历史价格变化（复权、历史回补）时从全部历史重算
+CREATE TABLE IF NOT EXISTS ema_state (
+    code TEXT NOT NULL,
+    timeframe TEXT NOT NULL CHECK (timeframe IN ('1d', '2d', '3d', '1w')),
+    period INTEGER NOT NULL CHECK (period > 0),
+    last_date DATE NOT NULL,           -- 最后一根K线的日期（多日K线为分桶起始日）
+    value DOUBLE PRECISION NOT NULL,   -- 计入最后一根K线后的EMA
+    prev_value DOUBLE PRECISION,       -- 计入最后一根K线前的EMA（最后一根K线被改写时据此重算）
+    bars INTEGER NOT NULL CHECK (bars > 0),  -- 已计入的K线根数
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (code, timeframe, period)
+);
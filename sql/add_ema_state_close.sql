@@ -0,0 +1,20 @@
+-- EMA状态增加最后收盘价，供全市场选股直接读取
+-- 执行时间: 2026-10-17
+
+ALTER TABLE ema_state ADD COLUMN IF NOT EXISTS last_close DOUBLE PRECISION;  -- 最后一根K线的收盘价
+
+-- 回填已有状态的最后收盘价：日线取 stock_kline_data，多日K线取 stock_kline_bars（last_date 为分桶起始日）
+UPDATE ema_state s
+SET last_close = k.close
+FROM stock_kline_data k
+WHERE s.last_close IS NULL AND s.timeframe = '1d'
+  AND k.code = s.code AND k.date = s.last_date;
+
+UPDATE ema_state s
+SET last_close = b.close
+FROM stock_kline_bars b
+WHERE s.last_close IS NULL AND s.timeframe <> '1d'
+  AND b.code = s.code AND b.timeframe = s.timeframe AND b.bucket_start = s.last_date;
+
+-- 选股快照按 max(updated_at) 判断是否需要重新加载
+CREATE INDEX IF NOT EXISTS idx_ema_state_updated_at ON ema_state(updated_at);
@@ -0,0 +1,32 @@
+-- 添加K线历史回补任务表
+-- 执行时间: 2026-10-17
+
+-- 回补任务：日期范围、游标（按代码顺序处理到的最后一只股票）与进度
+CREATE TABLE IF NOT EXISTS kline_backfill_jobs (
+    id SERIAL PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'paused', 'completed', 'failed')),
+    start_date TEXT NOT NULL,  -- YYYYMMDD
+    end_date TEXT NOT NULL,    -- YYYYMMDD
+    cursor TEXT,
+    total_count INTEGER NOT NULL DEFAULT 0 CHECK (total_count >= 0),
+    done_count INTEGER NOT NULL DEFAULT 0 CHECK (done_count >= 0),
+    failed_count INTEGER NOT NULL DEFAULT 0 CHECK (failed_count >= 0),
+    elapsed_seconds REAL NOT NULL DEFAULT 0,  -- 累计运行时长（不含暂停）
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- 回补任务中每只股票的状态
+CREATE TABLE IF NOT EXISTS kline_backfill_items (
+    job_id INTEGER NOT NULL REFERENCES kline_backfill_jobs(id) ON DELETE CASCADE,
+    code TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'done', 'failed')),
+    error TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (job_id, code)
+);
+
+CREATE INDEX IF NOT EXISTS idx_backfill_jobs_status ON kline_backfill_jobs(status);
+CREATE INDEX IF NOT EXISTS idx_backfill_items_status ON kline_backfill_items(job_id, status, code);
@@ -0,0 +1,7 @@
+-- 添加回补任务租约字段到 kline_backfill_jobs 表
+-- 执行时间: 2026-10-17
+
+-- 每个任务同一时间只由一个进程运行：运行前写入租约，处理期间定期续租，
+-- 租约过期（进程崩溃或卡住）后其他进程可以重新领取
+ALTER TABLE kline_backfill_jobs ADD COLUMN IF NOT EXISTS lease_owner TEXT;
+ALTER TABLE kline_backfill_jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP;
@@ -0,0 +1,20 @@
+-- 添加多日K线表（2日 / 3日 / 周线）
+-- 执行时间: 2026-10-17
+
+-- 由日线聚合而来，采集落库后增量维护；分桶按固定起点计算，边界不随查询窗口变化：
+--   2d / 3d: 自 2000-01-03 起的第 N 个工作日（周一至周五）整除 2 / 3
+--   1w:      自然周（周一开始）
+CREATE TABLE IF NOT EXISTS stock_kline_bars (
+    code TEXT NOT NULL,
+    timeframe TEXT NOT NULL CHECK (timeframe IN ('2d', '3d', '1w')),
+    bucket_start DATE NOT NULL,   -- 分桶起始日（与 pandas resample 的标签一致）
+    last_date DATE NOT NULL,      -- 分桶内最后一个交易日
+    open DOUBLE PRECISION NOT NULL,
+    close DOUBLE PRECISION NOT NULL,
+    high DOUBLE PRECISION NOT NULL,
+    low DOUBLE PRECISION NOT NULL,
+    amount DOUBLE PRECISION NOT NULL,
+    bar_days INTEGER NOT NULL CHECK (bar_days > 0),  -- 分桶内的交易日数
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (code, timeframe, bucket_start)
+);
@@ -0,0 +1,15 @@
+-- 添加K线抓取死信表
+-- 执行时间: 2026-10-17
+
+-- 多次重试后仍失败的股票记录在此，由定时任务按退避时间重新抓取
+CREATE TABLE IF NOT EXISTS kline_dead_letter (
+    code TEXT PRIMARY KEY,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0 CHECK (attempts >= 0),  -- 累计抓取次数
+    failures INTEGER NOT NULL DEFAULT 0 CHECK (failures >= 0),  -- 累计失败轮数
+    first_failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    next_retry_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_kline_dead_letter_next_retry ON kline_dead_letter(next_retry_at);
@@ -0,0 +1,36 @@
+-- 添加指标物化表
+-- 执行时间: 2026-10-17
+
+-- 每只股票、每个周期（日线 / 多日K线）、每根K线一行，保存全部配置的指标；
+-- 采集落库后只为有新K线的股票增量刷新，历史价格变化时从全部历史重算
+CREATE TABLE IF NOT EXISTS stock_indicators (
+    code TEXT NOT NULL,
+    timeframe TEXT NOT NULL CHECK (timeframe IN ('1d', '2d', '3d', '1w')),
+    date DATE NOT NULL,                -- K线日期（多日K线为分桶起始日）
+    close DOUBLE PRECISION NOT NULL,
+    -- EMA（K线根数不足周期时为 NULL）
+    ema5 DOUBLE PRECISION,
+    ema7 DOUBLE PRECISION,
+    ema10 DOUBLE PRECISION,
+    ema20 DOUBLE PRECISION,
+    ema21 DOUBLE PRECISION,
+    ema30 DOUBLE PRECISION,
+    ema42 DOUBLE PRECISION,
+    ema60 DOUBLE PRECISION,
+    ema144 DOUBLE PRECISION,
+    ema188 DOUBLE PRECISION,
+    -- 技术指标（K线根数不足时为 NULL）
+    macd_dif DOUBLE PRECISION,
+    macd_dea DOUBLE PRECISION,
+    macd_hist DOUBLE PRECISION,
+    rsi14 DOUBLE PRECISION,
+    boll_upper DOUBLE PRECISION,
+    boll_mid DOUBLE PRECISION,
+    boll_lower DOUBLE PRECISION,
+    atr14 DOUBLE PRECISION,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (code, timeframe, date)
+);
+
+-- 选股快照按 max(updated_at) 判断是否需要重新加载
+CREATE INDEX IF NOT EXISTS idx_stock_indicators_updated_at ON stock_indicators(updated_at);
@@ -0,0 +1,10 @@
+-- 添加K线采集租约字段到 stock_list 表
+-- 执行时间: 2026-10-17
+
+-- 多个采集进程通过 FOR UPDATE SKIP LOCKED 领取股票并写入租约，
+-- 租约过期（进程崩溃或卡住）后其他进程可以重新领取
+ALTER TABLE stock_list ADD COLUMN IF NOT EXISTS lease_owner TEXT;
+ALTER TABLE stock_list ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP;
+
+-- 添加索引
+CREATE INDEX IF NOT EXISTS idx_stock_list_lease_expires ON stock_list(lease_expires_at);
@@ -56,22 +56,35 @@ CREATE TABLE IF NOT EXISTS monitor_data_cache (
     UNIQUE(code, timeframe)
 );
 
--- 创建K线数据表
+-- 创建K线数据表（按年分区，旧库迁移见 sql/migrate_kline_partitioned.sql）
 CREATE TABLE IF NOT EXISTS stock_kline_data (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL,
     code TEXT NOT NULL,
-    date TEXT NOT NULL,
-    open REAL NOT NULL CHECK (open > 0),
-    close REAL NOT NULL CHECK (close > 0),
-    high REAL NOT NULL CHECK (high > 0),
-    low REAL NOT NULL CHECK (low > 0),
-    volume INTEGER NOT NULL CHECK (volume >= 0),
-    amount REAL NOT NULL CHECK (amount >= 0),
+    date DATE NOT NULL,
+    open DOUBLE PRECISION NOT NULL CHECK (open > 0),
+    close DOUBLE PRECISION NOT NULL CHECK (close > 0),
+    high DOUBLE PRECISION NOT NULL CHECK (high > 0),
+    low DOUBLE PRECISION NOT NULL CHECK (low > 0),
+    volume BIGINT NOT NULL CHECK (volume >= 0),
+    amount DOUBLE PRECISION NOT NULL CHECK (amount >= 0),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    UNIQUE(code, date),
-    CONSTRAINT chk_ohlc_valid CHECK (high >= open AND high >= close AND high >= low AND low <= open AND low <= close)
-);
+    PRIMARY KEY (code, date),
+    CONSTRAINT chk_kline_ohlc_valid CHECK (high >= open AND high >= close AND high >= low AND low <= open AND low <= close)
+) PARTITION BY RANGE (date);
+
+-- K线按年分区（2010-2035），超出范围的数据进入默认分区
+DO $$
+BEGIN
+    FOR y IN 2010..2035 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS stock_kline_data_y%s PARTITION OF stock_kline_data
+             FOR VALUES FROM (%L) TO (%L)',
+            y, make_date(y, 1, 1), make_date(y + 1, 1, 1)
+        );
+    END LOOP;
+END $$;
+CREATE TABLE IF NOT EXISTS stock_kline_data_ydefault PARTITION OF stock_kline_data DEFAULT;
 
 -- 创建K线更新日志表
 CREATE TABLE IF NOT EXISTS kline_update_log (
@@ -99,6 +112,8 @@ CREATE TABLE IF NOT EXISTS stock_list (
     code TEXT PRIMARY KEY,
     name TEXT NOT NULL,
     last_update TIMESTAMP,  -- 最后一次K线更新时间
+    lease_owner TEXT,  -- 当前领取该股票的采集进程
+    lease_expires_at TIMESTAMP,  -- 租约过期时间
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -119,11 +134,10 @@ CREATE INDEX IF NOT EXISTS idx_monitor_cache_timeframe ON monitor_data_cache(tim
 CREATE INDEX IF NOT EXISTS idx_monitor_cache_created ON monitor_data_cache(created_at);
 CREATE INDEX IF NOT EXISTS idx_monitor_cache_unique ON monitor_data_cache(code, timeframe);
 
--- stock_kline_data表索引
-CREATE INDEX IF NOT EXISTS idx_kline_code ON stock_kline_data(code);
-CREATE INDEX IF NOT EXISTS idx_kline_code_date ON stock_kline_data(code, date);
-CREATE INDEX IF NOT EXISTS idx_kline_date ON stock_kline_data(date);
-CREATE INDEX IF NOT EXISTS idx_kline_created ON stock_kline_data(created_at);
+-- stock_kline_data表索引（覆盖索引：按代码取最近 N 根K线只扫索引）
+CREATE INDEX IF NOT EXISTS idx_kline_code_date_desc ON stock_kline_data(code, date DESC)
+    INCLUDE (open, close, high, low, volume, amount);
+CREATE INDEX IF NOT EXISTS idx_kline_trade_date ON stock_kline_data(date);
 
 -- kline_update_log表索引
 CREATE INDEX IF NOT EXISTS idx_update_log_date ON kline_update_log(update_date);
@@ -137,6 +151,7 @@ CREATE INDEX IF NOT EXISTS idx_xueqiu_enabled ON xueqiu_cubes(enabled);
 CREATE INDEX IF NOT EXISTS idx_stock_list_name ON stock_list(name);
 CREATE INDEX IF NOT EXISTS idx_stock_list_updated ON stock_list(updated_at);
 CREATE INDEX IF NOT EXISTS idx_stock_list_last_update ON stock_list(last_update);
+CREATE INDEX IF NOT EXISTS idx_stock_list_lease_expires ON stock_list(lease_expires_at);
 
 -- 创建触发器以自动更新 updated_at 字段
 -- portfolio表触发器
@@ -298,4 +313,117 @@ CREATE TABLE IF NOT EXISTS eps_cache (
 );
 
 -- EPS 缓存索引
-CREATE INDEX IF NOT EXISTS idx_eps_cache_updated_at ON eps_cache(updated_at);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_eps_cache_updated_at ON eps_cache(updated_at);
+
+-- K线抓取死信表（多次重试后仍失败的股票）
+CREATE TABLE IF NOT EXISTS kline_dead_letter (
+    code TEXT PRIMARY KEY,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0 CHECK (attempts >= 0),  -- 累计抓取次数
+    failures INTEGER NOT NULL DEFAULT 0 CHECK (failures >= 0),  -- 累计失败轮数
+    first_failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    next_retry_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 死信表索引
+CREATE INDEX IF NOT EXISTS idx_kline_dead_letter_next_retry ON kline_dead_letter(next_retry_at);
+
+-- K线历史回补任务表（可断点续传）
+CREATE TABLE IF NOT EXISTS kline_backfill_jobs (
+    id SERIAL PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'paused', 'completed', 'failed')),
+    start_date TEXT NOT NULL,  -- YYYYMMDD
+    end_date TEXT NOT NULL,    -- YYYYMMDD
+    cursor TEXT,
+    total_count INTEGER NOT NULL DEFAULT 0 CHECK (total_count >= 0),
+    done_count INTEGER NOT NULL DEFAULT 0 CHECK (done_count >= 0),
+    failed_count INTEGER NOT NULL DEFAULT 0 CHECK (failed_count >= 0),
+    elapsed_seconds REAL NOT NULL DEFAULT 0,  -- 累计运行时长（不含暂停）
+    error TEXT,
+    lease_owner TEXT,              -- 正在运行任务的进程
+    lease_expires_at TIMESTAMP,    -- 租约过期后其他进程可以重新领取
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- 回补任务中每只股票的状态
+CREATE TABLE IF NOT EXISTS kline_backfill_items (
+    job_id INTEGER NOT NULL REFERENCES kline_backfill_jobs(id) ON DELETE CASCADE,
+    code TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'done', 'failed')),
+    error TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (job_id, code)
+);
+
+-- 回补任务索引
+CREATE INDEX IF NOT EXISTS idx_backfill_jobs_status ON kline_backfill_jobs(status);
+CREATE INDEX IF NOT EXISTS idx_backfill_items_status ON kline_backfill_items(job_id, status, code);
+
+-- 多日K线表（由日线增量聚合，分桶边界固定：2d/3d 自 2000-01-03 起按工作日计数，1w 为自然周）
+CREATE TABLE IF NOT EXISTS stock_kline_bars (
+    code TEXT NOT NULL,
+    timeframe TEXT NOT NULL CHECK (timeframe IN ('2d', '3d', '1w')),
+    bucket_start DATE NOT NULL,   -- 分桶起始日
+    last_date DATE NOT NULL,      -- 分桶内最后一个交易日
+    open DOUBLE PRECISION NOT NULL,
+    close DOUBLE PRECISION NOT NULL,
+    high DOUBLE PRECISION NOT NULL,
+    low DOUBLE PRECISION NOT NULL,
+    amount DOUBLE PRECISION NOT NULL,
+    bar_days INTEGER NOT NULL CHECK (bar_days > 0),  -- 分桶内的交易日数
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (code, timeframe, bucket_start)
+);
+
+-- EMA增量状态表（采集落库后递推更新，历史价格变化时从全部历史重算）
+CREATE TABLE IF NOT EXISTS ema_state (
+    code TEXT NOT NULL,
+    timeframe TEXT NOT NULL CHECK (timeframe IN ('1d', '2d', '3d', '1w')),
+    period INTEGER NOT NULL CHECK (period > 0),
+    last_date DATE NOT NULL,           -- 最后一根K线的日期（多日K线为分桶起始日）
+    value DOUBLE PRECISION NOT NULL,   -- 计入最后一根K线后的EMA
+    prev_value DOUBLE PRECISION,       -- 计入最后一根K线前的EMA
+    bars INTEGER NOT NULL CHECK (bars > 0),  -- 已计入的K线根数
+    last_close DOUBLE PRECISION,       -- 最后一根K线的收盘价
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (code, timeframe, period)
+);
+
+-- 选股快照按 max(updated_at) 判断是否需要重新加载
+CREATE INDEX IF NOT EXISTS idx_ema_state_updated_at ON ema_state(updated_at);
+
+-- 指标物化表（采集落库后增量刷新，每只股票、每个周期、每根K线一行）
+CREATE TABLE IF NOT EXISTS stock_indicators (
+    code TEXT NOT NULL,
+    timeframe TEXT NOT NULL CHECK (timeframe IN ('1d', '2d', '3d', '1w')),
+    date DATE NOT NULL,                -- K线日期（多日K线为分桶起始日）
+    close DOUBLE PRECISION NOT NULL,
+    -- EMA（K线根数不足周期时为 NULL）
+    ema5 DOUBLE PRECISION,
+    ema7 DOUBLE PRECISION,
+    ema10 DOUBLE PRECISION,
+    ema20 DOUBLE PRECISION,
+    ema21 DOUBLE PRECISION,
+    ema30 DOUBLE PRECISION,
+    ema42 DOUBLE PRECISION,
+    ema60 DOUBLE PRECISION,
+    ema144 DOUBLE PRECISION,
+    ema188 DOUBLE PRECISION,
+    -- 技术指标（K线根数不足时为 NULL）
+    macd_dif DOUBLE PRECISION,
+    macd_dea DOUBLE PRECISION,
+    macd_hist DOUBLE PRECISION,
+    rsi14 DOUBLE PRECISION,
+    boll_upper DOUBLE PRECISION,
+    boll_mid DOUBLE PRECISION,
+    boll_lower DOUBLE PRECISION,
+    atr14 DOUBLE PRECISION,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (code, timeframe, date)
+);
+
+-- 选股快照按 max(updated_at) 判断是否需要重新加载
+CREATE INDEX IF NOT EXISTS idx_stock_indicators_updated_at ON stock_indicators(updated_at);
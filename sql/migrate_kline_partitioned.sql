@@ -0,0 +1,60 @@
+-- K线表迁移：DATE 类型 + 按年分区 + 覆盖索引
+-- 执行时间: 2026-10-17
+--
+-- 本脚本只创建新表 stock_kline_data_new，不影响线上读写。
+-- 数据复制与切换由 scripts/migrate_kline_partitioned.py 分块在线完成：
+--     python scripts/migrate_kline_partitioned.py prepare   # 执行本脚本
+--     python scripts/migrate_kline_partitioned.py copy      # 按股票分块复制，可中断续跑
+--     python scripts/migrate_kline_partitioned.py swap      # 补齐复制期间的写入并切换表名
+
+CREATE TABLE IF NOT EXISTS stock_kline_data_new (
+    id BIGSERIAL,
+    code TEXT NOT NULL,
+    date DATE NOT NULL,
+    open DOUBLE PRECISION NOT NULL CHECK (open > 0),
+    close DOUBLE PRECISION NOT NULL CHECK (close > 0),
+    high DOUBLE PRECISION NOT NULL CHECK (high > 0),
+    low DOUBLE PRECISION NOT NULL CHECK (low > 0),
+    volume BIGINT NOT NULL CHECK (volume >= 0),
+    amount DOUBLE PRECISION NOT NULL CHECK (amount >= 0),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (code, date),
+    CONSTRAINT chk_kline_ohlc_valid CHECK (high >= open AND high >= close AND high >= low AND low <= open AND low <= close)
+) PARTITION BY RANGE (date);
+
+-- 按年分区（2010-2035），超出范围的数据进入默认分区
+DO $$
+BEGIN
+    FOR y IN 2010..2035 LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS stock_kline_data_y%s PARTITION OF stock_kline_data_new
+             FOR VALUES FROM (%L) TO (%L)',
+            y, make_date(y, 1, 1), make_date(y + 1, 1, 1)
+        );
+    END LOOP;
+END $$;
+CREATE TABLE IF NOT EXISTS stock_kline_data_ydefault PARTITION OF stock_kline_data_new DEFAULT;
+
+-- 覆盖索引：按代码取最近 N 根K线可以只扫索引
+CREATE INDEX IF NOT EXISTS idx_kline_code_date_desc ON stock_kline_data_new (code, date DESC)
+    INCLUDE (open, close, high, low, volume, amount);
+-- 按交易日横截面查询
+CREATE INDEX IF NOT EXISTS idx_kline_trade_date ON stock_kline_data_new (date);
+
+-- updated_at 触发器（函数在 init_postgres.sql 中定义）
+DROP TRIGGER IF EXISTS trigger_update_stock_kline_data_new_updated_at ON stock_kline_data_new;
+CREATE TRIGGER trigger_update_stock_kline_data_new_updated_at
+    BEFORE UPDATE ON stock_kline_data_new
+    FOR EACH ROW
+    EXECUTE FUNCTION update_stock_kline_data_updated_at();
+
+-- 迁移进度（单行）
+CREATE TABLE IF NOT EXISTS kline_migration_state (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    cursor TEXT,                -- 已复制到的最后一只股票
+    copied_rows BIGINT NOT NULL DEFAULT 0,
+    copy_started_at TIMESTAMP,  -- 首次复制开始时间，切换时补齐此后的写入
+    swapped_at TIMESTAMP
+);
+INSERT INTO kline_migration_state (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+AIMD 自适应并发限制器
+
+延迟和错误率正常时逐轮加性放宽并发（每完成约 limit 个成功请求 +1），
+遇到超时 / 错误时乘性收缩（limit * decrease_factor），延迟超过目标值时轻度收缩。
+同一轮拥塞中只收缩一次：只有在上次收缩之后才发出的请求失败才会再次触发收缩。
+
+等待者用 future 实现并通过 call_soon_threadsafe 唤醒，因此同一个限制器可以在
+多个事件循环（如 asyncio.run 包装器所在线程）中共享。
+"""
+
+import asyncio
+import bisect
+import threading
+import time
+from collections import deque
+from utils.logger import get_logger
+
+logger = get_logger('adaptive_limiter')
+
+# 延迟直方图分桶上界（秒）
+LATENCY_BUCKETS = [0.5, 1, 2, 5, 10, 20, 30, 60, 120]
+
+
+class AdaptiveLimiter:
+    """AIMD 自适应并发限制器"""
+
+    def __init__(self, name, initial_limit=10, min_limit=1, max_limit=100,
+                 latency_target=10.0, decrease_factor=0.5, slow_decrease_factor=0.9):
+        """
+        Args:
+            name: 名称（用于日志和统计）
+            initial_limit: 初始并发数
+            min_limit: 最小并发数
+            max_limit: 最大并发数
+            latency_target: 目标延迟（秒），超过视为上游变慢
+            decrease_factor: 超时 / 错误时的收缩系数
+            slow_decrease_factor: 延迟超标时的收缩系数
+        """
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.slow_decrease_factor = slow_decrease_factor
+
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+        self._histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._ok_count = 0
+        self._error_count = 0
+        self._increases = 0
+        self._decreases = 0
+
+    @property
+    def limit(self):
+        """当前并发上限"""
+        return int(self._limit)
+
+    async def acquire(self):
+        """获取一个并发槽位
+
+        Returns:
+            float: 请求开始时间（release 时传回）
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self.limit and not self._waiters:
+                self._in_flight += 1
+                return time.monotonic()
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future.done() and not future.cancelled():
+                    # 槽位已经分配给本协程，转交给下一个等待者
+                    self._in_flight -= 1
+                    self._wake_waiters()
+                else:
+                    try:
+                        self._waiters.remove((loop, future))
+                    except ValueError:
+                        pass
+            raise
+        return time.monotonic()
+
+    def release(self, started_at, ok=True, latency=None):
+        """释放槽位并根据结果调整并发上限
+
+        Args:
+            started_at: acquire 返回的开始时间
+            ok: 请求是否成功（超时 / 异常为 False）
+            latency: 上游调用本身的耗时（秒），为空时按 acquire 到 release 的时间计
+        """
+        if latency is None:
+            latency = time.monotonic() - started_at
+        with self._lock:
+            self._in_flight -= 1
+            self._histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+            if ok:
+                self._ok_count += 1
+                if latency > self.latency_target:
+                    self._decrease(started_at, self.slow_decrease_factor, f"延迟 {latency:.1f}秒")
+                else:
+                    self._successes += 1
+                    if self._successes >= self.limit and self._limit < self.max_limit:
+                        self._limit = min(self.max_limit, self._limit + 1)
+                        self._successes = 0
+                        self._increases += 1
+            else:
+                self._error_count += 1
+                self._decrease(started_at, self.decrease_factor, "超时/错误")
+
+            self._wake_waiters()
+
+    def _decrease(self, started_at, factor, reason):
+        """乘性收缩（调用方持有锁）"""
+        # 上次收缩之前发出的请求属于同一轮拥塞，不重复收缩
+        if started_at < self._last_decrease:
+            return
+        old = self.limit
+        self._limit = max(self.min_limit, self._limit * factor)
+        self._successes = 0
+        self._last_decrease = time.monotonic()
+        self._decreases += 1
+        if self.limit != old:
+            logger.info(f"{self.name} 并发上限收缩 {old} -> {self.limit}（{reason}）")
+
+    def _wake_waiters(self):
+        """按当前上限唤醒等待者（调用方持有锁）"""
+        while self._waiters and self._in_flight < self.limit:
+            loop, future = self._waiters.popleft()
+            if future.done():
+                continue
+            self._in_flight += 1
+            loop.call_soon_threadsafe(self._resolve, future)
+
+    def _resolve(self, future):
+        """在等待者所在的事件循环中唤醒它"""
+        if future.done():
+            # 等待者在唤醒前已取消，归还槽位
+            with self._lock:
+                self._in_flight -= 1
+                self._wake_waiters()
+            return
+        future.set_result(None)
+
+    def stats(self):
+        """限制器统计信息（当前上限、延迟直方图）"""
+        with self._lock:
+            labels = [f'<={b}s' for b in LATENCY_BUCKETS] + [f'>{LATENCY_BUCKETS[-1]}s']
+            return {
+                'name': self.name,
+                'limit': self.limit,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'in_flight': self._in_flight,
+                'waiting': len(self._waiters),
+                'ok_count': self._ok_count,
+                'error_count': self._error_count,
+                'increases': self._increases,
+                'decreases': self._decreases,
+                'latency_histogram': dict(zip(labels, self._histogram)),
+            }
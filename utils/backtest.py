@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EMA144/188 通道信号的向量化回测引擎
+
+输入为 (股票数, 交易日数) 的收盘价矩阵，各股票右对齐（最后一列为各自最新K线）、
+左侧用第一个价格补齐，data_mask 标记真实K线。全部计算都是整矩阵运算：
+
+    EMA 序列      由调用方用 utils.indicators.ema_series 分块闭式计算
+    持仓          入场 / 离场事件按位置前向填充（maximum.accumulate）得到每日是否持仓
+    交易          入场日之后的第一个离场日（反向 minimum.accumulate）
+    统计          bincount 按股票聚合
+
+信号规则与 MonitorService.check_technical_status / check_trend 一致：
+收盘价进入 EMA144 / EMA188 通道（加仓）入场，跌破通道下沿（破位）离场；入场可按趋势过滤。
+本模块只依赖 numpy，不访问数据库。
+"""
+
+import numpy as np
+
+# 趋势编码
+BULL, RANGE, BEAR = 1, 0, -1
+
+
+def shift_right(matrix, fill):
+    """每行右移一列（t 列为 t-1 列的值），第一列填 fill"""
+    shifted = np.empty_like(matrix)
+    shifted[:, 0] = fill
+    shifted[:, 1:] = matrix[:, :-1]
+    return shifted
+
+
+def trend_codes(fast, mid, slow):
+    """均线排列：BULL（fast > mid > slow）/ BEAR（fast < mid < slow）/ RANGE"""
+    return np.where((fast > mid) & (mid > slow), BULL, np.where((fast < mid) & (mid < slow), BEAR, RANGE))
+
+
+def band_signals(close, ema_a, ema_b, ready):
+    """EMA 通道状态及事件
+
+    Returns:
+        dict: in_band（收盘价在通道内）、broken（跌破通道下沿）、
+              band_entry（由通道外进入通道的当日）、break_event（跌破下沿的第一日）
+    """
+    low, high = np.fmin(ema_a, ema_b), np.fmax(ema_a, ema_b)
+    in_band = ready & (close >= low) & (close <= high)
+    broken = ready & (close < low)
+    prev_ready = shift_right(ready, False)
+    return {
+        'in_band': in_band,
+        'broken': broken,
+        'band_entry': in_band & prev_ready & ~shift_right(in_band, False),
+        'break_event': broken & prev_ready & ~shift_right(broken, False),
+    }
+
+
+def positions(entry, exit_):
+    """由入场 / 离场事件得到每日收盘后是否持仓（同日两者都有时以离场为准）"""
+    width = entry.shape[1]
+    event = np.where(exit_, -1, np.where(entry, 1, 0)).astype(np.int8)
+    index = np.where(event != 0, np.arange(width)[None, :], -1)
+    last = np.maximum.accumulate(index, axis=1)
+    last_event = np.take_along_axis(event, np.maximum(last, 0), axis=1)
+    return (last >= 0) & (last_event == 1)
+
+
+def simulate(close, entry, exit_, ready):
+    """按收盘价成交回放交易
+
+    Args:
+        close: 收盘价矩阵
+        entry / exit_: 入场 / 离场信号（bool 矩阵）
+        ready: 参与回测的交易日（bool 矩阵）
+
+    Returns:
+        dict: 'trades'（各笔交易的 row / entry / exit 列号、return、bars、open）、
+              'stocks'（每只股票的交易数、胜率、累计收益、最大回撤、持仓天数占比、区间涨跌幅）
+    """
+    n, width = close.shape
+    columns = np.arange(width)[None, :]
+    held = positions(entry & ready, exit_ & ready) & ready
+
+    # 逐日收益：前一日收盘持仓则获得当日涨跌幅
+    prev_close = shift_right(close, np.nan)
+    daily = np.where(shift_right(held, False) & ready, close / prev_close - 1.0, 0.0)
+    equity = np.cumprod(1.0 + daily, axis=1)
+    drawdown = equity / np.maximum.accumulate(equity, axis=1) - 1.0
+
+    # 交易：入场日之后第一个离场日；回测结束仍持仓的按最后一个交易日收盘价计
+    opened = held & ~shift_right(held, False)
+    closed = ~held & shift_right(held, False) & ready
+    exit_index = np.where(closed, columns, width)
+    next_exit = np.minimum.accumulate(exit_index[:, ::-1], axis=1)[:, ::-1]
+    last_ready = width - 1 - np.argmax(ready[:, ::-1], axis=1)
+
+    rows, entry_cols = np.nonzero(opened)
+    exit_cols = next_exit[rows, entry_cols]
+    still_open = exit_cols >= width
+    exit_cols = np.where(still_open, last_ready[rows], exit_cols)
+    trade_returns = close[rows, exit_cols] / close[rows, entry_cols] - 1.0
+
+    # 每只股票统计
+    trades = np.bincount(rows, minlength=n)
+    wins = np.bincount(rows, weights=trade_returns > 0, minlength=n)
+    ready_days = ready.sum(axis=1)
+    first_ready = np.argmax(ready, axis=1)
+    has_days = ready_days > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        stocks = {
+            'trades': trades,
+            'win_rate': np.where(trades > 0, wins / np.maximum(trades, 1), np.nan),
+            'avg_trade_return': np.where(
+                trades > 0, np.bincount(rows, weights=trade_returns, minlength=n) / np.maximum(trades, 1), np.nan
+            ),
+            'total_return': np.where(has_days, equity[:, -1] - 1.0, np.nan),
+            'max_drawdown': np.where(has_days, drawdown.min(axis=1), np.nan),
+            'exposure': np.where(has_days, held.sum(axis=1) / np.maximum(ready_days, 1), np.nan),
+            'buy_hold_return': np.where(
+                has_days, close[np.arange(n), last_ready] / close[np.arange(n), first_ready] - 1.0, np.nan
+            ),
+        }
+    return {
+        'trades': {'row': rows, 'entry': entry_cols, 'exit': exit_cols, 'return': trade_returns,
+                   'bars': exit_cols - entry_cols, 'open': still_open},
+        'stocks': stocks,
+    }
+
+
+def forward_returns(close, signal, horizons, data_mask):
+    """信号发出后 h 个交易日的收益（收盘价计），超出数据末尾的信号不计入
+
+    Returns:
+        dict: {h: {'count', 'mean', 'median', 'win_rate'}}
+    """
+    width = close.shape[1]
+    rows, cols = np.nonzero(signal)
+    result = {}
+    for h in horizons:
+        valid = cols + h < width
+        r, c = rows[valid], cols[valid]
+        valid = data_mask[r, c + h]
+        returns = close[r[valid], c[valid] + h] / close[r[valid], c[valid]] - 1.0
+        result[h] = {
+            'count': int(len(returns)),
+            'mean': float(returns.mean()) if len(returns) else None,
+            'median': float(np.median(returns)) if len(returns) else None,
+            'win_rate': float((returns > 0).mean()) if len(returns) else None,
+        }
+    return result
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阻塞调用专用线程池
+
+akshare 等阻塞调用按用途分到独立的有界线程池，避免批量采集占满事件循环的默认
+线程池，拖慢页面请求：
+    ingest  - K线 / 股票列表等批量采集
+    eps     - EPS 预测抓取
+    request - 页面请求中的同步回退调用
+
+各线程池大小通过环境变量 EXECUTOR_<NAME>_WORKERS 配置。
+
+CPU 密集的纯计算（如K线 DataFrame 规整）可以通过 run_in_process 放到共享的进程池，
+进程数通过 EXECUTOR_PROCESS_WORKERS 配置（默认 CPU 核数，最多 8 个）。
+"""
+
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from utils.logger import get_logger
+
+logger = get_logger('executors')
+
+INGEST = 'ingest'
+EPS = 'eps'
+REQUEST = 'request'
+
+# 各线程池默认大小
+_DEFAULT_WORKERS = {
+    INGEST: 16,
+    EPS: 10,
+    REQUEST: 8,
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+_process_pool = None
+
+
+class NamedExecutor:
+    """带排队统计的命名线程池"""
+
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f'{name}-pool')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def submit(self, func, *args, **kwargs):
+        """提交任务，记录排队等待时间
+
+        任务在提交时的 contextvars 上下文中执行（如限流优先级）。
+        """
+        submitted_at = time.monotonic()
+        context = contextvars.copy_context()
+        with self._lock:
+            self._queued += 1
+
+        def wrapper():
+            wait = time.monotonic() - submitted_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            try:
+                result = context.run(func, *args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self._failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+            return result
+
+        future = self._executor.submit(wrapper)
+        # 开始执行前被取消（wait_for 超时、shutdown(cancel_futures=True)）的任务不会进入 wrapper，在此移出排队计数
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+                self._cancelled += 1
+
+    def stats(self):
+        """线程池统计信息"""
+        with self._lock:
+            completed = self._completed
+            return {
+                'name': self.name,
+                'max_workers': self.max_workers,
+                'queue_depth': self._queued,
+                'running': self._running,
+                'completed': completed,
+                'failed': self._failed,
+                'cancelled': self._cancelled,
+                'avg_wait_ms': round(self._total_wait / completed * 1000, 2) if completed else 0,
+                'max_wait_ms': round(self._max_wait * 1000, 2),
+            }
+
+    def shutdown(self, wait=False):
+        """关闭线程池"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def get_executor(name):
+    """获取（必要时创建）命名线程池"""
+    executor = _executors.get(name)
+    if executor is not None:
+        return executor
+
+    with _executors_lock:
+        if name not in _executors:
+            default = _DEFAULT_WORKERS.get(name, 4)
+            max_workers = int(os.getenv(f'EXECUTOR_{name.upper()}_WORKERS', str(default)))
+            _executors[name] = NamedExecutor(name, max_workers)
+            logger.info(f"线程池 {name} 已创建: max_workers={max_workers}")
+        return _executors[name]
+
+
+async def run_blocking(name, func, *args, **kwargs):
+    """在指定线程池中执行阻塞函数
+
+    Args:
+        name: 线程池名称（ingest / eps / request）
+        func: 阻塞函数
+    """
+    future = get_executor(name).submit(func, *args, **kwargs)
+    return await asyncio.wrap_future(future)
+
+
+def get_process_pool():
+    """获取（必要时创建）共享进程池
+
+    使用 spawn 启动子进程：主进程已有线程和事件循环，fork 可能复制到被占用的锁。
+    """
+    global _process_pool
+    with _executors_lock:
+        if _process_pool is None:
+            default = min(os.cpu_count() or 1, 8)
+            max_workers = int(os.getenv('EXECUTOR_PROCESS_WORKERS', str(default)))
+            _process_pool = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"进程池已创建: max_workers={max_workers}")
+        return _process_pool
+
+
+async def run_in_process(func, *args):
+    """在共享进程池中执行纯计算函数（func 和参数必须可序列化）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), func, *args)
+
+
+def get_executor_stats():
+    """获取所有线程池统计信息"""
+    return [executor.stats() for executor in list(_executors.values())]
+
+
+def shutdown_executors(wait=False):
+    """关闭所有线程池和进程池"""
+    global _process_pool
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=wait)
+        _executors.clear()
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=wait, cancel_futures=True)
+            _process_pool = None
+    logger.info("线程池已关闭")
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游 HTTP 客户端（进程内共享的 aiohttp 会话）
+
+雪球行情、组合等接口共用一个长连接会话：应用启动时（FastAPI lifespan）创建并预热，
+关闭时释放。连接按主机保持 keep-alive 复用，DNS 结果缓存，避免每次请求重新做
+DNS 解析和 TLS 握手。
+
+会话不带默认请求头和 Cookie（调用方每次请求传入，token 在调用时读取），
+Cookie 不在请求之间保留，与原先每次新建会话的行为一致。
+
+连接池参数通过环境变量配置：
+    HTTP_POOL_LIMIT            总连接数上限（默认 50）
+    HTTP_POOL_LIMIT_PER_HOST   每个主机的连接数上限（默认 10）
+    HTTP_KEEPALIVE_SECONDS     空闲连接保留秒数（默认 30）
+    HTTP_DNS_TTL_SECONDS       DNS 缓存秒数（默认 300）
+    HTTP_WARMUP_CONNECTIONS    启动时每个主机预建的连接数（默认 2，0 为不预热）
+
+共享会话绑定创建它的事件循环。在其他事件循环中（同步包装器的 asyncio.run、
+未经过 lifespan 的脚本）调用 session() 时改为临时会话，用完即关闭。
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+import aiohttp
+from utils import rate_limiter
+from utils.logger import get_logger
+
+logger = get_logger('http_client')
+
+# 启动时预热连接的主机
+WARMUP_HOSTS = ('xueqiu.com', 'stock.xueqiu.com')
+
+_session = None
+_session_loop = None
+_warmup_task = None
+_config = {}
+
+
+class PoolMetrics:
+    """连接池使用统计（通过 aiohttp TraceConfig 采集，线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = 0
+            self._failed = 0
+            self._in_flight = 0
+            self._max_in_flight = 0
+            self._created = 0
+            self._reused = 0
+            self._queued = 0
+            self._total_queue_wait = 0.0
+            self._max_queue_wait = 0.0
+            self._dns_hits = 0
+            self._dns_misses = 0
+            self._temporary_sessions = 0
+
+    def trace_config(self):
+        """生成挂到会话上的 TraceConfig"""
+        config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            with self._lock:
+                self._requests += 1
+                self._in_flight += 1
+                self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+        async def on_request_end(session, context, params):
+            with self._lock:
+                self._in_flight -= 1
+
+        async def on_request_exception(session, context, params):
+            with self._lock:
+                self._in_flight -= 1
+                self._failed += 1
+
+        async def on_queued_start(session, context, params):
+            context.queued_at = time.monotonic()
+
+        async def on_queued_end(session, context, params):
+            wait = time.monotonic() - context.queued_at
+            with self._lock:
+                self._queued += 1
+                self._total_queue_wait += wait
+                self._max_queue_wait = max(self._max_queue_wait, wait)
+
+        async def on_connection_create_end(session, context, params):
+            with self._lock:
+                self._created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            with self._lock:
+                self._reused += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            with self._lock:
+                self._dns_hits += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            with self._lock:
+                self._dns_misses += 1
+
+        config.on_request_start.append(on_request_start)
+        config.on_request_end.append(on_request_end)
+        config.on_request_exception.append(on_request_exception)
+        config.on_connection_queued_start.append(on_queued_start)
+        config.on_connection_queued_end.append(on_queued_end)
+        config.on_connection_create_end.append(on_connection_create_end)
+        config.on_connection_reuseconn.append(on_connection_reuseconn)
+        config.on_dns_cache_hit.append(on_dns_cache_hit)
+        config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return config
+
+    def temporary_session(self):
+        with self._lock:
+            self._temporary_sessions += 1
+
+    def stats(self):
+        """统计信息"""
+        with self._lock:
+            connections = self._created + self._reused
+            return {
+                'requests': self._requests,
+                'failed': self._failed,
+                'in_flight': self._in_flight,
+                'max_in_flight': self._max_in_flight,
+                'connections_created': self._created,
+                'connections_reused': self._reused,
+                'reuse_rate': round(self._reused / connections, 4) if connections else None,
+                'queued': self._queued,
+                'avg_queue_wait_ms': round(self._total_queue_wait / self._queued * 1000, 2) if self._queued else 0,
+                'max_queue_wait_ms': round(self._max_queue_wait * 1000, 2),
+                'dns_cache_hits': self._dns_hits,
+                'dns_cache_misses': self._dns_misses,
+                'temporary_sessions': self._temporary_sessions,
+            }
+
+
+metrics = PoolMetrics()
+
+
+def _load_config():
+    return {
+        'limit': int(os.getenv('HTTP_POOL_LIMIT', '50')),
+        'limit_per_host': int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '10')),
+        'keepalive_seconds': float(os.getenv('HTTP_KEEPALIVE_SECONDS', '30')),
+        'dns_ttl_seconds': int(os.getenv('HTTP_DNS_TTL_SECONDS', '300')),
+        'warmup_connections': int(os.getenv('HTTP_WARMUP_CONNECTIONS', '2')),
+    }
+
+
+def _create_session(config):
+    connector = aiohttp.TCPConnector(
+        limit=config['limit'],
+        limit_per_host=config['limit_per_host'],
+        keepalive_timeout=config['keepalive_seconds'],
+        ttl_dns_cache=config['dns_ttl_seconds'],
+        enable_cleanup_closed=True,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        cookie_jar=aiohttp.DummyCookieJar(),
+        trace_configs=[metrics.trace_config()],
+        trust_env=False,
+    )
+
+
+async def init_http_client(warmup=True):
+    """创建共享会话（应用启动时调用），并在后台预热到上游主机的连接"""
+    global _session, _session_loop, _warmup_task, _config
+    if _session is not None and not _session.closed:
+        return
+    _config = _load_config()
+    _session = _create_session(_config)
+    _session_loop = asyncio.get_running_loop()
+    logger.info(f"HTTP 客户端已初始化: limit={_config['limit']}, limit_per_host={_config['limit_per_host']}, "
+                f"keepalive={_config['keepalive_seconds']}s, dns_ttl={_config['dns_ttl_seconds']}s")
+    if warmup and _config['warmup_connections'] > 0:
+        _warmup_task = asyncio.create_task(warmup_connections(WARMUP_HOSTS, _config['warmup_connections']))
+
+
+async def close_http_client():
+    """关闭共享会话（应用关闭时调用）"""
+    global _session, _session_loop, _warmup_task
+    if _warmup_task is not None and not _warmup_task.done():
+        _warmup_task.cancel()
+    _warmup_task = None
+    if _session is not None:
+        await _session.close()
+        _session = None
+        _session_loop = None
+        logger.info("HTTP 客户端已关闭")
+
+
+async def warmup_connections(hosts, per_host):
+    """对每个主机并发发起 per_host 个 HEAD 请求，建立的连接留在连接池中供后续请求复用
+
+    Returns:
+        int: 预热成功的连接数
+    """
+    start = time.perf_counter()
+
+    async def head(host):
+        try:
+            await rate_limiter.acquire(rate_limiter.XUEQIU, priority=rate_limiter.SCHEDULED)
+            async with _session.head(f'https://{host}/', allow_redirects=False,
+                                     timeout=aiohttp.ClientTimeout(total=5)):
+                return True
+        except Exception as e:
+            logger.warning(f"预热 {host} 连接失败: {str(e)[:100]}")
+            return False
+
+    results = await asyncio.gather(*(head(host) for host in hosts for _ in range(per_host)))
+    warmed = sum(results)
+    logger.info(f"HTTP 连接预热完成: {warmed}/{len(results)} 个连接，耗时 {(time.perf_counter() - start) * 1000:.0f}ms")
+    return warmed
+
+
+@asynccontextmanager
+async def session():
+    """获取上游请求用的会话
+
+    在创建共享会话的事件循环中返回共享会话；否则（未初始化、其他事件循环）返回临时会话，退出时关闭。
+    """
+    if _session is not None and not _session.closed and asyncio.get_running_loop() is _session_loop:
+        yield _session
+        return
+
+    metrics.temporary_session()
+    temporary = _create_session(_config or _load_config())
+    try:
+        yield temporary
+    finally:
+        await temporary.close()
+
+
+def get_http_client_stats():
+    """获取 HTTP 客户端配置和连接池使用统计"""
+    return {
+        'active': _session is not None and not _session.closed,
+        **(_config or _load_config()),
+        **metrics.stats(),
+    }
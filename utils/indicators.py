@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量指标计算（多只股票 x 多个周期一次完成）
+
+价格矩阵每行一只股票、按时间升序；长度不同的序列在左侧用各自第一个价格补齐。
+对 adjust=False 的 EMA（与 pandas ewm(span, adjust=False) 相同的递推
+ema_t = a * x_t + (1 - a) * ema_{t-1}, ema_0 = x_0），左侧补入的常数不改变结果，
+最后一个值可以写成价格的加权和：
+
+    ema_{T-1} = (1 - a)^(T-1) * x_0 + sum_{j=1..T-1} a * (1 - a)^(T-1-j) * x_j
+
+因此全部股票、全部周期的最新 EMA 是一次矩阵乘法 X @ W。
+
+MACD / RSI / 布林带 / ATR 需要整条序列，按时间逐列递推，每一步对全部股票向量运算；
+这类矩阵在左侧用 NaN 补齐（build_price_matrix(fill='nan')），每只股票从第一根有效K线开始递推。
+本模块只依赖 numpy。
+"""
+
+import numpy as np
+
+# 监控页用到的 EMA 周期
+EMA_PERIODS = (5, 7, 10, 20, 21, 30, 42, 60, 144, 188)
+
+# 技术指标参数
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_PERIOD = 14
+BOLL_PERIOD, BOLL_WIDTH = 20, 2
+ATR_PERIOD = 14
+
+# 技术指标名（technical_series / technical_last 的键）
+TECHNICAL_NAMES = ('macd_dif', 'macd_dea', 'macd_hist', f'rsi{RSI_PERIOD}',
+                   'boll_upper', 'boll_mid', 'boll_lower', f'atr{ATR_PERIOD}')
+
+# 全部指标名：EMA（ema + 周期）和技术指标
+INDICATOR_NAMES = tuple(f'ema{period}' for period in EMA_PERIODS) + TECHNICAL_NAMES
+
+# 分块计算 EMA 序列的块长
+_EMA_BLOCK = 32
+
+
+def build_price_matrix(series_list, width=None, fill='first'):
+    """把长度不同的价格序列拼成左侧补齐的矩阵
+
+    Args:
+        series_list: 价格序列列表（numpy 数组、Series 或 list），按时间升序
+        width: 矩阵列数，默认为最长序列的长度；更长的序列只保留最后 width 个价格
+        fill: 左侧补齐方式，'first' 用各自第一个价格（EMA 闭式计算）、'nan' 用 NaN（逐列递推的指标）
+
+    Returns:
+        tuple: (matrix, lengths)，matrix 为 float64 (股票数, width)，空序列所在行为 NaN；
+               lengths 为每只股票的有效长度
+    """
+    arrays = [np.asarray(series, dtype=np.float64) for series in series_list]
+    if width is None:
+        width = max((len(a) for a in arrays), default=0)
+    matrix = np.empty((len(arrays), width), dtype=np.float64)
+    lengths = np.zeros(len(arrays), dtype=np.int64)
+    for i, values in enumerate(arrays):
+        values = values[-width:] if width else values[:0]
+        n = len(values)
+        lengths[i] = n
+        if n == 0:
+            matrix[i] = np.nan
+            continue
+        matrix[i, width - n:] = values
+        matrix[i, :width - n] = values[0] if fill == 'first' else np.nan
+    return matrix, lengths
+
+
+def ema_weights(width, periods):
+    """EMA 最新值的权重矩阵 (width, 周期数)"""
+    alphas = 2.0 / (np.asarray(periods, dtype=np.float64) + 1.0)
+    # 第 j 列价格距最后一根的根数
+    age = np.arange(width - 1, -1, -1, dtype=np.float64)[:, None]
+    weights = alphas * (1.0 - alphas) ** age
+    weights[0] = (1.0 - alphas) ** (width - 1)
+    return weights
+
+
+def ema_last(matrix, periods=EMA_PERIODS, lengths=None):
+    """批量计算最新 EMA
+
+    Args:
+        matrix: (股票数, 根数) 价格矩阵，左侧补齐（见 build_price_matrix）
+        periods: EMA 周期
+        lengths: 每只股票的有效长度；提供时长度不足周期的结果为 NaN（与 DataService.calculate_ema 返回 None 一致）
+
+    Returns:
+        ndarray: (股票数, 周期数)
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.shape[1] == 0:
+        return np.full((matrix.shape[0], len(periods)), np.nan)
+    result = matrix @ ema_weights(matrix.shape[1], periods)
+    if lengths is not None:
+        result[np.asarray(lengths)[:, None] < np.asarray(periods)[None, :]] = np.nan
+    return result
+
+
+def ema_step(values, prices, periods=EMA_PERIODS):
+    """在已有 EMA 上再递推一根K线（盘中以实时价格作为当日收盘的临时 EMA）
+
+    Args:
+        values: (股票数, 周期数) 上一根K线收盘时的 EMA，NaN 表示没有历史K线（结果即为价格本身）
+        prices: (股票数,) 新K线收盘价
+        periods: EMA 周期
+
+    Returns:
+        ndarray: (股票数, 周期数)
+    """
+    alphas = 2.0 / (np.asarray(periods, dtype=np.float64) + 1.0)
+    values = np.asarray(values, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)[:, None]
+    return np.where(np.isnan(values), prices, alphas * prices + (1.0 - alphas) * values)
+
+
+def ewm_matrix(matrix, alpha):
+    """逐列递推的指数加权平均 y_t = alpha * x_t + (1 - alpha) * y_{t-1}
+
+    每行从第一个非 NaN 值开始（y_0 = x_0），与 pandas ewm(alpha=alpha, adjust=False) 一致。
+
+    Args:
+        matrix: (股票数, 根数)，左侧 NaN 补齐
+        alpha: 平滑系数
+
+    Returns:
+        ndarray: 与 matrix 形状相同
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    result = np.empty_like(matrix)
+    state = np.full(matrix.shape[0], np.nan)
+    for t in range(matrix.shape[1]):
+        x = matrix[:, t]
+        state = np.where(np.isnan(state), x, alpha * x + (1.0 - alpha) * state)
+        result[:, t] = state
+    return result
+
+
+def macd(close, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    """MACD
+
+    Returns:
+        tuple: (DIF, DEA, MACD柱)，MACD柱按国内行情软件惯例为 2 * (DIF - DEA)
+    """
+    dif = ewm_matrix(close, 2.0 / (fast + 1)) - ewm_matrix(close, 2.0 / (slow + 1))
+    dea = ewm_matrix(dif, 2.0 / (signal + 1))
+    return dif, dea, 2.0 * (dif - dea)
+
+
+def rsi(close, period=RSI_PERIOD):
+    """RSI（Wilder 平滑，即 alpha = 1 / period 的指数加权平均）
+
+    平均跌幅为 0 时：平均涨幅大于 0 记为 100，涨跌均为 0 记为 50。
+    """
+    close = np.asarray(close, dtype=np.float64)
+    delta = np.full_like(close, np.nan)
+    delta[:, 1:] = np.diff(close, axis=1)
+    gain = ewm_matrix(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), 1.0 / period)
+    loss = ewm_matrix(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), 1.0 / period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = 100.0 - 100.0 / (1.0 + gain / loss)
+    result = np.where(loss == 0, np.where(gain > 0, 100.0, 50.0), result)
+    return np.where(np.isnan(gain), np.nan, result)
+
+
+def bollinger(close, period=BOLL_PERIOD, width=BOLL_WIDTH):
+    """布林带（中轨为 period 日简单均线，上下轨为中轨 ± width 倍总体标准差）
+
+    Returns:
+        tuple: (上轨, 中轨, 下轨)，不足 period 根的位置为 NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    mid = np.full_like(close, np.nan)
+    std = np.full_like(close, np.nan)
+    if close.shape[1] >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(close, period, axis=1)
+        mid[:, period - 1:] = windows.mean(axis=2)
+        std[:, period - 1:] = windows.std(axis=2)
+    return mid + width * std, mid, mid - width * std
+
+
+def atr(high, low, close, period=ATR_PERIOD):
+    """ATR（真实波幅的 Wilder 平滑；第一根K线的真实波幅为最高价 - 最低价）"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    prev_close = np.full_like(high, np.nan)
+    prev_close[:, 1:] = np.asarray(close, dtype=np.float64)[:, :-1]
+    # fmax 忽略 NaN：没有前收盘价时只取最高价 - 最低价
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return ewm_matrix(true_range, 1.0 / period)
+
+
+def ema_series(matrix, period, block=_EMA_BLOCK):
+    """整条 EMA 序列（与 pandas ewm(span=period, adjust=False) 一致）
+
+    分块闭式计算：块内为下三角权重矩阵乘法，块间只传递上一块末尾的 EMA，
+    Python 层只循环 根数 / block 次。
+
+    Args:
+        matrix: (股票数, 根数) 左侧用第一个价格补齐的价格矩阵（补齐部分不改变 EMA）
+        period: EMA 周期
+
+    Returns:
+        ndarray: 与 matrix 形状相同
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n, width = matrix.shape
+    alpha = 2.0 / (period + 1.0)
+    decay = 1.0 - alpha
+
+    # 块内权重：W[j, t] = alpha * decay^(t - j)（j <= t），上一块末尾 EMA 的权重为 decay^(t + 1)
+    lag = np.arange(block)[None, :] - np.arange(block)[:, None]
+    weights = np.where(lag >= 0, alpha * decay ** np.maximum(lag, 0), 0.0)
+    carry_weights = decay ** np.arange(1, block + 1)
+
+    result = np.empty_like(matrix)
+    # 第一根K线的 EMA 即价格本身，令初始 EMA = 第一个价格即可统一递推
+    state = matrix[:, 0].copy() if width else np.empty(n)
+    for begin in range(0, width, block):
+        end = min(begin + block, width)
+        size = end - begin
+        values = matrix[:, begin:end] @ weights[:size, :size] + state[:, None] * carry_weights[None, :size]
+        result[:, begin:end] = values
+        state = values[:, -1]
+    return result
+
+
+def technical_series(close, high, low):
+    """批量计算 MACD / RSI / 布林带 / ATR 的整条序列
+
+    Args:
+        close / high / low: (股票数, 根数) 矩阵，左侧 NaN 补齐
+
+    Returns:
+        dict: {指标名: (股票数, 根数) 矩阵}，指标名见 TECHNICAL_NAMES；截至该根K线的有效根数不足指标所需时为 NaN
+    """
+    bars = np.cumsum(~np.isnan(np.asarray(close, dtype=np.float64)), axis=1)
+    dif, dea, hist = macd(close)
+    upper, mid, lower = bollinger(close)
+    series = {
+        'macd_dif': (dif, MACD_SLOW),
+        'macd_dea': (dea, MACD_SLOW),
+        'macd_hist': (hist, MACD_SLOW),
+        f'rsi{RSI_PERIOD}': (rsi(close), RSI_PERIOD + 1),
+        'boll_upper': (upper, BOLL_PERIOD),
+        'boll_mid': (mid, BOLL_PERIOD),
+        'boll_lower': (lower, BOLL_PERIOD),
+        f'atr{ATR_PERIOD}': (atr(high, low, close), ATR_PERIOD + 1),
+    }
+    return {name: np.where(bars >= min_bars, values, np.nan) for name, (values, min_bars) in series.items()}
+
+
+def technical_last(close, high, low):
+    """批量计算 MACD / RSI / 布林带 / ATR 的最新值
+
+    Args:
+        close / high / low: (股票数, 根数) 矩阵，左侧 NaN 补齐；K线根数不足各指标所需时结果为 NaN
+
+    Returns:
+        dict: {指标名: (股票数,) 数组}，指标名见 TECHNICAL_NAMES
+    """
+    return {name: values[:, -1] for name, values in technical_series(close, high, low).items()}
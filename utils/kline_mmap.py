@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线磁盘列式文件（内存映射）
+
+每只股票一个文件 {KLINE_MMAP_DIR}/{code}.kline，格式：
+    16 字节文件头: b'KLN1' + uint32 保留 + uint64 行数 n
+    int64[n]      日期（1970-01-01 起的天数）
+    float64[5, n] open / close / high / low / amount，每列连续存放
+
+读取方以只读方式映射文件，多个 uvicorn worker 通过页缓存共享同一份数据；
+写入方先写临时文件再 os.replace 原子替换，已映射旧文件的读者不受影响。
+"读取-合并-替换" 在目录级文件锁（write_lock）内完成，多个进程同时写同一只股票时不会用旧数据覆盖新数据。
+本模块只依赖 numpy，不访问数据库。
+"""
+
+import fcntl
+import os
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+_MAGIC = b'KLN1'
+_HEADER = 16
+_PRICE_FIELDS = ('open', 'close', 'high', 'low', 'amount')
+
+
+def get_mmap_dir():
+    """文件目录，未配置 KLINE_MMAP_DIR 时返回 None（不启用）"""
+    return os.getenv('KLINE_MMAP_DIR') or None
+
+
+def path_for(code):
+    return os.path.join(get_mmap_dir(), f'{code}.kline')
+
+
+def file_identity(code):
+    """文件标识 (inode, mtime_ns)，用于判断文件是否已被替换；文件不存在时返回 None"""
+    try:
+        st = os.stat(path_for(code))
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+@contextmanager
+def write_lock():
+    """目录级排他文件锁（跨进程），写入方在锁内读取现有文件、合并并替换"""
+    directory = get_mmap_dir()
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def last_date(columns):
+    """列数组的最后一个日期（天数），没有数据时返回 None"""
+    return int(columns['date'][-1]) if columns is not None and len(columns['date']) else None
+
+
+def open_columns(code):
+    """只读映射一只股票的文件
+
+    Returns:
+        tuple: ({'date': int64 数组, 'open'...: float64 数组}, 文件标识)，文件不存在或损坏时返回 (None, None)
+    """
+    path = path_for(code)
+    try:
+        identity = file_identity(code)
+        buf = np.memmap(path, dtype=np.uint8, mode='r')
+    except (FileNotFoundError, ValueError):
+        return None, None
+
+    if len(buf) < _HEADER or bytes(buf[:4]) != _MAGIC:
+        return None, None
+    n = int(buf[8:16].view(np.uint64)[0])
+    if len(buf) != _HEADER + n * 8 * 6:
+        return None, None
+
+    columns = {'date': buf[_HEADER:_HEADER + n * 8].view(np.int64)}
+    prices = buf[_HEADER + n * 8:].view(np.float64).reshape(5, n)
+    for i, key in enumerate(_PRICE_FIELDS):
+        columns[key] = prices[i]
+    return columns, identity
+
+
+def write_columns(code, columns):
+    """原子写入一只股票的文件（临时文件 + os.replace）"""
+    directory = get_mmap_dir()
+    os.makedirs(directory, exist_ok=True)
+    n = len(columns['date'])
+    tmp_path = os.path.join(directory, f'.{code}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_MAGIC + np.uint32(0).tobytes() + np.uint64(n).tobytes())
+            f.write(np.ascontiguousarray(columns['date'], dtype=np.int64).tobytes())
+            f.write(np.stack([np.asarray(columns[key], dtype=np.float64) for key in _PRICE_FIELDS]).tobytes())
+        os.replace(tmp_path, path_for(code))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def merge_columns(existing, incoming, max_rows):
+    """把新写入的K线合并到已有列（均按日期升序），保留最后 max_rows 行
+
+    Returns:
+        dict: 合并结果；新数据没有覆盖到已有数据末尾（如历史回补）时返回 None，需要从数据库重建
+    """
+    fields = ('date',) + _PRICE_FIELDS
+    dates = existing['date']
+    new_dates = incoming['date']
+    if len(new_dates) == 0:
+        merged = existing
+    elif len(dates) == 0 or new_dates[0] > dates[-1]:
+        merged = {key: np.concatenate([existing[key], incoming[key]]) for key in fields}
+    elif new_dates[-1] < dates[-1]:
+        return None
+    else:
+        pos = int(np.searchsorted(dates, new_dates[0]))
+        merged = {key: np.concatenate([existing[key][:pos], incoming[key]]) for key in fields}
+    return {key: merged[key][-max_rows:] for key in fields}
+
+
+def remove(code):
+    """删除一只股票的文件"""
+    try:
+        os.remove(path_for(code))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线 DataFrame 规整
+
+把 akshare 返回的 DataFrame（列名中英文皆可）转成紧凑的列数组，供写入阶段直接拼装记录。
+本模块只依赖 pandas / numpy，可以在子进程中执行（见 utils.executors.run_in_process），
+结果以 numpy 数组形式传回，序列化开销远小于逐行元组。
+"""
+
+import numpy as np
+import pandas as pd
+
+# akshare 英文列名 -> 仓储层使用的中文列名
+_COLUMN_MAP = {'date': '日期', 'open': '开盘', 'close': '收盘', 'high': '最高', 'low': '最低'}
+
+
+def normalize_kline_frame(df):
+    """把K线 DataFrame 规整为列数组
+
+    日期无法解析的行会被丢弃。
+
+    Args:
+        df: K线 DataFrame
+
+    Returns:
+        dict: {'date': datetime64[D] 数组, 'open'/'close'/'high'/'low'/'amount': float64 数组}
+    """
+    if 'date' in df.columns and 'close' in df.columns:
+        df = df.rename(columns=_COLUMN_MAP)
+
+    dates = pd.to_datetime(df['日期'], errors='coerce')
+    valid = dates.notna().to_numpy()
+
+    columns = {'date': dates[valid].to_numpy(dtype='datetime64[D]')}
+    for key, name in (('open', '开盘'), ('close', '收盘'), ('high', '最高'), ('low', '最低')):
+        columns[key] = df[name].to_numpy(dtype=np.float64)[valid]
+    if 'amount' in df.columns:
+        columns['amount'] = df['amount'].fillna(0).to_numpy(dtype=np.float64)[valid]
+    else:
+        columns['amount'] = np.zeros(int(valid.sum()))
+    return columns
+
+
+def count_rows(data):
+    """规整结果或 DataFrame 的行数"""
+    if isinstance(data, dict):
+        return len(data['date'])
+    return len(data)
+
+
+def build_records(code, columns):
+    """由列数组拼装写入记录
+
+    Returns:
+        list: [(code, date, open, close, high, low, volume, amount), ...]，date 为 datetime.date
+    """
+    n = len(columns['date'])
+    return list(zip(
+        [code] * n,
+        columns['date'].tolist(),
+        columns['open'].tolist(),
+        columns['close'].tolist(),
+        columns['high'].tolist(),
+        columns['low'].tolist(),
+        [0] * n,
+        columns['amount'].tolist()
+    ))
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游数据源令牌桶限流
+
+所有访问上游的代码都先从对应数据源的令牌桶取令牌，进程内共享，避免定时采集和
+页面请求叠加时触发封禁。数据源与主机的对应关系：
+    tx      - proxy.finance.qq.com（akshare stock_zh_a_hist_tx）
+    ths     - basic.10jqka.com.cn（akshare stock_profit_forecast_ths）
+    em      - push2.eastmoney.com（akshare stock_zh_a_spot_em）
+    xueqiu  - xueqiu.com / stock.xueqiu.com（行情、组合接口）
+
+速率和突发量通过环境变量 RATE_LIMIT_<NAME>_RPS / RATE_LIMIT_<NAME>_BURST 配置。
+
+优先级：页面请求（INTERACTIVE）> 定时任务（SCHEDULED）> 历史回补（BACKFILL）。
+有高优先级请求在等待时，低优先级请求不会拿到令牌。调用方可以直接传入 priority，
+也可以用 priority_scope 为整段调用链设置默认优先级（通过 contextvars 传递）。
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from utils.logger import get_logger
+
+logger = get_logger('rate_limiter')
+
+TX = 'tx'
+THS = 'ths'
+EM = 'em'
+XUEQIU = 'xueqiu'
+
+INTERACTIVE = 0
+SCHEDULED = 1
+BACKFILL = 2
+
+_PRIORITY_NAMES = {INTERACTIVE: 'interactive', SCHEDULED: 'scheduled', BACKFILL: 'backfill'}
+
+# 各数据源默认 (每秒令牌数, 突发量)
+_DEFAULT_LIMITS = {
+    TX: (5, 10),
+    THS: (2, 4),
+    EM: (1, 2),
+    XUEQIU: (10, 20),
+}
+
+_current_priority = contextvars.ContextVar('rate_limit_priority', default=INTERACTIVE)
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+class TokenBucket:
+    """带优先级的令牌桶（线程安全，可跨事件循环共享）"""
+
+    def __init__(self, name, rate, burst):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._waiting = [0] * len(_PRIORITY_NAMES)
+        self._granted = [0] * len(_PRIORITY_NAMES)
+        self._total_wait = [0.0] * len(_PRIORITY_NAMES)
+
+    def _reserve(self, tokens, priority):
+        """尝试取令牌（调用方持有锁）
+
+        Returns:
+            float: 0 表示已取到，否则为建议等待的秒数
+        """
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+        # 更高优先级的请求在排队时让路
+        if any(self._waiting[p] for p in range(priority)):
+            return max(1.0 / self.rate, 0.01)
+
+        # 超过突发量的请求在桶满时放行并透支
+        need = min(tokens, self.burst)
+        if self._tokens >= need:
+            self._tokens -= tokens
+            return 0
+        return (need - self._tokens) / self.rate
+
+    def _try_acquire(self, tokens, priority, registered):
+        """尝试取令牌，未取到时登记为等待者
+
+        Returns:
+            float: 0 表示已取到，否则为建议等待的秒数
+        """
+        with self._lock:
+            wait = self._reserve(tokens, priority)
+            if wait == 0:
+                if registered:
+                    self._waiting[priority] -= 1
+                self._granted[priority] += 1
+            elif not registered:
+                self._waiting[priority] += 1
+            return wait
+
+    def _cancel_wait(self, priority):
+        with self._lock:
+            self._waiting[priority] -= 1
+
+    def _record_wait(self, priority, waited):
+        with self._lock:
+            self._total_wait[priority] += waited
+
+    async def acquire(self, tokens=1, priority=INTERACTIVE):
+        """异步取令牌，返回等待秒数"""
+        start = time.monotonic()
+        registered = False
+        try:
+            while True:
+                wait = self._try_acquire(tokens, priority, registered)
+                if wait == 0:
+                    break
+                registered = True
+                await asyncio.sleep(wait)
+        except BaseException:
+            if registered:
+                self._cancel_wait(priority)
+            raise
+
+        waited = time.monotonic() - start
+        self._record_wait(priority, waited)
+        return waited
+
+    def acquire_sync(self, tokens=1, priority=INTERACTIVE):
+        """同步取令牌（线程池中的阻塞调用使用），返回等待秒数"""
+        start = time.monotonic()
+        registered = False
+        try:
+            while True:
+                wait = self._try_acquire(tokens, priority, registered)
+                if wait == 0:
+                    break
+                registered = True
+                time.sleep(wait)
+        except BaseException:
+            if registered:
+                self._cancel_wait(priority)
+            raise
+
+        waited = time.monotonic() - start
+        self._record_wait(priority, waited)
+        return waited
+
+    def stats(self):
+        """令牌桶统计信息"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': round(self._tokens, 2),
+                'waiting': {_PRIORITY_NAMES[p]: n for p, n in enumerate(self._waiting)},
+                'granted': {_PRIORITY_NAMES[p]: n for p, n in enumerate(self._granted)},
+                'avg_wait_ms': {
+                    _PRIORITY_NAMES[p]: round(self._total_wait[p] / n * 1000, 2) if n else 0
+                    for p, n in enumerate(self._granted)
+                },
+            }
+
+
+def get_bucket(name):
+    """获取（必要时创建）数据源令牌桶"""
+    bucket = _buckets.get(name)
+    if bucket is not None:
+        return bucket
+
+    with _buckets_lock:
+        if name not in _buckets:
+            default_rate, default_burst = _DEFAULT_LIMITS.get(name, (5, 10))
+            rate = float(os.getenv(f'RATE_LIMIT_{name.upper()}_RPS', str(default_rate)))
+            burst = float(os.getenv(f'RATE_LIMIT_{name.upper()}_BURST', str(default_burst)))
+            _buckets[name] = TokenBucket(name, rate, burst)
+            logger.info(f"限流器 {name} 已创建: {rate}/秒, 突发 {burst}")
+        return _buckets[name]
+
+
+async def acquire(name, tokens=1, priority=None):
+    """异步取令牌
+
+    Args:
+        name: 数据源名称（tx / ths / em / xueqiu）
+        tokens: 本次调用会发出的上游请求数
+        priority: 优先级，默认取当前上下文的优先级
+    """
+    if priority is None:
+        priority = _current_priority.get()
+    return await get_bucket(name).acquire(tokens, priority)
+
+
+def acquire_sync(name, tokens=1, priority=None):
+    """同步取令牌（线程中的阻塞调用使用）"""
+    if priority is None:
+        priority = _current_priority.get()
+    return get_bucket(name).acquire_sync(tokens, priority)
+
+
+@contextmanager
+def priority_scope(priority):
+    """为当前调用链（含其中创建的任务和线程池调用）设置默认优先级"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def get_rate_limiter_stats():
+    """获取所有令牌桶统计信息"""
+    return [bucket.stats() for bucket in list(_buckets.values())]
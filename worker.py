@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+独立K线采集进程（不启动 FastAPI）
+
+多个进程（可分布在多台机器上）通过 stock_list 上的租约队列分摊全市场增量更新，
+互不重复。用法：
+
+    python worker.py                  # 常驻运行，没有待更新股票时休眠后再领取
+    python worker.py --once           # 处理完当前所有待更新股票后退出
+    python worker.py --concurrency 20 --worker-id host-a
+
+收到 SIGINT / SIGTERM 时处理完当前批次、释放租约后退出。
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from utils.db import init_db_pool, close_db_pool
+from utils.executors import shutdown_executors
+from utils.logger import get_logger
+from utils import rate_limiter
+
+# 获取日志实例
+logger = get_logger('worker')
+
+
+async def run(args):
+    """采集主循环"""
+    from repositories.stock_list_repository import StockListRepository
+    from services.kline_service import KlineService
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await init_db_pool()
+    owner = args.worker_id or KlineService.make_worker_id()
+    logger.info(f"采集进程 {owner} 已启动，每批 {args.concurrency} 只股票")
+
+    try:
+        with rate_limiter.priority_scope(rate_limiter.SCHEDULED):
+            while not stop_event.is_set():
+                result = await KlineService.update_all_with_leases(
+                    args.concurrency, owner=owner, stop_event=stop_event
+                )
+                if args.once:
+                    break
+                if result['processed'] == 0:
+                    # 没有待更新股票，休眠后再领取（收到退出信号时立即结束）
+                    try:
+                        await asyncio.wait_for(stop_event.wait(), timeout=args.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+    finally:
+        await StockListRepository.release_leases(owner)
+        shutdown_executors()
+        await close_db_pool()
+        logger.info(f"采集进程 {owner} 已退出")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='独立K线采集进程')
+    parser.add_argument('--worker-id', default=None, help='进程标识，默认 主机名:进程号:随机后缀')
+    parser.add_argument('--concurrency', type=int,
+                        default=int(os.getenv('KLINE_UPDATE_CONCURRENT', '10')),
+                        help='每批领取的股票数（抓取并发数）')
+    parser.add_argument('--poll-seconds', type=float,
+                        default=float(os.getenv('KLINE_WORKER_POLL_SECONDS', '300')),
+                        help='没有待更新股票时的休眠秒数')
+    parser.add_argument('--once', action='store_true', help='处理完当前待更新股票后退出')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()